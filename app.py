@@ -1,38 +1,90 @@
-from flask import Flask, render_template, redirect, url_for, flash, request, send_file, jsonify
+from flask import Flask, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
+from flask_wtf.csrf import generate_csrf, validate_csrf
+from wtforms.validators import ValidationError
 from werkzeug.utils import secure_filename
+from sqlalchemy.exc import IntegrityError
 from functools import wraps
 import os
 import secrets
 import json
-from datetime import datetime
+import atexit
+import threading
+import time
 
 from google_docs_service import GoogleDocsService
-from wtforms.validators import DataRequired, Email
-from wtforms import StringField, IntegerField, TextAreaField, SelectField
 
 from config import Config
-from models import db, User, Service, FormField, ServiceRequest
+from models import db, User, Service, FormField, ServiceRequest, ServiceRequestStats
+from pagination import keyset_paginate
+from pdf_delivery import build_pdf_response, is_current_version, pdf_version
 from forms import (LoginForm, CreateAdminForm, ServiceForm, FormFieldForm, 
-                   ServiceRequestForm, ApprovalForm, TrackingForm)
+                   ServiceRequestForm, ApprovalForm, TrackingForm, get_service_request_form)
 
 app = Flask(__name__)
 app.config.from_object(Config)
 
 # Initialize extensions
 db.init_app(app)
+with app.app_context():
+    from db_utils import configure_sqlite_engine
+    configure_sqlite_engine(db.engine,
+                            journal_mode=app.config['SQLITE_JOURNAL_MODE'],
+                            synchronous=app.config['SQLITE_SYNCHRONOUS'],
+                            busy_timeout_ms=app.config['SQLITE_BUSY_TIMEOUT_MS'])
 login_manager = LoginManager()
 login_manager.init_app(app)
+app.add_template_global(pdf_version)
 login_manager.login_view = 'login'
 login_manager.login_message = 'لطفاً وارد شوید.'
 
 # Create directories if they don't exist
 os.makedirs(app.config['PDF_OUTPUT_FOLDER'], exist_ok=True)
 
+# Initialize sharded PDF storage and its retention/compression sweeper
+from pdf_storage import LocalShardedStorage, StorageSweeper, init_pdf_storage
+pdf_storage = init_pdf_storage(LocalShardedStorage(app.config['PDF_OUTPUT_FOLDER'],
+                                                   depth=app.config['PDF_STORAGE_SHARD_DEPTH']))
+
+def on_pdf_deleted(key):
+    """Forget PDFs removed by the retention policy"""
+    with app.app_context():
+        try:
+            ServiceRequest.query.filter_by(pdf_filename=key).update(
+                {'pdf_filename': None, 'pdf_sha256': None, 'pdf_size': None})
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Error clearing deleted PDF {key}: {str(e)}")
+
+pdf_storage_sweeper = StorageSweeper(pdf_storage,
+                                     retention_days=app.config['PDF_RETENTION_DAYS'],
+                                     compress_after_days=app.config['PDF_COMPRESS_AFTER_DAYS'],
+                                     interval=app.config['PDF_SWEEP_INTERVAL'],
+                                     on_delete=on_pdf_deleted)
+if app.config['PDF_RETENTION_DAYS'] or app.config['PDF_COMPRESS_AFTER_DAYS']:
+    pdf_storage_sweeper.start()
+
 # Initialize PDF queue processor with app and db
 from pdf_queue_processor import init_queue_processor
 init_queue_processor(app, db)
 
+# Shared rate limiter for all Google API clients
+from google_api_limiter import init_api_limiter, get_api_limiter, parse_rate_limits
+init_api_limiter(parse_rate_limits(app.config['GOOGLE_API_RATE_LIMITS']))
+
+# Shared streaming exporter for Drive PDF exports
+from pdf_exporter import init_pdf_exporter
+init_pdf_exporter(chunk_size=app.config['PDF_EXPORT_CHUNK_SIZE'],
+                  max_resumes=app.config['PDF_EXPORT_MAX_RESUMES'])
+
+# Circuit breaker guarding PDF renders through Google Docs/Drive
+from circuit_breaker import init_circuit_breaker, get_circuit_breaker
+init_circuit_breaker('google_docs',
+                     failure_rate_threshold=app.config['PDF_CIRCUIT_FAILURE_RATE'],
+                     slow_call_seconds=app.config['PDF_CIRCUIT_SLOW_CALL_SECONDS'],
+                     open_seconds=app.config['PDF_CIRCUIT_OPEN_SECONDS'])
+
 # Initialize Google Docs service
 google_docs_service = None
 try:
@@ -40,9 +92,39 @@ try:
 except Exception as e:
     app.logger.error(f"Failed to initialize Google Docs service: {str(e)}")
 
+# Initialize template placeholder index
+from placeholder_index import init_placeholder_index
+placeholder_index = None
+if google_docs_service:
+    placeholder_index = init_placeholder_index(google_docs_service.get_document_content)
+
+# Pre-warmed Drive copies for copy-based generation
+from drive_copy_pool import init_copy_pool
+drive_copy_pool = None
+if google_docs_service and app.config['DRIVE_COPY_POOL_SIZE'] > 0:
+    drive_copy_pool = init_copy_pool(google_docs_service,
+                                     size=app.config['DRIVE_COPY_POOL_SIZE'],
+                                     max_age=app.config['DRIVE_COPY_POOL_MAX_AGE'],
+                                     reset_mode=app.config['DRIVE_COPY_POOL_RESET'])
+    # Idle copies would otherwise be left behind in Drive
+    atexit.register(drive_copy_pool.drain)
+
+# PDF engines; each service may pick its own, see pdf_backends.py
+from pdf_backends import init_pdf_backends, engine_stats, render_pdf
+init_pdf_backends(app.config['PDF_DEFAULT_ENGINE'],
+                  credentials_path=os.path.join(os.path.dirname(__file__), 'credentials.json'),
+                  docs_service=google_docs_service)
+
+# Per-stage PDF pipeline timings, served at /metrics
+from pipeline_metrics import get_pipeline_metrics
+
+# Cached identities for current_user; see user_cache.py
+from user_cache import user_cache
+user_cache.ttl = app.config['USER_CACHE_TTL']
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return user_cache.get(int(user_id))
 
 # Decorators for role checking
 def system_manager_required(f):
@@ -63,13 +145,41 @@ def approval_admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def csrf_required(f):
+    """Check the CSRF token of a JSON endpoint, sent as an X-CSRFToken header or csrf_token field"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if app.config.get('WTF_CSRF_ENABLED', True):
+            token = request.headers.get('X-CSRFToken') or request.form.get('csrf_token')
+            try:
+                validate_csrf(token)
+            except ValidationError:
+                return jsonify({'error': 'توکن امنیتی نامعتبر است'}), 400
+        return f(*args, **kwargs)
+    return decorated_function
+
 # Helper functions
 def generate_tracking_code():
-    """Generate a unique tracking code"""
-    while True:
-        code = secrets.token_hex(5).upper()
-        if not ServiceRequest.query.filter_by(tracking_code=code).first():
-            return code
+    """Generate a random tracking code; uniqueness is enforced by the database"""
+    return secrets.token_hex(5).upper()
+
+def add_service_request(service_request, max_attempts=5):
+    """
+    Add a service request with a fresh tracking code, retrying on collisions
+    
+    The unique constraint on tracking_code is the only uniqueness check, so
+    concurrent workers can not race between a lookup and the insert.
+    """
+    for attempt in range(1, max_attempts + 1):
+        service_request.tracking_code = generate_tracking_code()
+        try:
+            with db.session.begin_nested():
+                db.session.add(service_request)
+            return service_request
+        except IntegrityError:
+            app.logger.warning(f'Tracking code collision on attempt {attempt}')
+            if attempt == max_attempts:
+                raise
 
 
 
@@ -78,7 +188,8 @@ def generate_tracking_code():
 def index():
     """Public homepage showing available services"""
     services = Service.query.filter_by(is_active=True).all()
-    return render_template('user/index.html', services=services)
+    field_counts = Service.get_field_counts([service.id for service in services])
+    return render_template('user/index.html', services=services, field_counts=field_counts)
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -119,7 +230,11 @@ def admin_dashboard():
     """System manager dashboard"""
     services = Service.query.all()
     admins = User.query.filter_by(role='approval_admin').all()
-    return render_template('admin/dashboard.html', services=services, admins=admins)
+    service_ids = [service.id for service in services]
+    field_counts = Service.get_field_counts(service_ids)
+    request_stats = Service.get_request_stats(service_ids)
+    return render_template('admin/dashboard.html', services=services, admins=admins,
+                         field_counts=field_counts, request_stats=request_stats)
 
 @app.route('/admin/create-admin', methods=['GET', 'POST'])
 @login_required
@@ -170,6 +285,7 @@ def create_service():
                 name=form.name.data,
                 description=form.description.data,
                 google_doc_id=form.google_doc_id.data,
+                pdf_engine=form.pdf_engine.data or None,
                 created_by=current_user.id
             )
             
@@ -234,9 +350,15 @@ def edit_service(service_id):
                 return render_template('admin/edit_service.html', form=form, service=service)
         
         try:
+            if placeholder_index and form.google_doc_id.data != service.google_doc_id:
+                placeholder_index.invalidate(service.google_doc_id)
+            if drive_copy_pool and form.google_doc_id.data != service.google_doc_id:
+                drive_copy_pool.invalidate(service.google_doc_id)
+            
             service.name = form.name.data
             service.description = form.description.data
             service.google_doc_id = form.google_doc_id.data
+            service.pdf_engine = form.pdf_engine.data or None
             
             db.session.commit()
             flash('خدمت با موفقیت به‌روزرسانی شد.', 'success')
@@ -294,6 +416,7 @@ def edit_service_fields(service_id):
                 is_required=form.is_required.data,
                 placeholder=form.placeholder.data,
                 document_placeholder=form.document_placeholder.data,
+                is_indexed=form.is_indexed.data,
                 field_order=service.form_fields.count()
             )
             
@@ -302,8 +425,16 @@ def edit_service_fields(service_id):
                 field.options = json.dumps(options, ensure_ascii=False)
             
             db.session.add(field)
+            # Invalidate compiled request forms in every worker
+            service.form_version = (service.form_version or 0) + 1
             db.session.commit()
             flash('فیلد جدید اضافه شد.', 'success')
+            
+            # Check the new mapping against the cached template index
+            if placeholder_index:
+                report = placeholder_index.check_fields(service.google_doc_id, [field])
+                if report.missing:
+                    flash(f'هشدار: جایگزین {{{{{report.missing[0]}}}}} در قالب Google Docs یافت نشد.', 'warning')
             return redirect(url_for('edit_service_fields', service_id=service.id))
         except Exception as e:
             db.session.rollback()
@@ -318,11 +449,18 @@ def edit_service_fields(service_id):
         auto_approval_form.auto_approve_field_name.data = service.auto_approve_field_name
     
     fields = service.form_fields.order_by(FormField.field_order).all()
+    
+    # Validate field mappings against the cached template placeholders
+    placeholder_report = None
+    if placeholder_index:
+        placeholder_report = placeholder_index.check_fields(service.google_doc_id, fields)
+    
     return render_template('admin/edit_fields.html', 
                          service=service, 
                          form=form, 
                          fields=fields,
-                         auto_approval_form=auto_approval_form)
+                         auto_approval_form=auto_approval_form,
+                         placeholder_report=placeholder_report)
 
 @app.route('/admin/services/<int:service_id>/stats')
 @login_required
@@ -331,8 +469,110 @@ def service_stats(service_id):
     """View service statistics"""
     service = Service.query.get_or_404(service_id)
     stats = service.get_stats()
-    recent_requests = service.requests.order_by(ServiceRequest.created_at.desc()).limit(10).all()
-    return render_template('admin/service_stats.html', service=service, stats=stats, recent_requests=recent_requests)
+    requests_page = keyset_paginate(
+        service.requests.options(db.joinedload(ServiceRequest.handler)),
+        ServiceRequest,
+        per_page=app.config['REQUESTS_PER_PAGE'],
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        total=stats['total']
+    )
+    return render_template('admin/service_stats.html', service=service, stats=stats,
+                         recent_requests=requests_page.items, requests_page=requests_page)
+
+@app.route('/admin/google-api/quota')
+@login_required
+@system_manager_required
+def google_api_quota():
+    """Current Google API rate limiter headroom and circuit state (JSON)"""
+    limiter = get_api_limiter()
+    return jsonify({
+        'headroom': limiter.headroom(),
+        'cooldown_seconds': round(limiter.cooldown_remaining(), 1),
+        'circuit': get_circuit_breaker('google_docs').snapshot(),
+        'copy_pool': drive_copy_pool.snapshot() if drive_copy_pool else None,
+        'engines': engine_stats()
+    })
+
+@app.route('/admin/pdf-queue')
+@login_required
+@system_manager_required
+def pdf_queue_status():
+    """In-flight, queued, parked and failed PDF tasks with age and attempts (JSON)"""
+    from pdf_queue_processor import get_queue_processor
+    failed_limit = request.args.get('failed_limit', 100, type=int)
+    snapshot = get_queue_processor().snapshot(failed_limit=failed_limit)
+    # Token for the control endpoints below
+    snapshot['csrf_token'] = generate_csrf()
+    return jsonify(snapshot)
+
+@app.route('/admin/pdf-queue/tasks/<task_id>/<action>', methods=['POST'])
+@login_required
+@system_manager_required
+@csrf_required
+def pdf_queue_task_action(task_id, action):
+    """Cancel, re-prioritize or retry a PDF task (JSON)"""
+    from pdf_queue_processor import get_queue_processor, TaskControlError, TaskPriority
+    processor = get_queue_processor()
+    
+    try:
+        if action == 'cancel':
+            task = processor.cancel_task(task_id)
+        elif action == 'retry':
+            task = processor.retry_task(task_id)
+        elif action == 'priority':
+            data = request.get_json(silent=True) or request.form
+            try:
+                priority = TaskPriority(data.get('priority'))
+            except ValueError:
+                return jsonify({'error': 'اولویت نامعتبر است'}), 400
+            task = processor.set_task_priority(task_id, priority)
+        else:
+            return jsonify({'error': 'عملیات نامعتبر است'}), 404
+    except KeyError:
+        return jsonify({'error': 'کار مورد نظر یافت نشد'}), 404
+    except TaskControlError as e:
+        return jsonify({'error': str(e)}), 409
+    
+    app.logger.info(f"PDF task {task_id}: {action} by {current_user.username}")
+    return jsonify({'task_id': task.task_id, 'status': task.status.value, 'lane': task.priority.value})
+
+@app.route('/admin/pdf-queue/<action>', methods=['POST'])
+@login_required
+@system_manager_required
+@csrf_required
+def pdf_queue_workers(action):
+    """Pause or resume the PDF queue workers (JSON)"""
+    from pdf_queue_processor import get_queue_processor
+    processor = get_queue_processor()
+    
+    if action == 'pause':
+        processor.pause()
+    elif action == 'resume':
+        processor.resume()
+    else:
+        return jsonify({'error': 'عملیات نامعتبر است'}), 404
+    
+    app.logger.info(f"PDF queue {action}d by {current_user.username}")
+    return jsonify({'paused': processor.is_paused})
+
+@app.route('/metrics')
+def metrics():
+    """PDF pipeline latency histograms, task outcomes and queue depth (Prometheus text format)"""
+    token = app.config['METRICS_TOKEN']
+    if not token:
+        # Scraping is disabled until a token is configured
+        return 'Not Found', 404
+    if not secrets.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return 'Unauthorized', 401
+    
+    from pdf_queue_processor import get_queue_processor
+    processor = get_queue_processor()
+    gauges = {
+        'pdf_queue_depth': {(): processor.get_queue_size()},
+        'pdf_queue_lane_depth': {(('lane', lane),): size for lane, size in processor.get_lane_sizes().items()},
+    }
+    return get_pipeline_metrics().render(gauges), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
 
 
 
@@ -342,10 +582,14 @@ def service_stats(service_id):
 @approval_admin_required
 def approver_dashboard():
     """Approval admin dashboard"""
-    page = request.args.get('page', 1, type=int)
-    requests = ServiceRequest.query.filter_by(status='pending').order_by(
-        ServiceRequest.created_at.desc()
-    ).paginate(page=page, per_page=app.config['REQUESTS_PER_PAGE'])
+    requests = keyset_paginate(
+        ServiceRequest.query.filter_by(status='pending').options(db.joinedload(ServiceRequest.service)),
+        ServiceRequest,
+        per_page=app.config['REQUESTS_PER_PAGE'],
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        total=ServiceRequestStats.approximate_count('pending')
+    )
     return render_template('approver/dashboard.html', requests=requests)
 
 @app.route('/approver/request/<int:request_id>', methods=['GET', 'POST'])
@@ -358,17 +602,24 @@ def review_request(request_id):
     
     if form.validate_on_submit():
         try:
-            service_request.status = form.action.data + 'd'  # approved or rejected
+            old_status = service_request.status
+            service_request.status = 'approved' if form.action.data == 'approve' else 'rejected'
             service_request.approval_note = form.note.data
             service_request.approved_by = current_user.id
+            ServiceRequestStats.record(service_request.service_id, service_request.status, old_status)
+            # Commit before rendering: the counter update holds a write lock until then
+            db.session.commit()
             
-            if form.action.data == 'approve':
+            if form.action.data == 'approve' and app.config['PDF_GENERATION_MODE'] == 'lazy':
+                # PDF is generated on first download or tracking page view
+                flash('درخواست تایید شد. PDF هنگام اولین مشاهده توسط کاربر تولید می‌شود.', 'success')
+            elif form.action.data == 'approve':
                 # Generate PDF using queue system
                 try:
-                    from pdf_queue_processor import add_pdf_task, wait_for_task, ProcessingStatus
+                    from pdf_queue_processor import add_pdf_task, wait_for_task, ProcessingStatus, TaskPriority
                     
-                    # Add PDF generation to queue
-                    task_id = add_pdf_task(service_request)
+                    # Add PDF generation to queue; the approver is waiting on it
+                    task_id = add_pdf_task(service_request, priority=TaskPriority.INTERACTIVE)
                     app.logger.info(f"Added PDF task {task_id} to queue for manual approval")
                     
                     # Wait for task completion (with timeout)
@@ -376,22 +627,19 @@ def review_request(request_id):
                     
                     if task:
                         if task.status == ProcessingStatus.COMPLETED:
-                            service_request.pdf_filename = task.result
+                            service_request.attach_pdf(task.result, pdf_storage.local_path(task.result))
                             db.session.commit()
                             flash('درخواست تایید شد و PDF تولید شد.', 'success')
                         else:
-                            db.session.commit()
                             flash(f'درخواست تایید شد اما تولید PDF با خطا مواجه شد: {task.error}', 'warning')
                     else:
-                        db.session.commit()
                         flash('درخواست تایید شد. PDF در صف تولید قرار گرفت.', 'info')
                         
                 except Exception as e:
-                    db.session.commit()
+                    db.session.rollback()
                     app.logger.error(f'Error adding PDF to queue: {str(e)}')
                     flash(f'خطا در تولید PDF: {str(e)}', 'danger')
             else:
-                db.session.commit()
                 flash('درخواست رد شد.', 'info')
         
         except Exception as e:
@@ -406,6 +654,54 @@ def review_request(request_id):
                          form=form, 
                          form_data=form_data)
 
+@app.route('/approver/search')
+@login_required
+@approval_admin_required
+def search_requests():
+    """Search requests by service, status, date range, field values and text"""
+    from request_search import search_requests as run_search, parse_date
+    
+    service_id = request.args.get('service_id', type=int)
+    status = request.args.get('status') or None
+    field_name = request.args.get('field_name') or None
+    field_value = request.args.get('field_value') or None
+    field_filters = []
+    if field_name and field_value:
+        field_filters.append((field_name, field_value, request.args.get('field_match') == 'prefix'))
+    
+    results = run_search(
+        per_page=app.config['REQUESTS_PER_PAGE'],
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        service_id=service_id,
+        status=status,
+        created_from=parse_date(request.args.get('date_from')),
+        created_to=parse_date(request.args.get('date_to')),
+        field_filters=field_filters,
+        query=request.args.get('q')
+    )
+    
+    if request.args.get('format') == 'json':
+        return jsonify({
+            'results': [{
+                'id': r.id,
+                'tracking_code': r.tracking_code,
+                'service_id': r.service_id,
+                'service_name': r.service.name,
+                'status': r.status,
+                'created_at': r.created_at.isoformat(),
+                'form_data': r.get_form_data()
+            } for r in results.items],
+            'next_cursor': results.next_cursor,
+            'prev_cursor': results.prev_cursor
+        })
+    
+    # Current filters, reused by the pagination links
+    filters = {key: value for key, value in request.args.items()
+               if value and key not in ('after', 'before', 'format')}
+    services = Service.query.order_by(Service.name).all()
+    return render_template('approver/search.html', results=results, services=services, filters=filters)
+
 # Public User Routes
 @app.route('/service/<int:service_id>/request', methods=['GET', 'POST'])
 def request_service(service_id):
@@ -415,39 +711,8 @@ def request_service(service_id):
         flash('این خدمت در حال حاضر غیرفعال است.', 'warning')
         return redirect(url_for('index'))
     
-    # Create dynamic form
-    class DynamicForm(ServiceRequestForm):
-        pass
-    
-    # Add fields dynamically
-    for field in service.form_fields.order_by(FormField.field_order):
-        field_class = None
-        validators = []
-        
-        if field.is_required:
-            validators.append(DataRequired(message='این فیلد اجباری است'))
-        
-        if field.field_type == 'text':
-            field_class = StringField
-        elif field.field_type == 'number':
-            field_class = IntegerField
-        elif field.field_type == 'email':
-            field_class = StringField
-            validators.append(Email(message='ایمیل معتبر وارد کنید'))
-        elif field.field_type == 'textarea':
-            field_class = TextAreaField
-        elif field.field_type == 'select':
-            choices = [(opt, opt) for opt in field.get_options()]
-            setattr(DynamicForm, field.field_name, 
-                   SelectField(field.field_label, choices=choices, validators=validators))
-            continue
-        else:
-            field_class = StringField
-        
-        if field_class:
-            setattr(DynamicForm, field.field_name, 
-                   field_class(field.field_label, validators=validators, 
-                             render_kw={'placeholder': field.placeholder}))
+    # Compiled form class, cached per service version
+    DynamicForm = get_service_request_form(service)
     
     form = DynamicForm()
     
@@ -455,18 +720,21 @@ def request_service(service_id):
         try:
             # Collect form data
             form_data = {}
-            for field in service.form_fields:
-                if hasattr(form, field.field_name):
-                    form_data[field.field_name] = getattr(form, field.field_name).data
+            for field_name in DynamicForm.field_names:
+                if hasattr(form, field_name):
+                    form_data[field_name] = getattr(form, field_name).data
             
             # Create request
-            service_request = ServiceRequest(
-                service_id=service.id,
-                tracking_code=generate_tracking_code()
-            )
-            service_request.set_form_data(form_data)
+            # Extract searchable fields, including the one auto-approval checks
+            indexed_fields = set(DynamicForm.indexed_field_names)
+            if service.auto_approve_field_name:
+                indexed_fields.add(service.auto_approve_field_name)
             
-            db.session.add(service_request)
+            service_request = ServiceRequest(service_id=service.id)
+            service_request.set_form_data(form_data, indexed_fields)
+            
+            add_service_request(service_request)
+            ServiceRequestStats.record(service.id, 'pending')
             db.session.commit()
         except Exception as e:
             db.session.rollback()
@@ -478,7 +746,7 @@ def request_service(service_id):
         if service.auto_approve_enabled and service.auto_approve_field_name:
             try:
                 from google_sheets_checker import check_employee_in_sheet
-                from pdf_queue_processor import add_pdf_task, wait_for_task, ProcessingStatus
+                from pdf_queue_processor import add_pdf_task, TaskPriority
                 
                 # Get the value to check
                 check_value = form_data.get(service.auto_approve_field_name, '')
@@ -495,6 +763,7 @@ def request_service(service_id):
                         try:
                             service_request.status = 'approved'
                             service_request.approval_note = 'تأیید خودکار بر اساس لیست پرسنل'
+                            ServiceRequestStats.record(service.id, 'approved', 'pending')
                             db.session.commit()
                         except Exception as e:
                             db.session.rollback()
@@ -502,27 +771,13 @@ def request_service(service_id):
                             flash('خطا در تأیید خودکار. درخواست شما ثبت شد و منتظر تأیید دستی است.', 'warning')
                             return redirect(url_for('track_request', tracking_code=service_request.tracking_code))
                         
-                        # Add PDF generation to queue
-                        def on_pdf_complete(task):
-                            """Callback when PDF is generated"""
-                            with app.app_context():
-                                try:
-                                    if task.status == ProcessingStatus.COMPLETED:
-                                        # Re-fetch the service request using the ID
-                                        sr = db.session.get(ServiceRequest, service_request.id)
-                                        if sr:
-                                            sr.pdf_filename = task.result
-                                            db.session.commit()
-                                            app.logger.info(f"PDF generated for auto-approved request: {task.result}")
-                                        else:
-                                            app.logger.error(f"Service request {service_request.id} not found in callback")
-                                    else:
-                                        app.logger.error(f"PDF generation failed for auto-approved request: {task.error}")
-                                except Exception as e:
-                                    db.session.rollback()
-                                    app.logger.error(f"Error in PDF callback: {str(e)}")
+                        if app.config['PDF_GENERATION_MODE'] == 'lazy':
+                            flash(f'درخواست شما با کد پیگیری {service_request.tracking_code} به صورت خودکار تأیید شد.', 'success')
+                            return redirect(url_for('track_request', tracking_code=service_request.tracking_code))
                         
-                        task_id = add_pdf_task(service_request, callback=on_pdf_complete)
+                        # Add PDF generation to queue
+                        task_id = add_pdf_task(service_request, callback=make_pdf_callback(service_request.id),
+                                               priority=TaskPriority.AUTO)
                         app.logger.info(f"Added PDF task {task_id} to queue")
                         
                         flash(f'درخواست شما با کد پیگیری {service_request.tracking_code} به صورت خودکار تأیید شد. PDF در حال آماده‌سازی است.', 'success')
@@ -553,9 +808,13 @@ def track_request():
         service_request = ServiceRequest.query.filter_by(tracking_code=code).first()
         
         if service_request:
+            pdf_task = None
+            if needs_lazy_pdf(service_request):
+                pdf_task = ensure_pdf_task(service_request)
             return render_template('user/request_status.html', 
                                  request=service_request, 
-                                 form_data=service_request.get_form_data())
+                                 form_data=service_request.get_form_data(),
+                                 pdf_task=pdf_task)
         else:
             flash('کد پیگیری یافت نشد.', 'warning')
     
@@ -566,70 +825,144 @@ def download_pdf(tracking_code):
     """Download approved request PDF"""
     service_request = ServiceRequest.query.filter_by(tracking_code=tracking_code).first_or_404()
     
+    # Lazy mode: start rendering and let the tracking page wait for it
+    if needs_lazy_pdf(service_request):
+        ensure_pdf_task(service_request)
+        return redirect(url_for('track_request', tracking_code=tracking_code))
+    
     if service_request.status != 'approved' or not service_request.pdf_filename:
         flash('فایل PDF موجود نیست.', 'warning')
         return redirect(url_for('track_request', tracking_code=tracking_code))
     
-    pdf_path = os.path.join(app.config['PDF_OUTPUT_FOLDER'], service_request.pdf_filename)
-    if os.path.exists(pdf_path):
-        return send_file(pdf_path, as_attachment=True, 
-                        download_name=f'request_{tracking_code}.pdf')
-    else:
+    pdf_path = pdf_storage.local_path(service_request.pdf_filename)
+    if not pdf_path:
         flash('فایل PDF یافت نشد.', 'danger')
         return redirect(url_for('track_request', tracking_code=tracking_code))
+    
+    # PDFs generated before content hashing was added get hashed on first download
+    if not service_request.pdf_sha256:
+        service_request.pdf_sha256 = ServiceRequest.file_sha256(pdf_path)
+        db.session.commit()
+    
+    # Links carrying the current content version (?v=) may be cached forever
+    return build_pdf_response(
+        pdf_path,
+        download_name=f'request_{tracking_code}.pdf',
+        etag=service_request.pdf_sha256,
+        immutable=is_current_version(request.args.get('v'), service_request.pdf_sha256),
+        max_age=app.config['PDF_CACHE_MAX_AGE'],
+        sendfile_mode=app.config['PDF_SENDFILE_MODE'],
+        accel_prefix=app.config['PDF_ACCEL_REDIRECT_PREFIX'],
+        output_folder=app.config['PDF_OUTPUT_FOLDER']
+    )
+
+@app.route('/download/<tracking_code>/status')
+def pdf_status(tracking_code):
+    """Polled by the tracking page while a lazy PDF is being generated"""
+    service_request = ServiceRequest.query.filter_by(tracking_code=tracking_code).first_or_404()
+    
+    if service_request.pdf_filename:
+        return jsonify({
+            'status': 'ready',
+            'download_url': url_for('download_pdf', tracking_code=tracking_code,
+                                    v=pdf_version(service_request.pdf_sha256))
+        })
+    
+    from pdf_queue_processor import ProcessingStatus
+    
+    task = lazy_pdf_task(service_request.id)
+    if task and task.status in (ProcessingStatus.FAILED, ProcessingStatus.CANCELLED):
+        return jsonify({'status': 'failed', 'error': task.error})
+    return jsonify({'status': 'processing'})
 
 # PDF Generation
-def generate_pdf_from_request(service_request):
-    """Generate PDF from approved request using Google Docs"""
-    service = service_request.service
-    form_data = service_request.get_form_data()
+def make_pdf_callback(request_id):
+    """Queue callback that stores a generated PDF on its request"""
+    from pdf_queue_processor import ProcessingStatus
+    
+    def on_pdf_complete(task):
+        """Callback when PDF is generated"""
+        with app.app_context():
+            try:
+                if task.status == ProcessingStatus.COMPLETED:
+                    # Re-fetch the service request using the ID
+                    sr = db.session.get(ServiceRequest, request_id)
+                    if sr:
+                        sr.attach_pdf(task.result, pdf_storage.local_path(task.result))
+                        db.session.commit()
+                        app.logger.info(f"PDF generated for request {sr.tracking_code}: {task.result}")
+                    else:
+                        app.logger.error(f"Service request {request_id} not found in callback")
+                else:
+                    app.logger.error(f"PDF generation failed for request {request_id}: {task.error}")
+                    if task.status in (ProcessingStatus.FAILED, ProcessingStatus.CANCELLED):
+                        record_pdf_failure(request_id, task)
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f"Error in PDF callback: {str(e)}")
+    
+    return on_pdf_complete
+
+# Lazy PDF renders that failed recently: request id -> (monotonic failure time, task).
+# Entries older than PDF_LAZY_RETRY_BACKOFF are dropped, so only the backoff window is kept.
+_pdf_failures = {}
+_pdf_failures_lock = threading.Lock()
+
+def record_pdf_failure(request_id, task):
+    """Remember a failed render so page views wait out the backoff before retrying it"""
+    now = time.monotonic()
+    backoff = app.config['PDF_LAZY_RETRY_BACKOFF']
+    with _pdf_failures_lock:
+        for expired in [key for key, (failed_at, _) in _pdf_failures.items() if now - failed_at >= backoff]:
+            del _pdf_failures[expired]
+        _pdf_failures[request_id] = (now, task)
+
+def recent_pdf_failure(request_id):
+    """The failed task of a request while its retry is backing off, if any"""
+    with _pdf_failures_lock:
+        entry = _pdf_failures.get(request_id)
+        if not entry:
+            return None
+        if time.monotonic() - entry[0] >= app.config['PDF_LAZY_RETRY_BACKOFF']:
+            del _pdf_failures[request_id]
+            return None
+        return entry[1]
+
+def needs_lazy_pdf(service_request):
+    """Whether an approved request should have its PDF rendered on demand"""
+    if app.config['PDF_GENERATION_MODE'] != 'lazy' or service_request.status != 'approved':
+        return False
+    return not service_request.pdf_filename or not pdf_storage.local_path(service_request.pdf_filename)
+
+def lazy_pdf_task(request_id):
+    """The in-flight PDF task of a request, or its recent failure, if any"""
+    from pdf_queue_processor import get_queue_processor
     
+    return get_queue_processor().get_active_task(request_id) or recent_pdf_failure(request_id)
+
+def ensure_pdf_task(service_request):
+    """
+    Start rendering a request's PDF unless a job for it is already running or
+    failed within the retry backoff; returns that task
+    """
+    from pdf_queue_processor import add_pdf_task, get_task_status, TaskPriority
+    
+    task = lazy_pdf_task(service_request.id)
+    if task:
+        return task
+    
+    # The queue coalesces concurrent adds for the same request into one task
+    task_id = add_pdf_task(service_request, callback=make_pdf_callback(service_request.id),
+                           priority=TaskPriority.INTERACTIVE)
+    app.logger.info(f"Added lazy PDF task {task_id} for request {service_request.tracking_code}")
+    return get_task_status(task_id)
+
+def generate_pdf_from_request(service_request):
+    """Generate PDF from approved request using a Drive copy of its template"""
     if not google_docs_service:
         raise Exception("Google Docs service not configured")
     
-    if not service.google_doc_id:
-        raise Exception("No Google Doc template configured for this service")
-    
-    try:
-        # Create a copy of the template document
-        copy_title = f"Request_{service_request.tracking_code}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        temp_doc_id = google_docs_service.create_document_copy(service.google_doc_id, copy_title)
-        
-        # Prepare replacements mapping
-        replacements = {}
-        for field in service.form_fields:
-            if field.document_placeholder:
-                value = str(form_data.get(field.field_name, ''))
-                replacements[field.document_placeholder] = value
-        
-        # Replace placeholders in the copy
-        if replacements:
-            google_docs_service.replace_placeholders_in_doc(temp_doc_id, replacements)
-        
-        # Export as PDF
-        pdf_data = google_docs_service.export_as_pdf(temp_doc_id)
-        
-        # Save PDF locally
-        pdf_filename = f"output_{service_request.tracking_code}.pdf"
-        pdf_path = os.path.join(app.config['PDF_OUTPUT_FOLDER'], pdf_filename)
-        
-        with open(pdf_path, 'wb') as f:
-            f.write(pdf_data)
-        
-        # Clean up - delete the temporary document
-        google_docs_service.delete_document(temp_doc_id)
-        
-        return pdf_filename
-        
-    except Exception as e:
-        app.logger.error(f"Error generating PDF from Google Docs: {str(e)}")
-        # Try to clean up temp doc if it exists
-        if 'temp_doc_id' in locals():
-            try:
-                google_docs_service.delete_document(temp_doc_id)
-            except:
-                pass
-        raise e
+    return render_pdf(service_request, engine='google_copy', storage=pdf_storage)
     
 
 
@@ -637,7 +970,9 @@ def generate_pdf_from_request(service_request):
 @app.cli.command()
 def init_db():
     """Initialize the database."""
+    from request_search import ensure_search_index
     db.create_all()
+    ensure_search_index()
     
     # Create default system manager if not exists
     if not User.query.filter_by(role='system_manager').first():
@@ -657,6 +992,23 @@ def init_db():
     
     print("Database initialized!")
 
+@app.cli.command()
+def rebuild_stats():
+    """Rebuild the per-service request counters."""
+    try:
+        count = ServiceRequestStats.rebuild()
+        db.session.commit()
+        print(f"Request statistics rebuilt for {count} services")
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error rebuilding request statistics: {str(e)}")
+
+@app.cli.command()
+def sweep_pdf_storage():
+    """Apply the PDF retention and compression policies once."""
+    stats = pdf_storage_sweeper.sweep()
+    print(f"Scanned {stats['scanned']} PDFs: {stats['deleted']} deleted, {stats['compressed']} compressed")
+
 
 
 # Error handlers
@@ -671,7 +1023,9 @@ def internal_error(error):
 
 if __name__ == '__main__':
     with app.app_context():
+        from request_search import ensure_search_index
         db.create_all()
+        ensure_search_index()
         
         # Create default system manager if not exists
         if not User.query.filter_by(role='system_manager').first():
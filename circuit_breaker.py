@@ -0,0 +1,158 @@
+"""
+Circuit breaker
+Stops sending work to a degraded dependency (Google Docs/Drive) once its
+recent error rate or latency crosses a threshold, and probes for recovery
+"""
+
+import time
+import threading
+import logging
+from collections import deque
+from enum import Enum
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState(Enum):
+    CLOSED = "closed"        # Normal operation
+    OPEN = "open"            # Dependency considered down; calls are not made
+    HALF_OPEN = "half_open"  # Letting probe calls through to detect recovery
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is refused because the circuit is open"""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"Circuit '{name}' is open; retry in {retry_in:.0f}s")
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Sliding-window circuit breaker tripping on failure rate or slow calls"""
+
+    def __init__(self, name: str, window_size: int = 20, min_calls: int = 5,
+                 failure_rate_threshold: float = 0.5, slow_call_seconds: float = 60.0,
+                 slow_call_rate_threshold: float = 0.8, open_seconds: float = 60.0,
+                 half_open_probes: int = 1):
+        """
+        Args:
+            name: Name used in logs
+            window_size: Number of recent calls considered
+            min_calls: Calls needed in the window before the breaker can trip
+            failure_rate_threshold: Failure fraction that opens the circuit
+            slow_call_seconds: Calls slower than this count as slow
+            slow_call_rate_threshold: Slow-call fraction that opens the circuit
+            open_seconds: Time the circuit stays open before probing
+            half_open_probes: Successful probes needed to close the circuit again
+        """
+        self.name = name
+        self.window_size = window_size
+        self.min_calls = min_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+
+        self._state = CircuitState.CLOSED
+        self._calls = deque(maxlen=window_size)  # (failed, slow)
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> CircuitState:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> CircuitState:
+        if self._state == CircuitState.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = CircuitState.HALF_OPEN
+            self._probe_in_flight = False
+            self._probe_successes = 0
+            logger.info(f"Circuit '{self.name}' half-open; probing for recovery")
+        return self._state
+
+    def allow_request(self) -> bool:
+        """Whether a call may go to the dependency now"""
+        with self._lock:
+            state = self._current_state()
+            if state == CircuitState.CLOSED:
+                return True
+            if state == CircuitState.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def retry_in(self) -> float:
+        """Seconds until the circuit lets a probe through"""
+        with self._lock:
+            if self._current_state() != CircuitState.OPEN:
+                return 0.0
+            return max(0.0, self.open_seconds - (time.monotonic() - self._opened_at))
+
+    def record(self, success: bool, duration: float):
+        """Record the outcome of a call that allow_request permitted"""
+        slow = duration >= self.slow_call_seconds
+        with self._lock:
+            state = self._current_state()
+
+            if state == CircuitState.HALF_OPEN:
+                self._probe_in_flight = False
+                if success and not slow:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_probes:
+                        self._state = CircuitState.CLOSED
+                        self._calls.clear()
+                        logger.info(f"Circuit '{self.name}' closed; dependency recovered")
+                else:
+                    self._trip("probe failed")
+                return
+
+            self._calls.append((not success, slow))
+            if state == CircuitState.CLOSED and len(self._calls) >= self.min_calls:
+                failure_rate = sum(failed for failed, _ in self._calls) / len(self._calls)
+                slow_rate = sum(slow for _, slow in self._calls) / len(self._calls)
+                if failure_rate >= self.failure_rate_threshold:
+                    self._trip(f"failure rate {failure_rate:.0%}")
+                elif slow_rate >= self.slow_call_rate_threshold:
+                    self._trip(f"slow call rate {slow_rate:.0%}")
+
+    def _trip(self, reason: str):
+        self._state = CircuitState.OPEN
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+        logger.warning(f"Circuit '{self.name}' opened: {reason}")
+
+    def snapshot(self) -> Dict:
+        """Current state for monitoring"""
+        with self._lock:
+            state = self._current_state()
+            calls = len(self._calls)
+            return {
+                'state': state.value,
+                'window_calls': calls,
+                'failure_rate': round(sum(failed for failed, _ in self._calls) / calls, 3) if calls else 0.0,
+                'retry_in': round(max(0.0, self.open_seconds - (time.monotonic() - self._opened_at)), 1)
+                            if state == CircuitState.OPEN else 0.0,
+            }
+
+
+# Shared breakers by name
+_circuit_breakers = {}
+_registry_lock = threading.Lock()
+
+def init_circuit_breaker(name: str, **settings) -> CircuitBreaker:
+    """Create (or replace) the shared breaker with the given settings"""
+    with _registry_lock:
+        _circuit_breakers[name] = CircuitBreaker(name, **settings)
+        return _circuit_breakers[name]
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    """Get or create a shared breaker with default settings"""
+    with _registry_lock:
+        if name not in _circuit_breakers:
+            _circuit_breakers[name] = CircuitBreaker(name)
+        return _circuit_breakers[name]
@@ -1,16 +1,98 @@
 import os
+import json
+from functools import partial
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 
+def build_engine_options(database_uri):
+    """SQLAlchemy engine options for the configured database"""
+    options = {
+        # Keep Persian text readable in JSON columns
+        'json_serializer': partial(json.dumps, ensure_ascii=False)
+    }
+    
+    if database_uri.startswith('sqlite'):
+        # Wait for the writer lock instead of failing with "database is locked"
+        options['connect_args'] = {
+            'timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 30000)) / 1000,
+            'check_same_thread': False
+        }
+    else:
+        options.update({
+            'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+            'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+            'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+            'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+            'pool_pre_ping': True
+        })
+    return options
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///' + os.path.join(basedir, 'service_requests.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = build_engine_options(SQLALCHEMY_DATABASE_URI)
+    
+    # SQLite connection settings, applied as PRAGMAs on every new connection
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 30000))
+    
+    # Seconds a logged-in user's id, username and role are cached in-process
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 60))
+    
+    # Google API rate limits overriding the defaults in google_api_limiter,
+    # e.g. 'docs.read=4/10,drive.export=2/5' (requests per second / burst)
+    GOOGLE_API_RATE_LIMITS = os.environ.get('GOOGLE_API_RATE_LIMITS', '')
+    
+    # Drive PDF exports: bytes per download request and transient failures resumed
+    PDF_EXPORT_CHUNK_SIZE = int(os.environ.get('PDF_EXPORT_CHUNK_SIZE', 4 * 1024 * 1024))
+    PDF_EXPORT_MAX_RESUMES = int(os.environ.get('PDF_EXPORT_MAX_RESUMES', 3))
+    
+    # Google Docs circuit breaker: trips on error rate or slow renders; while
+    # open, PDF tasks are rendered locally ('local') or held back ('park')
+    PDF_CIRCUIT_FALLBACK = os.environ.get('PDF_CIRCUIT_FALLBACK', 'local')
+    PDF_CIRCUIT_FAILURE_RATE = float(os.environ.get('PDF_CIRCUIT_FAILURE_RATE', 0.5))
+    PDF_CIRCUIT_SLOW_CALL_SECONDS = float(os.environ.get('PDF_CIRCUIT_SLOW_CALL_SECONDS', 60))
+    PDF_CIRCUIT_OPEN_SECONDS = float(os.environ.get('PDF_CIRCUIT_OPEN_SECONDS', 60))
+    
+    # PDF engine for services that do not choose one: 'google_inplace',
+    # 'google_nocopy', 'google_copy' or 'local'
+    PDF_DEFAULT_ENGINE = os.environ.get('PDF_DEFAULT_ENGINE', 'google_inplace')
+    
+    # Bearer token required by /metrics (Prometheus scrapes); empty disables the endpoint
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
     
     # Output folder
     PDF_OUTPUT_FOLDER = os.path.join(basedir, 'pdf_outputs')
     
+    # 'eager' renders the PDF at approval time; 'lazy' waits for the first
+    # download or tracking page view
+    PDF_GENERATION_MODE = os.environ.get('PDF_GENERATION_MODE', 'eager')
+    # Seconds a failed lazy render is reported as failed before a page view retries it
+    PDF_LAZY_RETRY_BACKOFF = int(os.environ.get('PDF_LAZY_RETRY_BACKOFF', 300))
+    
+    # PDF storage: shard directory levels, and retention/compression policies
+    # applied by the background sweeper (0 disables a policy)
+    PDF_STORAGE_SHARD_DEPTH = int(os.environ.get('PDF_STORAGE_SHARD_DEPTH', 2))
+    PDF_RETENTION_DAYS = float(os.environ.get('PDF_RETENTION_DAYS', 0))
+    PDF_COMPRESS_AFTER_DAYS = float(os.environ.get('PDF_COMPRESS_AFTER_DAYS', 0))
+    PDF_SWEEP_INTERVAL = int(os.environ.get('PDF_SWEEP_INTERVAL', 3600))
+    
+    # Copy-based generation: idle template copies kept per google_doc_id (0 disables
+    # the pool), their maximum idle age in seconds, and how used copies are reset
+    # ('restore' undoes the render's edits, 'recopy' replaces the copy)
+    DRIVE_COPY_POOL_SIZE = int(os.environ.get('DRIVE_COPY_POOL_SIZE', 2))
+    DRIVE_COPY_POOL_MAX_AGE = float(os.environ.get('DRIVE_COPY_POOL_MAX_AGE', 3600))
+    DRIVE_COPY_POOL_RESET = os.environ.get('DRIVE_COPY_POOL_RESET', 'restore')
+    
+    # PDF downloads: '' streams from Python, 'x-accel-redirect' (nginx) or
+    # 'x-sendfile' (Apache/lighttpd) hands the transfer to the front proxy
+    PDF_SENDFILE_MODE = os.environ.get('PDF_SENDFILE_MODE', '')
+    PDF_ACCEL_REDIRECT_PREFIX = os.environ.get('PDF_ACCEL_REDIRECT_PREFIX', '/protected/pdf_outputs/')
+    PDF_CACHE_MAX_AGE = int(os.environ.get('PDF_CACHE_MAX_AGE', 31536000))
+    
     # File upload settings
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     ALLOWED_EXTENSIONS = {'docx', 'ttf', 'otf'}
@@ -4,11 +4,41 @@ Database utility functions for safe session management
 
 from functools import wraps
 from flask import current_app
+from sqlalchemy import event
 from sqlalchemy.exc import SQLAlchemyError
 import logging
 
 logger = logging.getLogger(__name__)
 
+def configure_sqlite_engine(engine, journal_mode='WAL', synchronous='NORMAL', busy_timeout_ms=30000):
+    """
+    Apply concurrency PRAGMAs to every new SQLite connection
+    
+    WAL lets readers run alongside the single writer, and the busy timeout
+    makes writers wait for the lock instead of raising "database is locked".
+    
+    Args:
+        engine: SQLAlchemy engine
+        journal_mode: SQLite journal mode (WAL, DELETE, ...)
+        synchronous: SQLite synchronous level (NORMAL is safe with WAL)
+        busy_timeout_ms: Milliseconds to wait for a locked database
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+    
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(f'PRAGMA journal_mode={journal_mode}')
+            cursor.execute(f'PRAGMA synchronous={synchronous}')
+            cursor.execute(f'PRAGMA busy_timeout={int(busy_timeout_ms)}')
+        finally:
+            cursor.close()
+    
+    # Connections opened before the listener was registered keep old settings
+    engine.dispose()
+
 def safe_commit(session, error_message="Database error occurred"):
     """
     Safely commit database changes with automatic rollback on error
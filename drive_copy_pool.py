@@ -0,0 +1,291 @@
+"""
+Drive copy pool
+Keeps ready-made copies of each Google Docs template so copy-based generation
+can check one out instantly; copying, resetting and deleting copies happen on
+a background thread instead of on the request path
+"""
+
+import time
+import queue
+import threading
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PooledCopy:
+    """One Drive copy of a template"""
+    doc_id: str
+    template_id: str
+    created_at: float = field(default_factory=time.time)
+    uses: int = 0
+    generation: int = 0  # Pool invalidation count when the copy was started
+
+
+class DriveCopyPool:
+    """Per-template pool of pre-warmed Drive copies"""
+
+    RESET_MODES = ('restore', 'recopy')
+
+    def __init__(self, docs_service, size: int = 2, max_age: float = 3600, max_uses: int = 100,
+                 reset_mode: str = 'restore', check_interval: float = 60):
+        """
+        Args:
+            docs_service: Object with create_document_copy(doc_id, title) and delete_document(doc_id)
+            size: Idle copies kept ready per template
+            max_age: Seconds before an idle copy is replaced, so template edits reach the pool
+            max_uses: Renders a copy serves before it is replaced regardless of reset
+            reset_mode: 'restore' puts used copies back after undoing their edits;
+                        'recopy' deletes used copies and makes fresh ones
+            check_interval: Seconds between expiry checks on the background thread
+        """
+        if reset_mode not in self.RESET_MODES:
+            raise ValueError(f"Unknown reset mode: {reset_mode}")
+
+        self.docs_service = docs_service
+        self.size = size
+        self.max_age = max_age
+        self.max_uses = max_uses
+        self.reset_mode = reset_mode
+        self.check_interval = check_interval
+
+        self._idle = {}          # template_id -> deque of PooledCopy
+        self._creating = {}      # template_id -> copies being made
+        self._generation = 0     # Bumped by every invalidate()
+        self._invalidated = {}   # template_id -> generation of its last invalidation
+        self._invalidated_all = 0  # Generation of the last invalidation of every template
+        self._lock = threading.Lock()
+        self._jobs = queue.Queue()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.stats = {'hits': 0, 'misses': 0, 'created': 0, 'reset': 0, 'deleted': 0, 'reset_failures': 0}
+
+    def start(self):
+        """Start the background worker"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        logger.info(f"Drive copy pool started (size {self.size}, reset mode {self.reset_mode})")
+
+    def stop(self):
+        """Stop the background worker; idle copies are left for drain()"""
+        self._stop_event.set()
+        self._jobs.put(None)  # Wake the worker
+        if self._thread:
+            self._thread.join(timeout=5)
+        logger.info("Drive copy pool stopped")
+
+    def checkout(self, template_id: str) -> PooledCopy:
+        """
+        Take a ready copy of a template, making one on the spot if the pool is empty
+
+        Returns:
+            The copy; hand it back with checkin() or discard()
+        """
+        with self._lock:
+            idle = self._idle.setdefault(template_id, deque())
+            copy = idle.popleft() if idle else None
+            self.stats['hits' if copy else 'misses'] += 1
+
+        if copy is None:
+            copy = self._create(template_id)
+        copy.uses += 1
+
+        self._submit(('refill', template_id))
+        return copy
+
+    def checkin(self, copy: PooledCopy, reset: Optional[Callable[[str], bool]] = None):
+        """
+        Return a used copy
+
+        Args:
+            copy: Copy from checkout()
+            reset: Undoes the render's edits and returns True if the copy matches the
+                   template again; without it (or in 'recopy' mode) the copy is replaced
+        """
+        if self.reset_mode == 'restore' and reset and copy.uses < self.max_uses and not self._is_stale(copy):
+            self._submit(('reset', copy, reset))
+        else:
+            self.discard(copy)
+
+    def discard(self, copy: PooledCopy):
+        """Delete a copy that can not be reused and make a replacement"""
+        self._submit(('delete', copy.doc_id))
+        self._submit(('refill', copy.template_id))
+
+    def invalidate(self, template_id: Optional[str] = None):
+        """
+        Replace the idle copies of one template (or all) after it changed
+
+        Copies that are checked out, resetting or being made at the time are
+        deleted when they come back instead of rejoining the pool.
+        """
+        with self._lock:
+            self._generation += 1
+            if template_id:
+                self._invalidated[template_id] = self._generation
+            else:
+                self._invalidated_all = self._generation
+            template_ids = [template_id] if template_id else list(self._idle)
+            stale = [copy for tid in template_ids for copy in self._idle.pop(tid, ())]
+        for copy in stale:
+            self._submit(('delete', copy.doc_id))
+        logger.info(f"Invalidated {len(stale)} pooled copies")
+
+    def drain(self) -> int:
+        """Delete every idle copy (e.g. on shutdown); returns how many were deleted"""
+        with self._lock:
+            copies = [copy for idle in self._idle.values() for copy in idle]
+            self._idle.clear()
+        for copy in copies:
+            self._delete(copy.doc_id)
+        return len(copies)
+
+    def snapshot(self) -> Dict:
+        """Pool state for monitoring"""
+        with self._lock:
+            templates = {template_id: {'idle': len(idle), 'creating': self._creating.get(template_id, 0)}
+                         for template_id, idle in self._idle.items()}
+            return {
+                'size': self.size,
+                'reset_mode': self.reset_mode,
+                'templates': templates,
+                'pending_jobs': self._jobs.qsize(),
+                **self.stats,
+            }
+
+    def _submit(self, job):
+        # Without a worker (tests, CLI) the job runs inline rather than leaking copies
+        if self._thread and self._thread.is_alive():
+            self._jobs.put(job)
+        else:
+            self._execute(job)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                job = self._jobs.get(timeout=self.check_interval)
+            except queue.Empty:
+                self._expire()
+                continue
+            if job:
+                self._execute(job)
+
+    def _execute(self, job):
+        kind = job[0]
+        try:
+            if kind == 'refill':
+                self._refill(job[1])
+            elif kind == 'reset':
+                self._reset(job[1], job[2])
+            elif kind == 'delete':
+                self._delete(job[1])
+        except Exception as e:
+            logger.error(f"Drive copy pool {kind} failed: {str(e)}")
+
+    def _is_stale(self, copy: PooledCopy) -> bool:
+        """Whether the copy's template was invalidated after the copy was started"""
+        with self._lock:
+            return self._stale(copy)
+
+    def _stale(self, copy: PooledCopy) -> bool:
+        # Caller holds self._lock
+        invalidated = max(self._invalidated.get(copy.template_id, 0), self._invalidated_all)
+        return copy.generation < invalidated
+
+    def _create(self, template_id: str) -> PooledCopy:
+        with self._lock:
+            generation = self._generation
+        title = f"PoolCopy_{template_id[:8]}_{time.strftime('%Y%m%d_%H%M%S')}"
+        doc_id = self.docs_service.create_document_copy(template_id, title)
+        with self._lock:
+            self.stats['created'] += 1
+        return PooledCopy(doc_id=doc_id, template_id=template_id, generation=generation)
+
+    def _refill(self, template_id: str):
+        while True:
+            with self._lock:
+                idle = self._idle.setdefault(template_id, deque())
+                if len(idle) + self._creating.get(template_id, 0) >= self.size:
+                    return
+                self._creating[template_id] = self._creating.get(template_id, 0) + 1
+            try:
+                copy = self._create(template_id)
+                with self._lock:
+                    stale = self._stale(copy)
+                    if not stale:
+                        self._idle.setdefault(template_id, deque()).append(copy)
+                if stale:
+                    # Copied from the template as it was before an invalidate()
+                    self._delete(copy.doc_id)
+            finally:
+                with self._lock:
+                    self._creating[template_id] -= 1
+
+    def _reset(self, copy: PooledCopy, reset: Callable[[str], bool]):
+        try:
+            clean = reset(copy.doc_id)
+        except Exception as e:
+            logger.warning(f"Resetting pooled copy {copy.doc_id} failed: {str(e)}")
+            clean = False
+
+        if not clean:
+            with self._lock:
+                self.stats['reset_failures'] += 1
+            self.discard(copy)
+            return
+
+        with self._lock:
+            self.stats['reset'] += 1
+            stale = self._stale(copy)
+            idle = self._idle.setdefault(copy.template_id, deque())
+            if not stale and len(idle) < self.size:
+                idle.append(copy)
+                return
+        if stale:
+            # Template changed while this copy was out
+            self.discard(copy)
+            return
+        # Pool already full (e.g. refilled while this copy was out)
+        self._delete(copy.doc_id)
+
+    def _delete(self, doc_id: str):
+        self.docs_service.delete_document(doc_id)
+        with self._lock:
+            self.stats['deleted'] += 1
+
+    def _expire(self, now: Optional[float] = None):
+        """Replace idle copies older than max_age"""
+        now = now or time.time()
+        expired = []
+        with self._lock:
+            for template_id, idle in self._idle.items():
+                fresh = deque(copy for copy in idle if now - copy.created_at < self.max_age)
+                expired.extend(copy for copy in idle if now - copy.created_at >= self.max_age)
+                self._idle[template_id] = fresh
+        for copy in expired:
+            self._execute(('delete', copy.doc_id))
+            self._execute(('refill', copy.template_id))
+
+
+# Global pool instance
+_copy_pool = None
+
+def init_copy_pool(docs_service, **settings) -> DriveCopyPool:
+    """Create the shared pool and start its worker"""
+    global _copy_pool
+    if _copy_pool:
+        _copy_pool.stop()
+    _copy_pool = DriveCopyPool(docs_service, **settings)
+    _copy_pool.start()
+    return _copy_pool
+
+def get_copy_pool() -> Optional[DriveCopyPool]:
+    """Get the shared pool, or None when pooling is disabled"""
+    return _copy_pool
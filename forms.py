@@ -3,6 +3,7 @@ from flask_wtf.file import FileField, FileRequired, FileAllowed
 from wtforms import StringField, PasswordField, TextAreaField, SelectField, BooleanField, IntegerField, FieldList, FormField
 from wtforms.validators import DataRequired, Email, Length, EqualTo, ValidationError
 import re
+import threading
 
 # Custom validator for Persian text
 class PersianTextValidator:
@@ -47,6 +48,13 @@ class ServiceForm(FlaskForm):
     description = TextAreaField('توضیحات')
     google_doc_id = StringField('شناسه Google Docs', validators=[DataRequired()], 
                                render_kw={'placeholder': 'مثال: 1BxiMVs0XRA5nFMdKvBdBZjgmUUqptlbs74OgvE2upms'})
+    pdf_engine = SelectField('موتور تولید PDF', choices=[
+        ('', 'پیش‌فرض سامانه'),
+        ('google_inplace', 'Google Docs (ویرایش موقت قالب)'),
+        ('google_nocopy', 'Google Docs (بدون کپی)'),
+        ('google_copy', 'Google Docs (کپی از قالب)'),
+        ('local', 'تولید محلی (بدون Google)')
+    ], default='')
 
 class FormFieldForm(FlaskForm):
     field_label = StringField('برچسب فیلد', validators=[DataRequired()])
@@ -62,12 +70,75 @@ class FormFieldForm(FlaskForm):
     is_required = BooleanField('اجباری')
     placeholder = StringField('متن راهنما')
     document_placeholder = StringField('جایگزین در سند', validators=[DataRequired()])
+    is_indexed = BooleanField('قابل جستجو')
     options = TextAreaField('گزینه‌ها (هر خط یک گزینه)')
 
 class ServiceRequestForm(FlaskForm):
     # Dynamic form - fields will be added at runtime
     pass
 
+def build_service_request_form(form_fields):
+    """Build a ServiceRequestForm subclass from a service's ordered form fields"""
+    class DynamicForm(ServiceRequestForm):
+        pass
+    
+    form_fields = list(form_fields)
+    field_names = []
+    for field in form_fields:
+        field_class = None
+        validators = []
+        field_names.append(field.field_name)
+        
+        if field.is_required:
+            validators.append(DataRequired(message='این فیلد اجباری است'))
+        
+        if field.field_type == 'text':
+            field_class = StringField
+        elif field.field_type == 'number':
+            field_class = IntegerField
+        elif field.field_type == 'email':
+            field_class = StringField
+            validators.append(Email(message='ایمیل معتبر وارد کنید'))
+        elif field.field_type == 'textarea':
+            field_class = TextAreaField
+        elif field.field_type == 'select':
+            choices = [(opt, opt) for opt in field.get_options()]
+            setattr(DynamicForm, field.field_name, 
+                   SelectField(field.field_label, choices=choices, validators=validators))
+            continue
+        else:
+            field_class = StringField
+        
+        if field_class:
+            setattr(DynamicForm, field.field_name, 
+                   field_class(field.field_label, validators=validators, 
+                             render_kw={'placeholder': field.placeholder}))
+    
+    DynamicForm.field_names = field_names
+    DynamicForm.indexed_field_names = [field.field_name for field in form_fields if field.is_indexed]
+    return DynamicForm
+
+# Compiled form classes: service_id -> (form_version, form class)
+_service_form_cache = {}
+_service_form_cache_lock = threading.Lock()
+
+def get_service_request_form(service):
+    """
+    Get the compiled form class for a service, rebuilding it only when
+    the service's form_version has changed
+    """
+    with _service_form_cache_lock:
+        cached = _service_form_cache.get(service.id)
+    if cached and cached[0] == service.form_version:
+        return cached[1]
+    
+    from models import FormField
+    form_class = build_service_request_form(service.form_fields.order_by(FormField.field_order))
+    
+    with _service_form_cache_lock:
+        _service_form_cache[service.id] = (service.form_version, form_class)
+    return form_class
+
 class ApprovalForm(FlaskForm):
     action = SelectField('عملیات', choices=[('approve', 'تایید'), ('reject', 'رد')], validators=[DataRequired()])
     note = TextAreaField('یادداشت')
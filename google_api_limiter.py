@@ -0,0 +1,258 @@
+"""
+Google API rate limiter
+Shared token buckets per API and method class (read, write, export) that every
+Google client goes through, with Retry-After aware backoff on quota errors
+"""
+
+import time
+import random
+import threading
+import logging
+from typing import Callable, Dict, Optional, Tuple
+
+try:
+    from googleapiclient.errors import HttpError
+except ImportError:
+    class HttpError(Exception):
+        """Placeholder so the limiter imports without the Google client installed"""
+
+logger = logging.getLogger(__name__)
+
+# (requests per second, burst capacity) per (api, method class); roughly a
+# quarter of Google's default per-project quotas so bursts stay well clear of 429s
+DEFAULT_RATE_LIMITS = {
+    ('docs', 'read'): (4.0, 10),
+    ('docs', 'write'): (1.0, 5),
+    ('drive', 'read'): (10.0, 20),
+    ('drive', 'write'): (3.0, 10),
+    ('drive', 'export'): (2.0, 5),
+    ('sheets', 'read'): (1.0, 5),
+}
+
+# Google API calls one PDF render makes: document get x2 (snapshot and restore
+# check), batchUpdate x2 (replace and restore) and the export
+PDF_RENDER_COST = {
+    ('docs', 'read'): 2,
+    ('docs', 'write'): 2,
+    ('drive', 'export'): 1,
+}
+
+RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded', 'quotaExceeded')
+
+
+class RateLimitError(Exception):
+    """Raised when a call can not be made within the allowed wait"""
+
+    def __init__(self, message: str, retry_after: float = 0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Thread-safe token bucket with a penalty window for Retry-After"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, tokens: float = 1) -> float:
+        """Seconds until tokens could be taken, without taking them"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            penalty = max(0.0, self._blocked_until - now)
+            shortfall = max(0.0, tokens - self._tokens)
+            return max(penalty, shortfall / self.rate)
+
+    def acquire(self, tokens: float = 1, max_wait: Optional[float] = None) -> float:
+        """
+        Take tokens, sleeping until they are available
+
+        Returns:
+            Seconds spent waiting
+
+        Raises:
+            RateLimitError: The wait would exceed max_wait
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                penalty = self._blocked_until - now
+                if penalty <= 0 and self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = max(penalty, (tokens - self._tokens) / self.rate)
+
+            if max_wait is not None and waited + delay > max_wait:
+                raise RateLimitError(f"Rate limit wait of {delay:.1f}s exceeds {max_wait}s", delay)
+            time.sleep(delay)
+            waited += delay
+
+    def block_for(self, seconds: float):
+        """Stop handing out tokens for the given time (server asked us to back off)"""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._tokens = 0
+
+    def headroom(self) -> float:
+        """Fraction of the burst capacity currently available (0 while blocked)"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self._blocked_until > now:
+                return 0.0
+            return self._tokens / self.capacity
+
+    def cooldown_remaining(self) -> float:
+        """Seconds left in a server-requested back-off"""
+        with self._lock:
+            return max(0.0, self._blocked_until - time.monotonic())
+
+
+class GoogleAPILimiter:
+    """Registry of token buckets shared by all Google API clients"""
+
+    def __init__(self, limits: Optional[Dict[Tuple[str, str], Tuple[float, float]]] = None,
+                 max_wait: float = 120.0, max_retries: int = 5, base_backoff: float = 1.0):
+        """
+        Args:
+            limits: (api, method_class) -> (rate per second, burst capacity)
+            max_wait: Longest a caller waits for a token before RateLimitError
+            max_retries: Retries for calls rejected with a rate-limit error
+            base_backoff: First back-off in seconds when no Retry-After is sent
+        """
+        merged = dict(DEFAULT_RATE_LIMITS)
+        merged.update(limits or {})
+        self.buckets = {key: TokenBucket(rate, capacity) for key, (rate, capacity) in merged.items()}
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self._lock = threading.Lock()
+
+    def bucket(self, api: str, method_class: str) -> TokenBucket:
+        """Bucket for an API and method class, created with a conservative default if unknown"""
+        key = (api, method_class)
+        with self._lock:
+            if key not in self.buckets:
+                self.buckets[key] = TokenBucket(1.0, 5)
+            return self.buckets[key]
+
+    def call(self, api: str, method_class: str, fn: Callable, *args, **kwargs):
+        """
+        Call fn once a token is available, retrying rate-limit rejections
+
+        Args:
+            api: 'docs', 'drive' or 'sheets'
+            method_class: 'read', 'write' or 'export'
+            fn: Function making exactly one HTTP request
+
+        Returns:
+            Whatever fn returns
+        """
+        bucket = self.bucket(api, method_class)
+        attempt = 0
+        while True:
+            bucket.acquire(max_wait=self.max_wait)
+            try:
+                return fn(*args, **kwargs)
+            except HttpError as error:
+                if not self.is_rate_limit_error(error) or attempt >= self.max_retries:
+                    raise
+                delay = self.retry_after(error)
+                if delay is None:
+                    # Exponential back-off with jitter
+                    delay = self.base_backoff * (2 ** attempt) * (0.5 + random.random())
+                attempt += 1
+                logger.warning(f"Google {api}.{method_class} rate limited; backing off {delay:.1f}s "
+                               f"(attempt {attempt}/{self.max_retries})")
+                # Everyone using this bucket backs off, not just this caller
+                bucket.block_for(delay)
+
+    def execute(self, request, api: str, method_class: str):
+        """Execute a googleapiclient request through the limiter"""
+        return self.call(api, method_class, request.execute)
+
+    @staticmethod
+    def is_rate_limit_error(error: HttpError) -> bool:
+        status = getattr(error.resp, 'status', None)
+        if status in (429, 503):
+            return True
+        if status == 403:
+            content = error.content.decode('utf-8', 'ignore') if isinstance(error.content, bytes) else str(error.content)
+            return any(reason in content for reason in RATE_LIMIT_REASONS)
+        return False
+
+    @staticmethod
+    def retry_after(error: HttpError) -> Optional[float]:
+        """Seconds from the Retry-After header, if the server sent one"""
+        try:
+            value = error.resp.get('retry-after')
+            return float(value) if value is not None else None
+        except (AttributeError, TypeError, ValueError):
+            return None
+
+    def wait_time(self, costs: Dict[Tuple[str, str], float]) -> float:
+        """Seconds until every bucket could cover the given costs"""
+        return max((self.bucket(api, method_class).wait_time(tokens)
+                    for (api, method_class), tokens in costs.items()), default=0.0)
+
+    def cooldown_remaining(self) -> float:
+        """Longest server-requested back-off still in effect"""
+        with self._lock:
+            buckets = list(self.buckets.values())
+        return max((bucket.cooldown_remaining() for bucket in buckets), default=0.0)
+
+    def headroom(self) -> Dict[str, float]:
+        """Available fraction of each bucket, keyed 'api.method_class'"""
+        with self._lock:
+            buckets = dict(self.buckets)
+        return {f"{api}.{method_class}": round(bucket.headroom(), 3)
+                for (api, method_class), bucket in sorted(buckets.items())}
+
+
+def parse_rate_limits(spec: str) -> Dict[Tuple[str, str], Tuple[float, float]]:
+    """
+    Parse limits like 'docs.read=4/10,drive.export=2/5' (rate per second / burst)
+    
+    Returns:
+        (api, method_class) -> (rate, capacity)
+    """
+    limits = {}
+    for item in filter(None, (part.strip() for part in (spec or '').split(','))):
+        name, _, value = item.partition('=')
+        api, _, method_class = name.strip().partition('.')
+        rate, _, capacity = value.partition('/')
+        limits[(api, method_class)] = (float(rate), float(capacity or rate))
+    return limits
+
+
+# Global limiter instance
+_api_limiter = None
+
+def init_api_limiter(limits: Optional[Dict[Tuple[str, str], Tuple[float, float]]] = None,
+                     **kwargs) -> GoogleAPILimiter:
+    """Initialize the shared limiter with configured limits"""
+    global _api_limiter
+    _api_limiter = GoogleAPILimiter(limits, **kwargs)
+    return _api_limiter
+
+def get_api_limiter() -> GoogleAPILimiter:
+    """Get or create the shared limiter"""
+    global _api_limiter
+    if _api_limiter is None:
+        _api_limiter = GoogleAPILimiter()
+    return _api_limiter
+
+def execute_with_limit(request, api: str, method_class: str):
+    """Execute a googleapiclient request through the shared limiter"""
+    return get_api_limiter().execute(request, api, method_class)
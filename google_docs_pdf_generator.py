@@ -7,8 +7,10 @@ Generates PDF from Google Docs while preserving all styles, fonts, and formattin
 import os
 import time
 import logging
+import threading
 from typing import Dict, Optional, List, Tuple, Any
 import re
+from dataclasses import dataclass, field
 from datetime import datetime
 
 # Google API imports
@@ -16,15 +18,68 @@ try:
     from googleapiclient.discovery import build
     from googleapiclient.errors import HttpError
     from google.oauth2 import service_account
-    from googleapiclient.http import MediaIoBaseDownload
-    import io
     GOOGLE_API_AVAILABLE = True
 except ImportError:
     GOOGLE_API_AVAILABLE = False
     print("Warning: Google API libraries not installed. Install with: pip install google-api-python-client google-auth")
 
+from google_api_limiter import execute_with_limit
+from pdf_exporter import ExportStats, get_pdf_exporter
+from pdf_backends import build_replacements
+from pipeline_metrics import get_pipeline_metrics
+
 logger = logging.getLogger(__name__)
 
+
+# In-place renders of the same template must not interleave their edits
+_document_locks = {}
+_document_locks_guard = threading.Lock()
+
+def document_lock(document_id: str) -> threading.Lock:
+    """Lock serializing in-place edits to one template document"""
+    with _document_locks_guard:
+        if document_id not in _document_locks:
+            _document_locks[document_id] = threading.Lock()
+        return _document_locks[document_id]
+
+def utf16_len(text: str) -> int:
+    """Length of text in UTF-16 code units, the unit Docs API indexes count in"""
+    return len(text.encode('utf-16-le')) // 2
+
+
+@dataclass
+class RenderReport:
+    """Google API usage of one render job"""
+    document_id: str
+    placeholder_occurrences: int = 0
+    distinct_placeholders: int = 0
+    replace_requests: int = 0
+    restore_requests: int = 0
+    restore_verified: Optional[bool] = None
+    export: Optional[Dict[str, Any]] = None
+    api_calls: Dict[str, int] = field(default_factory=dict)
+    
+    def count_call(self, name: str):
+        self.api_calls[name] = self.api_calls.get(name, 0) + 1
+    
+    @property
+    def total_api_calls(self) -> int:
+        return sum(self.api_calls.values())
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'document_id': self.document_id,
+            'placeholder_occurrences': self.placeholder_occurrences,
+            'distinct_placeholders': self.distinct_placeholders,
+            'replace_requests': self.replace_requests,
+            'restore_requests': self.restore_requests,
+            'restore_verified': self.restore_verified,
+            'export': self.export,
+            'api_calls': dict(self.api_calls),
+            'total_api_calls': self.total_api_calls,
+        }
+
+
 class GoogleDocsPDFGenerator:
     """
     Generate PDF from Google Docs with temporary placeholder replacement
@@ -58,78 +113,86 @@ class GoogleDocsPDFGenerator:
         self.docs_service = build('docs', 'v1', credentials=self.credentials)
         self.drive_service = build('drive', 'v3', credentials=self.credentials)
         
+        # API usage of the most recent generate_pdf_with_replacements call
+        self.last_report: Optional[RenderReport] = None
+        
         logger.info("Google Docs PDF Generator initialized")
     
-    def _extract_all_text_with_positions(self, document: dict) -> List[Tuple[str, int, int]]:
+    @staticmethod
+    def _extract_all_text_with_positions(document: dict) -> List[Tuple[str, int, int, Optional[str]]]:
         """
         Extract all text from document with their positions
         
         Returns:
-            List of tuples (text, start_index, end_index)
+            List of tuples (text, start_index, end_index, segment_id); segment_id is
+            None for the body and the header/footer id otherwise
         """
         text_elements = []
         
-        def extract_from_element(element, parent_offset=0):
+        def extract_from_element(element, segment_id=None):
             if 'paragraph' in element:
                 paragraph = element['paragraph']
                 for elem in paragraph.get('elements', []):
                     if 'textRun' in elem:
                         text_run = elem['textRun']
                         content = text_run.get('content', '')
-                        start = elem.get('startIndex', 0) + parent_offset
-                        end = elem.get('endIndex', 0) + parent_offset
+                        start = elem.get('startIndex', 0)
+                        end = elem.get('endIndex', 0)
                         if content.strip():  # Only add non-empty text
-                            text_elements.append((content, start, end))
+                            text_elements.append((content, start, end, segment_id))
             
             elif 'table' in element:
                 table = element['table']
                 for row in table.get('tableRows', []):
                     for cell in row.get('tableCells', []):
                         for content_elem in cell.get('content', []):
-                            extract_from_element(content_elem, parent_offset)
+                            extract_from_element(content_elem, segment_id)
         
         # Extract from body
         body = document.get('body', {})
         for element in body.get('content', []):
             extract_from_element(element)
         
-        # Extract from headers and footers
+        # Extract from headers and footers (indexes there are relative to the segment)
         for header_id, header in document.get('headers', {}).items():
             for element in header.get('content', []):
-                extract_from_element(element)
+                extract_from_element(element, header_id)
                 
         for footer_id, footer in document.get('footers', {}).items():
             for element in footer.get('content', []):
-                extract_from_element(element)
+                extract_from_element(element, footer_id)
         
         return text_elements
     
-    def _find_placeholders_with_positions(self, document: dict) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _find_placeholders_with_positions(document: dict) -> List[Dict[str, Any]]:
         """
         Find all placeholders in document with their exact positions
         
         Returns:
-            List of placeholder info with text, start, and end positions
+            List of placeholder info with text, segment_id, start, and end positions
+            (Docs indexes, counted in UTF-16 code units)
         """
         placeholders = []
-        text_elements = self._extract_all_text_with_positions(document)
+        text_elements = GoogleDocsPDFGenerator._extract_all_text_with_positions(document)
         
         # Regex pattern for placeholders like {{name}}, {{date}}, etc.
         placeholder_pattern = re.compile(r'\{\{([^}]+)\}\}')
         
-        for text, start_pos, end_pos in text_elements:
+        for text, start_pos, end_pos, segment_id in text_elements:
             # Find all placeholders in this text element
             for match in placeholder_pattern.finditer(text):
                 placeholder_text = match.group(0)  # Full placeholder with {{}}
                 placeholder_name = match.group(1)  # Just the name inside
                 
                 # Calculate absolute position in document
-                match_start = start_pos + match.start()
-                match_end = start_pos + match.end()
+                match_start = start_pos + utf16_len(text[:match.start()])
+                match_end = match_start + utf16_len(placeholder_text)
                 
                 placeholders.append({
                     'text': placeholder_text,
                     'name': placeholder_name,
+                    'segment_id': segment_id,
                     'start': match_start,
                     'end': match_end,
                     'original_text': text
@@ -140,22 +203,31 @@ class GoogleDocsPDFGenerator:
         
         return placeholders
     
-    def _create_replacement_requests(self, placeholders: List[Dict], replacements: Dict[str, str]) -> List[Dict]:
+    @staticmethod
+    def _resolve_replacements(placeholders: List[Dict], replacements: Dict[str, str]) -> List[Tuple[str, str]]:
         """
-        Create batch update requests for replacing placeholders
+        Pair each distinct placeholder in the document with its replacement value
+        
+        Each value is looked up once per distinct placeholder, however often it
+        appears. Placeholders without a value, or whose value is the placeholder
+        itself, are left out.
         
         Args:
             placeholders: List of placeholder info from _find_placeholders_with_positions
             replacements: Dict mapping placeholder names to replacement values
             
         Returns:
-            List of Google Docs API requests
+            (placeholder_text, value) pairs in document order
         """
-        requests = []
+        pairs = []
+        seen = set()
         
-        for placeholder in placeholders:
+        for placeholder in reversed(placeholders):
             placeholder_name = placeholder['name']
             placeholder_text = placeholder['text']
+            if placeholder_text in seen:
+                continue
+            seen.add(placeholder_text)
             
             # Get replacement value
             if placeholder_name in replacements:
@@ -166,55 +238,100 @@ class GoogleDocsPDFGenerator:
                 # Skip if no replacement found
                 continue
             
-            # Create replace request
-            requests.append({
-                'replaceAllText': {
-                    'containsText': {
-                        'text': placeholder_text,
-                        'matchCase': True
-                    },
-                    'replaceText': replacement_value
-                }
-            })
+            if replacement_value != placeholder_text:
+                pairs.append((placeholder_text, replacement_value))
         
-        return requests
+        return pairs
     
-    def _create_restoration_requests(self, placeholders: List[Dict], replacements: Dict[str, str]) -> List[Dict]:
+    @staticmethod
+    def _plan_range_edits(placeholders: List[Dict], replacements: Dict[str, str]) -> Tuple[List[Tuple], List[Tuple]]:
         """
-        Create requests to restore original placeholders
+        Plan exact-range edits that fill the placeholders and later put them back
+        
+        Restoring by searching for the value is ambiguous: a short value ("1", a
+        name) can also occur in the template's static text. Instead the position
+        each value lands at is worked out here, so the restore edits exactly those
+        ranges and nothing else.
+        
+        Args:
+            placeholders: List of placeholder info from _find_placeholders_with_positions
+            replacements: Dict mapping placeholder names to replacement values
+            
+        Returns:
+            (forward_edits, restore_edits), each a list of
+            (segment_id, start, end, new_text) against the document state it applies to
         """
-        requests = []
-        processed_replacements = set()
+        values = dict(GoogleDocsPDFGenerator._resolve_replacements(placeholders, replacements))
+        forward_edits = []
+        restore_edits = []
+        shifts = {}  # segment_id -> index shift caused by earlier edits in that segment
+        
+        for placeholder in sorted(placeholders, key=lambda p: (p.get('segment_id') or '', p['start'])):
+            value = values.get(placeholder['text'])
+            if value is None:
+                continue
+            
+            segment_id = placeholder.get('segment_id')
+            shift = shifts.get(segment_id, 0)
+            forward_edits.append((segment_id, placeholder['start'], placeholder['end'], value))
+            
+            new_start = placeholder['start'] + shift
+            restore_edits.append((segment_id, new_start, new_start + utf16_len(value), placeholder['text']))
+            shifts[segment_id] = shift + utf16_len(value) - (placeholder['end'] - placeholder['start'])
         
-        for placeholder in placeholders:
-            placeholder_name = placeholder['name']
-            placeholder_text = placeholder['text']
+        return forward_edits, restore_edits
+    
+    @staticmethod
+    def _create_range_edit_requests(edits: List[Tuple]) -> List[Dict]:
+        """
+        Create batch update requests replacing exact ranges
+        
+        New text is inserted after the first character of the range it replaces so it
+        inherits that character's style, then the old characters are deleted. Edits are
+        applied from the end of each segment backwards so earlier indexes stay valid.
+        
+        Args:
+            edits: (segment_id, start, end, new_text) tuples that do not overlap
             
-            # Get replacement value that was used
-            if placeholder_name in replacements:
-                replacement_value = str(replacements[placeholder_name])
-            elif placeholder_text in replacements:
-                replacement_value = str(replacements[placeholder_text])
-            else:
+        Returns:
+            List of Google Docs API requests
+        """
+        def location(segment_id, index):
+            loc = {'index': index}
+            if segment_id:
+                loc['segmentId'] = segment_id
+            return loc
+        
+        def text_range(segment_id, start, end):
+            rng = {'startIndex': start, 'endIndex': end}
+            if segment_id:
+                rng['segmentId'] = segment_id
+            return rng
+        
+        requests = []
+        for segment_id, start, end, text in sorted(edits, key=lambda e: e[1], reverse=True):
+            if start == end:
+                if text:
+                    requests.append({'insertText': {'location': location(segment_id, start), 'text': text}})
                 continue
             
-            # Avoid duplicate restoration requests
-            replacement_key = f"{replacement_value}||{placeholder_text}"
-            if replacement_key not in processed_replacements:
-                processed_replacements.add(replacement_key)
-                
-                requests.append({
-                    'replaceAllText': {
-                        'containsText': {
-                            'text': replacement_value,
-                            'matchCase': True
-                        },
-                        'replaceText': placeholder_text
-                    }
-                })
+            if not text:
+                requests.append({'deleteContentRange': {'range': text_range(segment_id, start, end)}})
+                continue
+            
+            new_end = start + utf16_len(text)
+            requests.append({'insertText': {'location': location(segment_id, start + 1), 'text': text}})
+            requests.append({'deleteContentRange': {'range': text_range(segment_id, start, start + 1)}})
+            if end - start > 1:
+                requests.append({'deleteContentRange': {'range': text_range(segment_id, new_end, new_end + end - start - 1)}})
         
         return requests
     
+    @staticmethod
+    def _placeholder_signature(placeholders: List[Dict]) -> List[Tuple]:
+        """Comparable (segment_id, start, text) list used to verify a restore"""
+        return sorted((p.get('segment_id') or '', p['start'], p['text']) for p in placeholders)
+    
     def export_as_pdf(self, document_id: str) -> bytes:
         """
         Export Google Docs as PDF with all formatting preserved
@@ -226,41 +343,72 @@ class GoogleDocsPDFGenerator:
             PDF file content as bytes
         """
         try:
-            # Request PDF export
-            request = self.drive_service.files().export_media(
-                fileId=document_id,
-                mimeType='application/pdf'
-            )
-            
-            # Download the PDF
-            file = io.BytesIO()
-            downloader = MediaIoBaseDownload(file, request)
-            
-            done = False
-            while not done:
-                status, done = downloader.next_chunk()
-                if status:
-                    logger.info(f"PDF export progress: {int(status.progress() * 100)}%")
-            
-            file.seek(0)
-            pdf_content = file.read()
-            
-            logger.info(f"PDF exported successfully, size: {len(pdf_content)} bytes")
-            return pdf_content
+            return get_pdf_exporter().export_bytes(self.drive_service, document_id)
+        except HttpError as e:
+            logger.error(f"Error exporting PDF: {str(e)}")
+            raise
+    
+    def export_pdf_to_file(self, document_id: str, output_path: str,
+                           report: Optional[RenderReport] = None) -> ExportStats:
+        """
+        Stream the PDF export of a document straight to a file
+        
+        Args:
+            document_id: Google Docs document ID
+            output_path: Path to save the PDF file
+            report: Render report that records the download requests and throughput
             
+        Returns:
+            Transfer statistics
+        """
+        try:
+            stats = get_pdf_exporter().export(self.drive_service, document_id, output_path)
         except HttpError as e:
             logger.error(f"Error exporting PDF: {str(e)}")
             raise
+        
+        if report:
+            report.api_calls['files.export'] = report.api_calls.get('files.export', 0) + stats.chunks
+            report.export = stats.to_dict()
+        return stats
+    
+    def _verify_restore(self, edit: 'PlaceholderEdit', report: RenderReport) -> bool:
+        """
+        Check the restored template has exactly the placeholders it had before the render
+        
+        The placeholder index is refreshed from the restored document either way, so a
+        damaged template shows up in field validation instead of in the next render.
+        """
+        document_id = edit.document_id
+        with get_pipeline_metrics().span('verify'):
+            document = execute_with_limit(self.docs_service.documents().get(documentId=document_id),
+                                          'docs', 'read')
+        report.count_call('documents.get')
+        
+        from placeholder_index import refresh_placeholder_index
+        refresh_placeholder_index(document_id, document)
+        
+        report.restore_verified = edit.verify(document)
+        if report.restore_verified:
+            logger.info("Document restored to original state")
+        else:
+            logger.error(f"Template {document_id} does not match its placeholder snapshot after restore: "
+                         f"expected {len(edit.placeholders)} placeholders")
+        return report.restore_verified
     
     def generate_pdf_with_replacements(self,
                                      document_id: str,
                                      replacements: Dict[str, str],
                                      output_path: str,
                                      delay_before_export: float = 1.0,
-                                     delay_before_restore: float = 0.5) -> bool:
+                                     delay_before_restore: float = 0.5,
+                                     verify_restore: bool = True) -> bool:
         """
         Generate PDF with placeholder replacements, then restore original
         
+        Every placeholder occurrence is replaced by range and restored by range, so
+        values that also appear in the template's static text are never touched.
+        
         Args:
             document_id: Google Docs document ID
             replacements: Dictionary mapping placeholders to values
@@ -268,89 +416,168 @@ class GoogleDocsPDFGenerator:
             output_path: Path to save the PDF file
             delay_before_export: Seconds to wait after replacement before exporting
             delay_before_restore: Seconds to wait after export before restoring
+            verify_restore: Re-read the template after restoring and compare its placeholders
             
         Returns:
             True if successful, False otherwise
         """
-        original_state_saved = False
+        # Renders of the same template queue up here; time spent waiting is its own stage
+        lock = document_lock(document_id)
+        with get_pipeline_metrics().span('lock_wait'):
+            lock.acquire()
+        try:
+            return self._generate_pdf_in_place(document_id, replacements, output_path,
+                                               delay_before_export, delay_before_restore, verify_restore)
+        finally:
+            lock.release()
+    
+    def _generate_pdf_in_place(self, document_id: str, replacements: Dict[str, str], output_path: str,
+                               delay_before_export: float, delay_before_restore: float,
+                               verify_restore: bool) -> bool:
+        edit = None
+        report = self.last_report = RenderReport(document_id)
+        metrics = get_pipeline_metrics()
         
         try:
             # Step 1: Get current document state
             logger.info(f"Getting document content for {document_id}")
-            document = self.docs_service.documents().get(documentId=document_id).execute()
+            with metrics.span('doc_fetch'):
+                document = execute_with_limit(self.docs_service.documents().get(documentId=document_id),
+                                              'docs', 'read')
+            report.count_call('documents.get')
+            
+            # Step 2: Find all placeholders and plan the fill and restore from the same snapshot
+            edit = PlaceholderEdit(self.docs_service, document_id, document, replacements, report)
+            placeholders = edit.placeholders
+            report.placeholder_occurrences = len(placeholders)
+            report.distinct_placeholders = len({p['text'] for p in placeholders})
+            report.replace_requests = len(edit.forward_requests)
+            report.restore_requests = len(edit.restore_requests)
+            logger.info(f"Found {len(placeholders)} placeholders in document "
+                        f"({report.distinct_placeholders} distinct)")
             
-            # Step 2: Find all placeholders
-            placeholders = self._find_placeholders_with_positions(document)
-            logger.info(f"Found {len(placeholders)} placeholders in document")
+            # Keep the template placeholder index warm with what we just fetched
+            from placeholder_index import refresh_placeholder_index
+            refresh_placeholder_index(document_id, document)
             
             if not placeholders and replacements:
                 logger.warning("No placeholders found in document")
             
-            # Step 3: Create replacement requests
-            replacement_requests = self._create_replacement_requests(placeholders, replacements)
-            
-            if replacement_requests:
-                # Step 4: Apply replacements
-                logger.info(f"Applying {len(replacement_requests)} replacements")
-                result = self.docs_service.documents().batchUpdate(
-                    documentId=document_id,
-                    body={'requests': replacement_requests}
-                ).execute()
-                
-                # Mark that we've modified the document
-                original_state_saved = True
-                
+            # Step 3: Apply all replacements in a single batchUpdate
+            if edit.forward():
                 # Wait for changes to propagate
-                time.sleep(delay_before_export)
+                with metrics.span('sleep'):
+                    time.sleep(delay_before_export)
             
-            # Step 5: Export as PDF
+            # Step 4: Stream the PDF export to the output file
             logger.info("Exporting document as PDF")
-            pdf_content = self.export_as_pdf(document_id)
-            
-            # Step 6: Save PDF to file
-            os.makedirs(os.path.dirname(output_path) if os.path.dirname(output_path) else '.', exist_ok=True)
-            with open(output_path, 'wb') as f:
-                f.write(pdf_content)
+            self.export_pdf_to_file(document_id, output_path, report)
             logger.info(f"PDF saved to {output_path}")
             
-            # Wait before restoring
-            if original_state_saved:
-                time.sleep(delay_before_restore)
-            
-            # Step 7: Restore original placeholders
-            if original_state_saved and replacement_requests:
-                restoration_requests = self._create_restoration_requests(placeholders, replacements)
+            # Step 5: Restore original placeholders
+            if edit.applied:
+                with metrics.span('sleep'):
+                    time.sleep(delay_before_restore)
+                edit.restore()
                 
-                if restoration_requests:
-                    logger.info(f"Restoring {len(restoration_requests)} placeholders")
-                    self.docs_service.documents().batchUpdate(
-                        documentId=document_id,
-                        body={'requests': restoration_requests}
-                    ).execute()
-                    logger.info("Document restored to original state")
+                if verify_restore:
+                    self._verify_restore(edit, report)
             
+            logger.info(f"Render report for {document_id}: {report.to_dict()}")
             return True
             
         except Exception as e:
             logger.error(f"Error generating PDF: {str(e)}")
             
             # Try to restore document on error
-            if original_state_saved:
+            if edit and edit.applied:
                 try:
                     logger.info("Attempting to restore document after error")
-                    restoration_requests = self._create_restoration_requests(placeholders, replacements)
-                    if restoration_requests:
-                        self.docs_service.documents().batchUpdate(
-                            documentId=document_id,
-                            body={'requests': restoration_requests}
-                        ).execute()
-                        logger.info("Document restored after error")
+                    edit.restore()
+                    if verify_restore:
+                        self._verify_restore(edit, report)
                 except Exception as restore_error:
                     logger.error(f"Failed to restore document: {str(restore_error)}")
             
+            logger.info(f"Render report for {document_id}: {report.to_dict()}")
             return False
 
 
+class PlaceholderEdit:
+    """
+    Exact-range fill of a document's placeholders, and its undo
+    
+    Shared by every render that edits a document and puts it back: in-place
+    template renders and pooled Drive copies. Both edits are planned from one
+    snapshot. forward() only applies to the revision that snapshot was read at;
+    restore() is written against the revision forward() produced, and
+    targetRevisionId lets the Docs API shift it past any edit made since.
+    """
+    
+    def __init__(self, docs_service, document_id: str, document: dict, replacements: Dict[str, str],
+                 report: Optional[RenderReport] = None):
+        """
+        Args:
+            docs_service: Google Docs API service
+            document_id: Document to edit
+            document: Snapshot of the document from documents.get
+            replacements: Dict mapping placeholder names ('name' or '{{name}}') to values
+            report: Render report that counts the batchUpdate calls
+        """
+        self.docs_service = docs_service
+        self.document_id = document_id
+        self.report = report
+        self.placeholders = GoogleDocsPDFGenerator._find_placeholders_with_positions(document)
+        forward_edits, restore_edits = GoogleDocsPDFGenerator._plan_range_edits(self.placeholders, replacements)
+        self.forward_requests = GoogleDocsPDFGenerator._create_range_edit_requests(forward_edits)
+        self.restore_requests = GoogleDocsPDFGenerator._create_range_edit_requests(restore_edits)
+        self.base_revision_id = document.get('revisionId')
+        self.revision_id = None  # Revision produced by forward()
+        self.applied = False     # forward() ran and restore() has not
+    
+    def forward(self) -> bool:
+        """Write the values into the document; returns False when there was nothing to replace"""
+        if not self.forward_requests:
+            return False
+        
+        logger.info(f"Applying {len(self.forward_requests)} replacements")
+        with get_pipeline_metrics().span('batch_update'):
+            result = self._batch_update(self.forward_requests,
+                                        {'requiredRevisionId': self.base_revision_id} if self.base_revision_id else None)
+        self.applied = True
+        self.revision_id = (result or {}).get('writeControl', {}).get('requiredRevisionId')
+        return True
+    
+    def restore(self):
+        """Put the placeholders back at the ranges forward() filled"""
+        if not self.applied:
+            return
+        
+        logger.info(f"Restoring {len(self.restore_requests)} placeholder ranges")
+        with get_pipeline_metrics().span('restore'):
+            self._batch_update(self.restore_requests,
+                               {'targetRevisionId': self.revision_id} if self.revision_id else None)
+        self.applied = False
+    
+    def verify(self, document: dict) -> bool:
+        """Whether a re-read document has exactly the placeholders of the snapshot"""
+        restored = GoogleDocsPDFGenerator._find_placeholders_with_positions(document)
+        return (GoogleDocsPDFGenerator._placeholder_signature(restored) ==
+                GoogleDocsPDFGenerator._placeholder_signature(self.placeholders))
+    
+    def _batch_update(self, requests: List[Dict], write_control: Optional[Dict]) -> Dict:
+        body = {'requests': requests}
+        if write_control:
+            body['writeControl'] = write_control
+        result = execute_with_limit(self.docs_service.documents().batchUpdate(
+            documentId=self.document_id,
+            body=body
+        ), 'docs', 'write')
+        if self.report:
+            self.report.count_call('documents.batchUpdate')
+        return result
+
+
 def generate_pdf_from_google_docs(document_id: str,
                                 replacements: Dict[str, str],
                                 output_path: str,
@@ -395,17 +622,19 @@ def generate_pdf_from_google_docs(document_id: str,
 # Integration with existing system
 def generate_pdf_for_service_request(service_request,
                                    output_dir: str = 'pdf_outputs',
-                                   credentials_path: str = 'credentials.json') -> Optional[str]:
+                                   credentials_path: str = 'credentials.json',
+                                   storage=None) -> Optional[str]:
     """
     Generate PDF for a service request using Google Docs
     
     Args:
         service_request: Service request object with form data
-        output_dir: Directory to save PDFs
+        output_dir: Directory to save PDFs (used when no storage is given)
         credentials_path: Path to Google credentials
+        storage: PDFStorage that decides where the file is written
         
     Returns:
-        Filename of generated PDF or None if failed
+        Filename (storage key) of generated PDF or None if failed
     """
     try:
         # Get Google Doc ID from service
@@ -418,39 +647,15 @@ def generate_pdf_for_service_request(service_request,
             logger.error("Service google_doc_id is empty")
             return None
         
-        # Prepare replacements from form data
-        replacements = {}
-        form_data = service_request.get_form_data()
-        
-        # Add form field data
-        for field in service_request.service.form_fields:
-            if field.document_placeholder:
-                # Support both {{name}} and name formats
-                placeholder = field.document_placeholder
-                value = str(form_data.get(field.field_name, ''))
-                
-                # Add with and without braces
-                replacements[placeholder] = value
-                if placeholder.startswith('{{') and placeholder.endswith('}}'):
-                    replacements[placeholder[2:-2]] = value
-                else:
-                    replacements[f'{{{{{placeholder}}}}}'] = value
-        
-        # Add metadata
-        replacements['tracking_code'] = service_request.tracking_code
-        replacements['{{tracking_code}}'] = service_request.tracking_code
-        
-        replacements['request_date'] = service_request.created_at.strftime('%Y/%m/%d')
-        replacements['{{request_date}}'] = service_request.created_at.strftime('%Y/%m/%d')
-        
-        if hasattr(service_request, 'user') and service_request.user:
-            replacements['requester_name'] = service_request.user.username
-            replacements['{{requester_name}}'] = service_request.user.username
+        replacements = build_replacements(service_request)
         
         # Generate output path
-        os.makedirs(output_dir, exist_ok=True)
         pdf_filename = f"request_{service_request.tracking_code}.pdf"
-        output_path = os.path.join(output_dir, pdf_filename)
+        if storage:
+            pdf_filename, output_path = storage.allocate(pdf_filename)
+        else:
+            os.makedirs(output_dir, exist_ok=True)
+            output_path = os.path.join(output_dir, pdf_filename)
         
         # Generate PDF
         generator = GoogleDocsPDFGenerator(credentials_path)
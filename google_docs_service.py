@@ -5,12 +5,14 @@ Handles authentication and document operations
 
 import os
 import re
-import io
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
 from googleapiclient.errors import HttpError
 
+from google_api_limiter import execute_with_limit
+from pdf_exporter import get_pdf_exporter
+from google_docs_pdf_generator import PlaceholderEdit
+
 class GoogleDocsService:
     """Service class for Google Docs API operations"""
     
@@ -44,7 +46,7 @@ class GoogleDocsService:
     def get_document_content(self, doc_id):
         """Get the content of a Google Doc"""
         try:
-            document = self.docs_service.documents().get(documentId=doc_id).execute()
+            document = execute_with_limit(self.docs_service.documents().get(documentId=doc_id), 'docs', 'read')
             return document
         except HttpError as error:
             if error.resp.status == 404:
@@ -92,10 +94,10 @@ class GoogleDocsService:
                 'name': copy_title
             }
             
-            copied_file = self.drive_service.files().copy(
+            copied_file = execute_with_limit(self.drive_service.files().copy(
                 fileId=doc_id,
                 body=copy_metadata
-            ).execute()
+            ), 'drive', 'write')
             
             return copied_file['id']
         except HttpError as error:
@@ -107,49 +109,36 @@ class GoogleDocsService:
             # First, get the document to find all text positions
             document = self.get_document_content(doc_id)
             
-            # Build requests for batch update
-            requests = []
-            
-            # Process content in reverse order to maintain indices
-            content = document.get('body', {}).get('content', [])
-            
-            for element in reversed(content):
+            # Collect the text of every paragraph run
+            texts = []
+            for element in document.get('body', {}).get('content', []):
                 if 'paragraph' in element:
-                    paragraph = element['paragraph']
-                    
-                    for elem in reversed(paragraph.get('elements', [])):
+                    for elem in element['paragraph'].get('elements', []):
                         if 'textRun' in elem:
-                            text = elem['textRun'].get('content', '')
-                            start_index = elem.get('startIndex', 0)
-                            end_index = elem.get('endIndex', 0)
-                            
-                            # Check for placeholders
-                            for placeholder, value in replacements.items():
-                                placeholder_pattern = f'{{{{{placeholder}}}}}'
-                                if placeholder_pattern in text:
-                                    # Calculate the exact positions
-                                    placeholder_start = text.find(placeholder_pattern)
-                                    if placeholder_start != -1:
-                                        absolute_start = start_index + placeholder_start
-                                        absolute_end = absolute_start + len(placeholder_pattern)
-                                        
-                                        # Create replace request
-                                        requests.append({
-                                            'replaceAllText': {
-                                                'containsText': {
-                                                    'text': placeholder_pattern,
-                                                    'matchCase': True
-                                                },
-                                                'replaceText': value
-                                            }
-                                        })
+                            texts.append(elem['textRun'].get('content', ''))
+            
+            # replaceAllText covers every occurrence, so one request per placeholder
+            # present in the document is enough
+            requests = []
+            for placeholder, value in replacements.items():
+                placeholder_pattern = f'{{{{{placeholder}}}}}'
+                if any(placeholder_pattern in text for text in texts):
+                    requests.append({
+                        'replaceAllText': {
+                            'containsText': {
+                                'text': placeholder_pattern,
+                                'matchCase': True
+                            },
+                            'replaceText': value
+                        }
+                    })
             
             # Execute batch update if there are replacements
             if requests:
-                result = self.docs_service.documents().batchUpdate(
+                result = execute_with_limit(self.docs_service.documents().batchUpdate(
                     documentId=doc_id,
                     body={'requests': requests}
-                ).execute()
+                ), 'docs', 'write')
                 
                 return result
             
@@ -158,31 +147,43 @@ class GoogleDocsService:
         except HttpError as error:
             raise Exception(f"Error replacing placeholders: {str(error)}")
     
+    def fill_placeholders(self, doc_id, replacements):
+        """
+        Replace placeholders by exact range and return a function that undoes it
+        
+        Used for pooled copies: the returned reset(doc_id) restores the placeholders
+        and returns True only if the copy matches its pre-render placeholders again.
+        """
+        try:
+            edit = PlaceholderEdit(self.docs_service, doc_id, self.get_document_content(doc_id), replacements)
+            edit.forward()
+        except HttpError as error:
+            raise Exception(f"Error replacing placeholders: {str(error)}")
+        
+        def reset(copy_id):
+            edit.restore()
+            return edit.verify(self.get_document_content(copy_id))
+        
+        return reset
+    
     def export_as_pdf(self, doc_id):
         """Export Google Doc as PDF"""
         try:
-            request = self.drive_service.files().export_media(
-                fileId=doc_id,
-                mimeType='application/pdf'
-            )
-            
-            file_data = io.BytesIO()
-            downloader = MediaIoBaseDownload(file_data, request)
-            
-            done = False
-            while not done:
-                status, done = downloader.next_chunk()
-            
-            file_data.seek(0)
-            return file_data.getvalue()
-            
+            return get_pdf_exporter().export_bytes(self.drive_service, doc_id)
+        except HttpError as error:
+            raise Exception(f"Error exporting document as PDF: {str(error)}")
+    
+    def export_pdf_to_file(self, doc_id, output_path):
+        """Stream the PDF export of a Google Doc straight to a file"""
+        try:
+            return get_pdf_exporter().export(self.drive_service, doc_id, output_path)
         except HttpError as error:
             raise Exception(f"Error exporting document as PDF: {str(error)}")
     
     def delete_document(self, doc_id):
         """Delete a Google Doc (cleanup temporary copies)"""
         try:
-            self.drive_service.files().delete(fileId=doc_id).execute()
+            execute_with_limit(self.drive_service.files().delete(fileId=doc_id), 'drive', 'write')
         except HttpError as error:
             # Ignore errors when deleting
             pass
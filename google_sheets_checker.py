@@ -12,6 +12,8 @@ from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+from google_api_limiter import execute_with_limit
+
 logger = logging.getLogger(__name__)
 
 class GoogleSheetsChecker:
@@ -67,10 +69,10 @@ class GoogleSheetsChecker:
             range_name = f"{sheet_name}!{column}:{column}" if sheet_name else f"{column}:{column}"
             
             # Get values from sheet
-            result = self.service.spreadsheets().values().get(
+            result = execute_with_limit(self.service.spreadsheets().values().get(
                 spreadsheetId=spreadsheet_id,
                 range=range_name
-            ).execute()
+            ), 'sheets', 'read')
             
             values = result.get('values', [])
             
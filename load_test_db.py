@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Database write load test
+Runs several request-creating writer threads alongside a background committer
+(like the PDF queue) and reports throughput and lock errors
+
+Runs against a fresh temporary SQLite file. The DATABASE_URL environment
+variable is ignored so the test can never write to a live database; pass
+--database URL to load a scratch database of another engine on purpose.
+
+Usage: python load_test_db.py [writers] [requests_per_writer] [--database URL]
+"""
+
+import os
+import sys
+import time
+import threading
+import tempfile
+
+def run_load_test(writers: int = 8, requests_per_writer: int = 200, database_url: str = None):
+    """
+    Run the load test against a scratch database
+
+    Args:
+        writers: Number of request-creating threads
+        requests_per_writer: Requests each writer creates
+        database_url: Explicit scratch database; a temporary SQLite file when None
+    """
+    if 'app' in sys.modules:
+        # The app's engine is bound to its configured database at import
+        raise RuntimeError("run_load_test must run before the app is imported")
+
+    if database_url is None:
+        db_path = os.path.join(tempfile.mkdtemp(), 'load_test.db')
+        database_url = f'sqlite:///{db_path}'
+    os.environ['DATABASE_URL'] = database_url
+    print(f"Load test database: {database_url}")
+
+    from app import app, db, add_service_request
+    from models import Service, ServiceRequest, ServiceRequestStats
+
+    with app.app_context():
+        db.create_all()
+        service = Service(name='Load test service', google_doc_id='load-test')
+        db.session.add(service)
+        db.session.commit()
+        service_id = service.id
+        dialect = db.engine.dialect.name
+        if dialect == 'sqlite':
+            journal_mode = db.session.execute(db.text('PRAGMA journal_mode')).scalar()
+            print(f"SQLite journal mode: {journal_mode}")
+
+    errors = []
+    created = []
+    lock = threading.Lock()
+    stop_background = threading.Event()
+
+    def writer(worker_id):
+        """Create requests the same way request_service does"""
+        with app.app_context():
+            for i in range(requests_per_writer):
+                try:
+                    service_request = ServiceRequest(service_id=service_id)
+                    service_request.set_form_data({'name': f'کاربر {worker_id}-{i}'})
+                    add_service_request(service_request)
+                    ServiceRequestStats.record(service_id, 'pending')
+                    db.session.commit()
+                    with lock:
+                        created.append(service_request.id)
+                except Exception as e:
+                    db.session.rollback()
+                    with lock:
+                        errors.append(str(e))
+
+    def background_committer():
+        """Approve requests like the PDF queue callbacks do"""
+        with app.app_context():
+            while not stop_background.is_set():
+                try:
+                    with lock:
+                        request_id = created[-1] if created else None
+                    if request_id:
+                        service_request = db.session.get(ServiceRequest, request_id)
+                        service_request.pdf_filename = f'request_{service_request.tracking_code}.pdf'
+                        db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    with lock:
+                        errors.append(str(e))
+                time.sleep(0.01)
+
+    background = threading.Thread(target=background_committer, daemon=True)
+    background.start()
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    start_time = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start_time
+
+    stop_background.set()
+    background.join(timeout=5)
+
+    total = writers * requests_per_writer
+    print(f"Writers: {writers}, requests per writer: {requests_per_writer}")
+    print(f"Created {len(created)}/{total} requests in {elapsed:.2f}s")
+    print(f"Throughput: {len(created) / elapsed:.1f} requests/s")
+    print(f"Errors: {len(errors)}")
+    locked = [e for e in errors if 'locked' in e]
+    if locked:
+        print(f"  'database is locked' errors: {len(locked)}")
+    for error in sorted(set(errors))[:5]:
+        print(f"  - {error[:200]}")
+
+    return not errors
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    database_url = None
+    if '--database' in args:
+        position = args.index('--database')
+        if position + 1 >= len(args):
+            sys.exit("--database requires a URL")
+        database_url = args[position + 1]
+        del args[position:position + 2]
+
+    writers = int(args[0]) if len(args) > 0 else 8
+    requests_per_writer = int(args[1]) if len(args) > 1 else 200
+
+    success = run_load_test(writers, requests_per_writer, database_url)
+    sys.exit(0 if success else 1)
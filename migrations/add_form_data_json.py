@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Migration script to store ServiceRequest.form_data as JSON and extract
+searchable field values into service_request_field_values
+"""
+
+import json
+
+from app import app, db
+from models import Service, ServiceRequest, ServiceRequestFieldValue
+from sqlalchemy import insert, text
+
+BATCH_SIZE = 1000
+
+def _insert_field_values(rows):
+    """Bulk insert the collected value rows and empty the list"""
+    count = len(rows)
+    if rows:
+        db.session.execute(insert(ServiceRequestFieldValue), rows)
+        rows.clear()
+    return count
+
+def backfill_field_values():
+    """Extract indexed field values for every existing request
+
+    Only the columns needed here are selected so the backfill also runs on
+    databases that predate later service and request columns.
+    """
+    total = 0
+    services = db.session.query(Service.id, Service.auto_approve_field_name).all()
+    for service_id, auto_approve_field_name in services:
+        indexed_fields = set(db.session.execute(text(
+            'SELECT field_name FROM form_fields WHERE service_id = :service_id AND is_indexed'
+        ), {'service_id': service_id}).scalars())
+        if auto_approve_field_name:
+            indexed_fields.add(auto_approve_field_name)
+        if not indexed_fields:
+            continue
+
+        ServiceRequestFieldValue.query.filter_by(service_id=service_id).delete(synchronize_session=False)
+
+        rows = []
+        query = db.session.query(ServiceRequest.id, ServiceRequest.form_data) \
+            .filter(ServiceRequest.service_id == service_id).order_by(ServiceRequest.id)
+        for request_id, form_data in query.yield_per(BATCH_SIZE):
+            if isinstance(form_data, str):
+                form_data = json.loads(form_data) if form_data else {}
+            form_data = form_data or {}
+            for name in indexed_fields:
+                if form_data.get(name) not in (None, ''):
+                    rows.append({
+                        'request_id': request_id,
+                        'service_id': service_id,
+                        'field_name': name,
+                        'value': ServiceRequestFieldValue.normalize(form_data[name])
+                    })
+            if len(rows) >= BATCH_SIZE:
+                total += _insert_field_values(rows)
+        total += _insert_field_values(rows)
+    return total
+
+def upgrade():
+    """Convert form_data to JSON and add the field value index"""
+    with app.app_context():
+        try:
+            # SQLite stores JSON as text, so only server databases need a type change
+            if db.engine.dialect.name == 'postgresql':
+                db.session.execute(text('''
+                    ALTER TABLE service_requests
+                    ALTER COLUMN form_data TYPE JSON USING form_data::json
+                '''))
+
+            db.session.execute(text('''
+                ALTER TABLE form_fields
+                ADD COLUMN is_indexed BOOLEAN DEFAULT FALSE
+            '''))
+            db.session.commit()
+            print("✅ form_data converted and is_indexed field added!")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error altering columns: {str(e)}")
+            print("   Columns may already be migrated.")
+
+        try:
+            ServiceRequestFieldValue.__table__.create(db.engine, checkfirst=True)
+
+            count = backfill_field_values()
+            db.session.commit()
+            print(f"✅ Field value index created with {count} values!")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error building field value index: {str(e)}")
+
+def downgrade():
+    """Drop the field value index and restore form_data as text"""
+    with app.app_context():
+        try:
+            ServiceRequestFieldValue.__table__.drop(db.engine, checkfirst=True)
+
+            if db.engine.dialect.name == 'postgresql':
+                db.session.execute(text('''
+                    ALTER TABLE service_requests
+                    ALTER COLUMN form_data TYPE TEXT USING form_data::text
+                '''))
+            db.session.execute(text('ALTER TABLE form_fields DROP COLUMN is_indexed'))
+            db.session.commit()
+            print("✅ Field value index removed successfully!")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error removing field value index: {str(e)}")
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'downgrade':
+        downgrade()
+    else:
+        upgrade()
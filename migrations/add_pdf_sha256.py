@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Migration script to add the PDF content hash to ServiceRequest model
+"""
+
+from app import app, db
+from sqlalchemy import text
+
+def upgrade():
+    """Add pdf_sha256 column to service_requests table"""
+    with app.app_context():
+        try:
+            db.session.execute(text('''
+                ALTER TABLE service_requests
+                ADD COLUMN pdf_sha256 VARCHAR(64)
+            '''))
+
+            db.session.commit()
+            print("✅ PDF hash field added successfully!")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error adding field: {str(e)}")
+            print("   Field may already exist.")
+
+def downgrade():
+    """Remove pdf_sha256 column from service_requests table"""
+    with app.app_context():
+        try:
+            db.session.execute(text('ALTER TABLE service_requests DROP COLUMN pdf_sha256'))
+            db.session.commit()
+            print("✅ PDF hash field removed successfully!")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error removing field: {str(e)}")
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'downgrade':
+        downgrade()
+    else:
+        upgrade()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Migration script to move PDF outputs into sharded storage
+Adds pdf_size to ServiceRequest and moves flat files into hashed subdirectories
+"""
+
+import os
+from app import app, db, pdf_storage
+from models import ServiceRequest
+from sqlalchemy import text
+
+def upgrade():
+    """Add pdf_size column and shard existing PDF files"""
+    with app.app_context():
+        try:
+            db.session.execute(text('''
+                ALTER TABLE service_requests
+                ADD COLUMN pdf_size INTEGER
+            '''))
+
+            db.session.commit()
+            print("✅ PDF size field added successfully!")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error adding field: {str(e)}")
+            print("   Field may already exist.")
+
+        try:
+            moved = 0
+            requests = ServiceRequest.query.filter(ServiceRequest.pdf_filename.isnot(None)).all()
+            for service_request in requests:
+                if '/' in service_request.pdf_filename:
+                    continue  # Already sharded
+                old_path = os.path.join(app.config['PDF_OUTPUT_FOLDER'], service_request.pdf_filename)
+                if not os.path.exists(old_path):
+                    continue
+                key, new_path = pdf_storage.allocate(service_request.pdf_filename)
+                os.replace(old_path, new_path)
+                service_request.attach_pdf(key, new_path)
+                moved += 1
+
+            db.session.commit()
+            print(f"✅ Moved {moved} PDF files into sharded storage!")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error moving PDF files: {str(e)}")
+
+def downgrade():
+    """Move PDF files back to the flat folder and remove pdf_size column"""
+    with app.app_context():
+        try:
+            requests = ServiceRequest.query.filter(ServiceRequest.pdf_filename.like('%/%')).all()
+            for service_request in requests:
+                path = pdf_storage.local_path(service_request.pdf_filename)
+                if not path:
+                    continue
+                filename = os.path.basename(path)
+                os.replace(path, os.path.join(app.config['PDF_OUTPUT_FOLDER'], filename))
+                service_request.pdf_filename = filename
+
+            db.session.execute(text('ALTER TABLE service_requests DROP COLUMN pdf_size'))
+            db.session.commit()
+            print("✅ PDF storage migration reverted successfully!")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error reverting PDF storage migration: {str(e)}")
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'downgrade':
+        downgrade()
+    else:
+        upgrade()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Migration script to add full-text search over ServiceRequest form values
+Uses SQLite FTS5 locally and a tsvector GIN index on Postgres
+"""
+
+from app import app, db
+from sqlalchemy import text
+
+def upgrade():
+    """Add search_text column, build the full-text index and backfill it"""
+    from request_search import ensure_search_index, rebuild_search_index
+
+    with app.app_context():
+        try:
+            db.session.execute(text('''
+                ALTER TABLE service_requests
+                ADD COLUMN search_text TEXT
+            '''))
+            db.session.commit()
+            print("✅ search_text field added successfully!")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error adding field: {str(e)}")
+            print("   Field may already exist.")
+
+        try:
+            ensure_search_index()
+            count = rebuild_search_index()
+            print(f"✅ Full-text index built for {count} requests!")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error building full-text index: {str(e)}")
+
+def downgrade():
+    """Remove the full-text index and search_text column"""
+    from request_search import FTS_TABLE, PG_INDEX
+
+    with app.app_context():
+        try:
+            if db.engine.dialect.name == 'sqlite':
+                for suffix in ('ai', 'ad', 'au'):
+                    db.session.execute(text(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}'))
+                db.session.execute(text(f'DROP TABLE IF EXISTS {FTS_TABLE}'))
+            else:
+                db.session.execute(text(f'DROP INDEX IF EXISTS {PG_INDEX}'))
+            db.session.execute(text('ALTER TABLE service_requests DROP COLUMN search_text'))
+            db.session.commit()
+            print("✅ Full-text index removed successfully!")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error removing full-text index: {str(e)}")
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'downgrade':
+        downgrade()
+    else:
+        upgrade()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Migration script to add the form version counter to Service model
+"""
+
+from app import app, db
+from sqlalchemy import text
+
+def upgrade():
+    """Add form_version column to services table"""
+    with app.app_context():
+        try:
+            db.session.execute(text('''
+                ALTER TABLE services
+                ADD COLUMN form_version INTEGER NOT NULL DEFAULT 1
+            '''))
+
+            db.session.commit()
+            print("✅ Form version field added successfully!")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error adding field: {str(e)}")
+            print("   Field may already exist.")
+
+def downgrade():
+    """Remove form_version column from services table"""
+    with app.app_context():
+        try:
+            db.session.execute(text('ALTER TABLE services DROP COLUMN form_version'))
+            db.session.commit()
+            print("✅ Form version field removed successfully!")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error removing field: {str(e)}")
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'downgrade':
+        downgrade()
+    else:
+        upgrade()
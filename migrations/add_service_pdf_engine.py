@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Migration script to add the per-service PDF engine to Service model
+"""
+
+from app import app, db
+from sqlalchemy import text
+
+def upgrade():
+    """Add pdf_engine column to services table"""
+    with app.app_context():
+        try:
+            db.session.execute(text('''
+                ALTER TABLE services
+                ADD COLUMN pdf_engine VARCHAR(50)
+            '''))
+
+            db.session.commit()
+            print("✅ PDF engine field added successfully!")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error adding field: {str(e)}")
+            print("   Field may already exist.")
+
+def downgrade():
+    """Remove pdf_engine column from services table"""
+    with app.app_context():
+        try:
+            db.session.execute(text('ALTER TABLE services DROP COLUMN pdf_engine'))
+            db.session.commit()
+            print("✅ PDF engine field removed successfully!")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error removing field: {str(e)}")
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'downgrade':
+        downgrade()
+    else:
+        upgrade()
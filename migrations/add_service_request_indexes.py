@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Migration script to add composite indexes for hot ServiceRequest queries
+"""
+
+from app import app, db
+from sqlalchemy import text
+
+def upgrade():
+    """Add composite indexes to service_requests table"""
+    with app.app_context():
+        try:
+            # Approver dashboard: pending requests ordered by creation time
+            db.session.execute(text('''
+                CREATE INDEX IF NOT EXISTS ix_service_requests_status_created_at
+                ON service_requests (status, created_at)
+            '''))
+
+            # Service statistics and per-service request listings
+            db.session.execute(text('''
+                CREATE INDEX IF NOT EXISTS ix_service_requests_service_status_created_at
+                ON service_requests (service_id, status, created_at)
+            '''))
+
+            # Per-service listing in keyset order, without sorting every row of the service
+            db.session.execute(text('''
+                CREATE INDEX IF NOT EXISTS ix_service_requests_service_created_at_id
+                ON service_requests (service_id, created_at, id)
+            '''))
+
+            db.session.commit()
+            print("✅ ServiceRequest indexes added successfully!")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error adding indexes: {str(e)}")
+
+def downgrade():
+    """Remove composite indexes from service_requests table"""
+    with app.app_context():
+        try:
+            db.session.execute(text('DROP INDEX IF EXISTS ix_service_requests_status_created_at'))
+            db.session.execute(text('DROP INDEX IF EXISTS ix_service_requests_service_status_created_at'))
+            db.session.execute(text('DROP INDEX IF EXISTS ix_service_requests_service_created_at_id'))
+            db.session.commit()
+            print("✅ ServiceRequest indexes removed successfully!")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error removing indexes: {str(e)}")
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'downgrade':
+        downgrade()
+    else:
+        upgrade()
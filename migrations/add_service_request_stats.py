@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Migration script to add the per-service request statistics table
+"""
+
+from app import app, db
+from models import ServiceRequestStats
+
+def upgrade():
+    """Create service_request_stats and fill it from service_requests"""
+    with app.app_context():
+        try:
+            ServiceRequestStats.__table__.create(db.engine, checkfirst=True)
+
+            count = ServiceRequestStats.rebuild()
+            db.session.commit()
+            print(f"✅ Request statistics table created for {count} services!")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error creating statistics table: {str(e)}")
+
+def downgrade():
+    """Drop the service_request_stats table"""
+    with app.app_context():
+        try:
+            ServiceRequestStats.__table__.drop(db.engine, checkfirst=True)
+            print("✅ Request statistics table removed successfully!")
+
+        except Exception as e:
+            print(f"❌ Error removing statistics table: {str(e)}")
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'downgrade':
+        downgrade()
+    else:
+        upgrade()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Verify that hot ServiceRequest queries are served by indexes
+Prints the database query plan for each access path and checks the expected index
+returns rows in the requested order without a sort step
+"""
+
+from app import app, db
+from models import ServiceRequest
+from sqlalchemy import text
+
+def get_hot_queries():
+    """Queries issued by the approver dashboard, service stats and tracking pages"""
+    return [
+        (
+            'approver_dashboard: pending requests by created_at',
+            ServiceRequest.query.filter_by(status='pending')
+                .order_by(ServiceRequest.created_at.desc(), ServiceRequest.id.desc()).limit(20),
+            'ix_service_requests_status_created_at'
+        ),
+        (
+            'service_stats: requests by service and status',
+            ServiceRequest.query.filter_by(service_id=1, status='approved')
+                .order_by(ServiceRequest.created_at.desc()).limit(20),
+            'ix_service_requests_service_status_created_at'
+        ),
+        (
+            'service_stats: recent requests of a service',
+            ServiceRequest.query.filter_by(service_id=1)
+                .order_by(ServiceRequest.created_at.desc(), ServiceRequest.id.desc()).limit(10),
+            'ix_service_requests_service_created_at_id'
+        ),
+        (
+            'track_request: lookup by tracking_code',
+            ServiceRequest.query.filter_by(tracking_code='ABCDEF1234'),
+            None  # Any index; served by the unique constraint
+        ),
+    ]
+
+def explain(query):
+    """Return the query plan lines for a query on the current database"""
+    dialect = db.engine.dialect
+    sql = str(query.statement.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+
+    if dialect.name == 'sqlite':
+        rows = db.session.execute(text(f'EXPLAIN QUERY PLAN {sql}')).fetchall()
+        return [str(row[-1]) for row in rows]
+
+    if dialect.name == 'postgresql':
+        # Small test tables would otherwise always be sequentially scanned
+        db.session.execute(text('SET LOCAL enable_seqscan = off'))
+    rows = db.session.execute(text(f'EXPLAIN {sql}')).fetchall()
+    return [' '.join(str(col) for col in row) for row in rows]
+
+def sorts_rows(plan):
+    """Check whether a plan sorts the matched rows instead of reading them in index order"""
+    for line in plan:
+        step = line.strip().lstrip('->').strip().upper()
+        if 'TEMP B-TREE' in step or step.startswith('SORT ') or step.startswith('INCREMENTAL SORT'):
+            return True
+    return False
+
+def uses_index(plan, index_name):
+    """Check whether a plan uses the given index, or any index when None, without a sort step"""
+    plan_text = '\n'.join(plan)
+    if sorts_rows(plan):
+        return False
+    if index_name:
+        return index_name in plan_text
+    return 'INDEX' in plan_text.upper() and 'SEQ SCAN' not in plan_text.upper()
+
+def main():
+    """Print and check the plan of every hot query"""
+    print("ServiceRequest Query Plan Verification")
+    print("=" * 70)
+
+    results = []
+    with app.app_context():
+        for description, query, index_name in get_hot_queries():
+            plan = explain(query)
+            success = uses_index(plan, index_name)
+            results.append(success)
+
+            status = '✅' if success else '❌'
+            print(f"\n{status} {description}")
+            print(f"   Expected index: {index_name or 'any'}")
+            for line in plan:
+                print(f"   {line}")
+
+        db.session.rollback()
+
+    print("\n" + "=" * 70)
+    print(f"Total: {sum(results)}/{len(results)} queries use the expected index")
+
+    return all(results)
+
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(0 if main() else 1)
@@ -1,8 +1,11 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime
+import hashlib
 import json
+import os
 
 db = SQLAlchemy()
 
@@ -42,6 +45,8 @@ class Service(db.Model):
     created_by = db.Column(db.Integer, db.ForeignKey('users.id'))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
+    form_version = db.Column(db.Integer, default=1, nullable=False)  # Bumped when form fields change
+    pdf_engine = db.Column(db.String(50))  # PDF engine name (pdf_backends); None uses the default
     
     # Auto-approval settings
     auto_approve_enabled = db.Column(db.Boolean, default=False)
@@ -53,17 +58,130 @@ class Service(db.Model):
     form_fields = db.relationship('FormField', backref='service', lazy='dynamic', cascade='all, delete-orphan')
     requests = db.relationship('ServiceRequest', backref='service', lazy='dynamic', cascade='all, delete-orphan')
     
+    request_stats = db.relationship('ServiceRequestStats', uselist=False, cascade='all, delete-orphan')
+    
     def get_stats(self):
-        total = self.requests.count()
-        approved = self.requests.filter_by(status='approved').count()
-        rejected = self.requests.filter_by(status='rejected').count()
-        pending = self.requests.filter_by(status='pending').count()
+        return Service.get_request_stats([self.id])[self.id]
+    
+    @staticmethod
+    def get_field_counts(service_ids=None):
+        """Return {service_id: field count} using a single GROUP BY query"""
+        query = db.session.query(FormField.service_id, db.func.count(FormField.id))
+        if service_ids is not None:
+            query = query.filter(FormField.service_id.in_(list(service_ids)))
+        counts = dict(query.group_by(FormField.service_id).all())
+        if service_ids is not None:
+            return {service_id: counts.get(service_id, 0) for service_id in service_ids}
+        return counts
+    
+    @staticmethod
+    def get_request_stats(service_ids):
+        """Return {service_id: stats dict} from the maintained counters table"""
+        stats = {}
+        rows = ServiceRequestStats.query.filter(
+            ServiceRequestStats.service_id.in_(list(service_ids))
+        ).all()
+        for row in rows:
+            stats[row.service_id] = row.to_dict()
+        
+        # Services whose counters were never built fall back to a live count
+        missing = [service_id for service_id in service_ids if service_id not in stats]
+        if missing:
+            stats.update(Service.count_request_stats(missing))
+        return stats
+    
+    @staticmethod
+    def count_request_stats(service_ids=None):
+        """Return {service_id: stats dict} counted live using a single GROUP BY query"""
+        query = db.session.query(ServiceRequest.service_id, ServiceRequest.status,
+                                 db.func.count(ServiceRequest.id))
+        if service_ids is not None:
+            query = query.filter(ServiceRequest.service_id.in_(list(service_ids)))
+        rows = query.group_by(ServiceRequest.service_id, ServiceRequest.status).all()
+        
+        def empty_stats():
+            return {'total': 0, 'approved': 0, 'rejected': 0, 'pending': 0}
+        
+        stats = {service_id: empty_stats() for service_id in (service_ids or [])}
+        for service_id, status, count in rows:
+            service_stats = stats.setdefault(service_id, empty_stats())
+            service_stats['total'] += count
+            if status in service_stats:
+                service_stats[status] += count
+        return stats
+
+class ServiceRequestStats(db.Model):
+    """Per-service request counters, updated in the same transaction as the requests"""
+    __tablename__ = 'service_request_stats'
+    
+    STATUSES = ('pending', 'approved', 'rejected')
+    
+    service_id = db.Column(db.Integer, db.ForeignKey('services.id'), primary_key=True)
+    total = db.Column(db.Integer, default=0, nullable=False)
+    pending = db.Column(db.Integer, default=0, nullable=False)
+    approved = db.Column(db.Integer, default=0, nullable=False)
+    rejected = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
         return {
-            'total': total,
-            'approved': approved,
-            'rejected': rejected,
-            'pending': pending
+            'total': self.total,
+            'approved': self.approved,
+            'rejected': self.rejected,
+            'pending': self.pending
         }
+    
+    @classmethod
+    def record(cls, service_id, new_status, old_status=None):
+        """
+        Apply a request status change to the counters without committing
+        
+        Args:
+            service_id: Service the request belongs to
+            new_status: Status after the change
+            old_status: Status before the change, or None for a new request
+        """
+        if old_status == new_status:
+            return
+        
+        values = {'updated_at': datetime.utcnow()}
+        if old_status is None:
+            values['total'] = cls.total + 1
+        if old_status in cls.STATUSES:
+            values[old_status] = getattr(cls, old_status) - 1
+        if new_status in cls.STATUSES:
+            values[new_status] = getattr(cls, new_status) + 1
+        
+        updated = cls.query.filter_by(service_id=service_id).update(values, synchronize_session=False)
+        if not updated:
+            # No counters yet: build them from the table, which already holds this change
+            db.session.flush()
+            try:
+                with db.session.begin_nested():
+                    cls.rebuild([service_id])
+            except IntegrityError:
+                # Another writer created the row first
+                cls.query.filter_by(service_id=service_id).update(values, synchronize_session=False)
+    
+    @classmethod
+    def approximate_count(cls, status=None):
+        """Total requests across all services from the counters, without scanning"""
+        column = getattr(cls, status) if status else cls.total
+        return db.session.query(db.func.coalesce(db.func.sum(column), 0)).scalar()
+    
+    @classmethod
+    def rebuild(cls, service_ids=None):
+        """Recount the counters from service_requests without committing"""
+        if service_ids is None:
+            service_ids = [service_id for (service_id,) in db.session.query(Service.id).all()]
+            cls.query.delete(synchronize_session=False)
+        else:
+            cls.query.filter(cls.service_id.in_(list(service_ids))).delete(synchronize_session=False)
+        
+        for service_id, stats in Service.count_request_stats(service_ids).items():
+            db.session.add(cls(service_id=service_id, **stats))
+        db.session.flush()
+        return len(service_ids)
 
 class FormField(db.Model):
     __tablename__ = 'form_fields'
@@ -78,6 +196,7 @@ class FormField(db.Model):
     placeholder = db.Column(db.String(200))
     options = db.Column(db.Text)  # JSON array for select/radio fields
     document_placeholder = db.Column(db.String(100))  # Placeholder in Word template
+    is_indexed = db.Column(db.Boolean, default=False)  # Extract values for indexed search
     
     def get_options(self):
         if self.options:
@@ -86,21 +205,106 @@ class FormField(db.Model):
 
 class ServiceRequest(db.Model):
     __tablename__ = 'service_requests'
+    __table_args__ = (
+        # Approver queue: status='pending' ordered by created_at
+        db.Index('ix_service_requests_status_created_at', 'status', 'created_at'),
+        # Service statistics and per-status listings of a service
+        db.Index('ix_service_requests_service_status_created_at', 'service_id', 'status', 'created_at'),
+        # Per-service listing, keyset-paginated by (created_at, id)
+        db.Index('ix_service_requests_service_created_at_id', 'service_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     service_id = db.Column(db.Integer, db.ForeignKey('services.id'), nullable=False)
     tracking_code = db.Column(db.String(20), unique=True, nullable=False)
-    form_data = db.Column(db.Text, nullable=False)  # JSON
+    form_data = db.Column(db.JSON, nullable=False)
     status = db.Column(db.String(20), default='pending')  # pending, approved, rejected
     approval_note = db.Column(db.Text)
     approved_by = db.Column(db.Integer, db.ForeignKey('users.id'))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     pdf_filename = db.Column(db.String(255))
+    pdf_sha256 = db.Column(db.String(64))  # Content hash, used as the download ETag
+    pdf_size = db.Column(db.Integer)
+    search_text = db.Column(db.Text)  # Normalized form values for full-text search
+    
+    field_values = db.relationship('ServiceRequestFieldValue', backref='request', cascade='all, delete-orphan')
     
     def get_form_data(self):
-        return json.loads(self.form_data)
+        # Rows written before the JSON column may still hold a JSON string
+        if isinstance(self.form_data, str):
+            return json.loads(self.form_data)
+        return self.form_data
+    
+    def attach_pdf(self, pdf_filename, pdf_path):
+        """Record the generated PDF with its size and content hash"""
+        self.pdf_filename = pdf_filename
+        self.pdf_sha256 = ServiceRequest.file_sha256(pdf_path)
+        self.pdf_size = os.path.getsize(pdf_path)
     
-    def set_form_data(self, data):
-        self.form_data = json.dumps(data, ensure_ascii=False)
+    @staticmethod
+    def file_sha256(path, chunk_size=1024 * 1024):
+        """SHA-256 hex digest of a file, read in chunks"""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def set_form_data(self, data, indexed_fields=()):
+        """
+        Store form data and extract the given fields for indexed search
+        
+        Args:
+            data: Submitted form values keyed by field name
+            indexed_fields: Field names whose values are copied to field_values
+        """
+        from request_search import build_search_text
+        
+        self.form_data = data
+        self.search_text = build_search_text(data)
+        self.field_values = [
+            ServiceRequestFieldValue(service_id=self.service_id, field_name=name,
+                                     value=ServiceRequestFieldValue.normalize(data[name]))
+            for name in indexed_fields
+            if data.get(name) not in (None, '')
+        ]
+    
+    @staticmethod
+    def search_by_field(service_id, field_name, value, prefix=False):
+        """Query requests of a service by an extracted field value"""
+        return ServiceRequest.query.join(ServiceRequestFieldValue).filter(
+            ServiceRequestFieldValue.service_id == service_id,
+            *ServiceRequestFieldValue.match(field_name, value, prefix)
+        )
 
+class ServiceRequestFieldValue(db.Model):
+    """Form field value extracted from a request so it can be searched by index"""
+    __tablename__ = 'service_request_field_values'
+    __table_args__ = (
+        db.Index('ix_field_values_service_field_value', 'service_id', 'field_name', 'value'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    request_id = db.Column(db.Integer, db.ForeignKey('service_requests.id'), nullable=False, index=True)
+    service_id = db.Column(db.Integer, db.ForeignKey('services.id'), nullable=False)
+    field_name = db.Column(db.String(100), nullable=False)
+    value = db.Column(db.String(255))
+    
+    @staticmethod
+    def normalize(value):
+        """Normalize a stored or queried value the same way as full-text search"""
+        from request_search import normalize_persian
+        
+        return normalize_persian(value).strip()[:255]
+    
+    @classmethod
+    def match(cls, field_name, value, prefix=False, entity=None):
+        """
+        Filter conditions selecting values of a field equal to, or with prefix
+        starting with, the normalized value; entity may be an alias of this model
+        """
+        entity = entity or cls
+        value = cls.normalize(value)
+        condition = entity.value.startswith(value, autoescape=True) if prefix else entity.value == value
+        return entity.field_name == field_name, condition
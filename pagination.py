@@ -0,0 +1,94 @@
+"""
+Keyset (cursor) pagination helpers
+Pages are addressed by the (created_at, id) of their boundary rows, so every
+page costs the same index range scan regardless of how deep it is
+"""
+
+import base64
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(created_at, row_id):
+    """Encode a (created_at, id) position as an opaque URL-safe cursor"""
+    raw = f"{created_at.isoformat()}|{row_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor into (created_at, id), or None if it is missing or invalid"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = base64.urlsafe_b64decode(padded).decode('utf-8').split('|')
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+class KeysetPage:
+    """One page of keyset-paginated results, newest first"""
+
+    def __init__(self, items, per_page, has_next, has_prev, total=None):
+        self.items = items
+        self.per_page = per_page
+        self.has_next = has_next
+        self.has_prev = has_prev
+        self.total = total  # Approximate total, if the caller supplied one
+
+    @property
+    def next_cursor(self):
+        if self.has_next and self.items:
+            return encode_cursor(self.items[-1].created_at, self.items[-1].id)
+        return None
+
+    @property
+    def prev_cursor(self):
+        if self.has_prev and self.items:
+            return encode_cursor(self.items[0].created_at, self.items[0].id)
+        return None
+
+
+def keyset_paginate(query, model, per_page, after=None, before=None, total=None):
+    """
+    Paginate a query by (created_at, id) in descending order
+
+    Args:
+        query: SQLAlchemy query over model, without ordering
+        model: Model class with created_at and id columns
+        per_page: Number of items per page
+        after: Cursor of the last row of the previous page (older rows)
+        before: Cursor of the first row of the next page (newer rows)
+        total: Optional approximate total to show alongside the page
+
+    Returns:
+        KeysetPage
+    """
+    created_at, row_id = model.created_at, model.id
+    after_key = decode_cursor(after)
+    before_key = decode_cursor(before)
+
+    if before_key and not after_key:
+        # Walk backwards towards newer rows, then restore descending order
+        key_created, key_id = before_key
+        rows = query.filter(or_(
+            created_at > key_created,
+            and_(created_at == key_created, row_id > key_id)
+        )).order_by(created_at.asc(), row_id.asc()).limit(per_page + 1).all()
+
+        has_prev = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        return KeysetPage(items, per_page, has_next=True, has_prev=has_prev, total=total)
+
+    if after_key:
+        key_created, key_id = after_key
+        query = query.filter(or_(
+            created_at < key_created,
+            and_(created_at == key_created, row_id < key_id)
+        ))
+
+    rows = query.order_by(created_at.desc(), row_id.desc()).limit(per_page + 1).all()
+    has_next = len(rows) > per_page
+    return KeysetPage(rows[:per_page], per_page, has_next=has_next,
+                      has_prev=after_key is not None, total=total)
@@ -0,0 +1,296 @@
+"""
+PDF generation backends
+One interface over the ways a service request can be rendered: Google Docs in
+place, Google Docs with the no-copy generator, a Drive copy, or locally with
+ReportLab. Each service picks an engine by name; building replacements,
+allocating the output file and timing renders are shared by all engines
+"""
+
+import os
+import time
+import threading
+import logging
+from typing import Dict, Optional
+
+from pdf_storage import get_pdf_storage
+from pipeline_metrics import get_pipeline_metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ENGINE = 'google_inplace'
+
+
+class PDFRenderError(Exception):
+    """Raised when an engine could not produce the PDF"""
+    pass
+
+
+def build_replacements(service_request) -> Dict[str, str]:
+    """
+    Placeholder values for a service request, keyed both as 'name' and '{{name}}'
+
+    Args:
+        service_request: ServiceRequest with its service and form data
+
+    Returns:
+        Dict mapping placeholders to values
+    """
+    replacements = {}
+
+    def add(placeholder, value):
+        placeholder = (placeholder or '').strip()
+        if placeholder.startswith('{{') and placeholder.endswith('}}'):
+            placeholder = placeholder[2:-2]
+        replacements[placeholder] = value
+        replacements[f'{{{{{placeholder}}}}}'] = value
+
+    form_data = service_request.get_form_data()
+    for field in service_request.service.form_fields:
+        if field.document_placeholder:
+            add(field.document_placeholder, str(form_data.get(field.field_name, '')))
+
+    # Metadata
+    add('tracking_code', service_request.tracking_code)
+    add('request_date', service_request.created_at.strftime('%Y/%m/%d'))
+    if getattr(service_request, 'user', None):
+        add('requester_name', service_request.user.username)
+
+    return replacements
+
+
+class PDFBackend:
+    """Base class for PDF engines"""
+
+    name = ''
+    uses_google = False  # Renders go through Google APIs (rate limiter, circuit breaker)
+
+    def render(self, service_request, replacements: Dict[str, str], output_path: str):
+        """
+        Write the PDF for a service request to output_path
+
+        Raises:
+            PDFRenderError (or the underlying error) when the PDF was not produced
+        """
+        raise NotImplementedError
+
+
+class GoogleInPlaceBackend(PDFBackend):
+    """Temporarily fills the template itself and restores it by range"""
+
+    name = 'google_inplace'
+    uses_google = True
+
+    def __init__(self, credentials_path: str = 'credentials.json'):
+        self.credentials_path = credentials_path
+        self._generator = None
+
+    def render(self, service_request, replacements, output_path):
+        from google_docs_pdf_generator import GoogleDocsPDFGenerator
+
+        document_id = getattr(service_request.service, 'google_doc_id', None)
+        if not document_id:
+            raise PDFRenderError("Service has no google_doc_id")
+        if self._generator is None:
+            self._generator = GoogleDocsPDFGenerator(self.credentials_path)
+        if not self._generator.generate_pdf_with_replacements(document_id, replacements, output_path):
+            raise PDFRenderError(f"Google Docs render failed for template {document_id}")
+
+
+class GoogleNoCopyBackend(PDFBackend):
+    """In-place rendering through NoCopyPDFGenerator"""
+
+    name = 'google_nocopy'
+    uses_google = True
+
+    def __init__(self, credentials_path: str = 'credentials.json'):
+        self.credentials_path = credentials_path
+        self._generator = None
+
+    def render(self, service_request, replacements, output_path):
+        from pdf_generator_no_copy import NoCopyPDFGenerator
+
+        document_id = getattr(service_request.service, 'google_doc_id', None)
+        if not document_id:
+            raise PDFRenderError("Service has no google_doc_id")
+        if self._generator is None:
+            self._generator = NoCopyPDFGenerator(self.credentials_path)
+        if not self._generator.generate_pdf_without_copy(document_id, replacements, output_path):
+            raise PDFRenderError(f"No-copy render failed for template {document_id}")
+
+
+class GoogleCopyBackend(PDFBackend):
+    """Fills a Drive copy of the template, from the copy pool when one is running"""
+
+    name = 'google_copy'
+    uses_google = True
+
+    def __init__(self, docs_service=None, credentials_path: str = 'credentials.json'):
+        self.credentials_path = credentials_path
+        self._docs_service = docs_service
+
+    @property
+    def docs_service(self):
+        if self._docs_service is None:
+            from google_docs_service import GoogleDocsService
+            self._docs_service = GoogleDocsService(self.credentials_path)
+        return self._docs_service
+
+    def render(self, service_request, replacements, output_path):
+        from drive_copy_pool import get_copy_pool
+
+        template_id = getattr(service_request.service, 'google_doc_id', None)
+        if not template_id:
+            raise PDFRenderError("No Google Doc template configured for this service")
+
+        pool = get_copy_pool()
+        if pool:
+            self._render_pooled(pool, template_id, replacements, output_path)
+        else:
+            self._render_fresh(template_id, service_request.tracking_code, replacements, output_path)
+
+    def _render_pooled(self, pool, template_id, replacements, output_path):
+        """Fill a ready copy from the pool and export it; the pool resets it in the background"""
+        copy = pool.checkout(template_id)
+        try:
+            reset = self.docs_service.fill_placeholders(copy.doc_id, replacements)
+            self.docs_service.export_pdf_to_file(copy.doc_id, output_path)
+        except Exception:
+            pool.discard(copy)
+            raise
+        pool.checkin(copy, reset)
+
+    def _render_fresh(self, template_id, tracking_code, replacements, output_path):
+        """Copy the template, fill and export the copy, then delete it"""
+        copy_title = f"Request_{tracking_code}_{time.strftime('%Y%m%d_%H%M%S')}"
+        temp_doc_id = self.docs_service.create_document_copy(template_id, copy_title)
+        try:
+            self.docs_service.fill_placeholders(temp_doc_id, replacements)
+            self.docs_service.export_pdf_to_file(temp_doc_id, output_path)
+        finally:
+            self.docs_service.delete_document(temp_doc_id)
+
+
+class LocalBackend(PDFBackend):
+    """ReportLab rendering of the form data; no Google dependency"""
+
+    name = 'local'
+
+    def render(self, service_request, replacements, output_path):
+        from pdf_generator import PersianPDFGenerator
+
+        # Build content from form data
+        content = f"کد پیگیری: {service_request.tracking_code}\n\n"
+        content += f"تاریخ درخواست: {service_request.created_at.strftime('%Y/%m/%d')}\n\n"
+
+        form_data = service_request.get_form_data()
+        for field in service_request.service.form_fields:
+            content += f"{field.field_label}: {form_data.get(field.field_name, '')}\n"
+
+        if not PersianPDFGenerator().generate_pdf_from_text(
+                content,
+                output_path,
+                title=f"درخواست خدمت: {service_request.service.name}",
+                font_name='Vazir'):
+            raise PDFRenderError("Local PDF generation failed")
+
+
+# Registered engines and their render counters
+_backends = {}
+_default_engine = DEFAULT_ENGINE
+_engine_stats = {}
+_registry_lock = threading.Lock()
+
+def register_backend(backend: PDFBackend) -> PDFBackend:
+    """Make an engine available by its name (replacing any engine of that name)"""
+    with _registry_lock:
+        _backends[backend.name] = backend
+        _engine_stats.setdefault(backend.name, {'renders': 0, 'failures': 0, 'seconds': 0.0})
+    return backend
+
+def init_pdf_backends(default_engine: str = DEFAULT_ENGINE, credentials_path: str = 'credentials.json',
+                      docs_service=None):
+    """Register the built-in engines and choose the default one"""
+    global _default_engine
+    for backend in (GoogleInPlaceBackend(credentials_path), GoogleNoCopyBackend(credentials_path),
+                    GoogleCopyBackend(docs_service, credentials_path), LocalBackend()):
+        register_backend(backend)
+    if default_engine not in _backends:
+        raise ValueError(f"Unknown PDF engine: {default_engine}")
+    _default_engine = default_engine
+
+def get_backend(name: Optional[str] = None) -> PDFBackend:
+    """Get an engine by name, or the default engine"""
+    if not _backends:
+        init_pdf_backends(_default_engine)
+    name = name or _default_engine
+    with _registry_lock:
+        if name not in _backends:
+            raise ValueError(f"Unknown PDF engine: {name}")
+        return _backends[name]
+
+def available_engines():
+    """Names of the registered engines"""
+    if not _backends:
+        init_pdf_backends(_default_engine)
+    with _registry_lock:
+        return sorted(_backends)
+
+def engine_for(service_request) -> str:
+    """Engine configured for the request's service, or the default engine"""
+    service = getattr(service_request, 'service', None)
+    return getattr(service, 'pdf_engine', None) or _default_engine
+
+def render_pdf(service_request, engine: Optional[str] = None, storage=None) -> str:
+    """
+    Render a service request with an engine and store the PDF
+
+    Args:
+        service_request: ServiceRequest to render
+        engine: Engine name; defaults to the one configured for the service
+        storage: PDFStorage that decides where the file is written
+
+    Returns:
+        Storage key (filename) of the PDF
+
+    Raises:
+        PDFRenderError (or the engine's own error) if no PDF was produced
+    """
+    backend = get_backend(engine or engine_for(service_request))
+    replacements = build_replacements(service_request)
+    storage = storage or get_pdf_storage()
+    pdf_filename, output_path = storage.allocate(f"request_{service_request.tracking_code}.pdf")
+
+    start = time.monotonic()
+    try:
+        backend.render(service_request, replacements, output_path)
+        if not os.path.exists(output_path):
+            raise PDFRenderError(f"Engine {backend.name} produced no file")
+    except Exception:
+        _record(backend.name, False, time.monotonic() - start)
+        raise
+
+    _record(backend.name, True, time.monotonic() - start)
+    logger.info(f"Rendered {service_request.tracking_code} with {backend.name} "
+                f"in {time.monotonic() - start:.2f}s")
+    return pdf_filename
+
+def _record(engine: str, success: bool, seconds: float):
+    get_pipeline_metrics().observe('pdf_render_seconds', seconds, engine=engine)
+    with _registry_lock:
+        stats = _engine_stats.setdefault(engine, {'renders': 0, 'failures': 0, 'seconds': 0.0})
+        stats['renders'] += 1
+        stats['seconds'] += seconds
+        if not success:
+            stats['failures'] += 1
+
+def engine_stats() -> Dict[str, Dict]:
+    """Render counts, failures and average seconds per engine"""
+    with _registry_lock:
+        return {
+            name: {
+                'renders': stats['renders'],
+                'failures': stats['failures'],
+                'avg_seconds': round(stats['seconds'] / stats['renders'], 3) if stats['renders'] else 0.0,
+            }
+            for name, stats in _engine_stats.items()
+        }
@@ -0,0 +1,96 @@
+"""
+PDF download responses
+Serves generated PDFs with strong ETags, conditional GET, byte ranges and
+long-lived cache headers, optionally handing the transfer to a front proxy
+"""
+
+import os
+import logging
+from datetime import datetime, timezone
+from flask import Response, request, send_file
+
+logger = logging.getLogger(__name__)
+
+SENDFILE_MODES = ('', 'x-accel-redirect', 'x-sendfile')
+
+# Hex digits of the content hash carried in download links as ?v=
+VERSION_LENGTH = 16
+
+
+def pdf_version(sha256):
+    """Version tag for download links of a PDF with the given content hash"""
+    return sha256[:VERSION_LENGTH] if sha256 else None
+
+
+def is_current_version(version, sha256):
+    """Whether a ?v= tag names exactly the current content; prefixes and stale tags do not"""
+    return bool(version) and version == pdf_version(sha256)
+
+
+def build_pdf_response(pdf_path, download_name, etag, immutable=False, max_age=31536000,
+                       sendfile_mode='', accel_prefix='/protected/pdf_outputs/', output_folder=None):
+    """
+    Build the download response for a stored PDF
+
+    Args:
+        pdf_path: Absolute path of the PDF on disk
+        download_name: File name shown to the user
+        etag: Content hash of the file, sent as a strong ETag
+        immutable: URL is pinned to this content version, so it may be cached for max_age
+        max_age: Cache lifetime in seconds for immutable responses
+        sendfile_mode: '' to stream from Python, 'x-accel-redirect' (nginx) or 'x-sendfile' (Apache/lighttpd)
+        accel_prefix: Internal nginx location mapped to output_folder
+        output_folder: Root folder the accel_prefix location points at
+
+    Returns:
+        Flask response (200, 206, 304 or 416)
+    """
+    stat = os.stat(pdf_path)
+    last_modified = datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc)
+
+    if sendfile_mode:
+        response = _offloaded_response(pdf_path, download_name, etag, last_modified, stat.st_size,
+                                       sendfile_mode, accel_prefix, output_folder)
+    else:
+        # Werkzeug handles If-None-Match, If-Modified-Since, Range and If-Range
+        response = send_file(pdf_path, mimetype='application/pdf', as_attachment=True,
+                             download_name=download_name, conditional=True, etag=etag,
+                             last_modified=last_modified, max_age=None)
+        response.headers['Accept-Ranges'] = 'bytes'
+
+    response.cache_control.private = True
+    if immutable:
+        response.cache_control.no_cache = None
+        response.cache_control.max_age = max_age
+        response.cache_control.immutable = True
+    else:
+        # Unversioned URL: content may be regenerated, so always revalidate (cheap 304)
+        response.cache_control.no_cache = True
+    return response
+
+
+def _offloaded_response(pdf_path, download_name, etag, last_modified, size,
+                        sendfile_mode, accel_prefix, output_folder):
+    """Empty-bodied response telling the proxy which file to send"""
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    response = Response(mimetype='application/pdf')
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.headers['Content-Disposition'] = f'attachment; filename="{download_name}"'
+    response.headers['Accept-Ranges'] = 'bytes'
+
+    if sendfile_mode == 'x-accel-redirect':
+        relative_path = os.path.relpath(pdf_path, output_folder).replace(os.sep, '/')
+        response.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + relative_path
+    elif sendfile_mode == 'x-sendfile':
+        response.headers['X-Sendfile'] = pdf_path
+    else:
+        raise ValueError(f"Unknown sendfile mode: {sendfile_mode}")
+
+    # The proxy fills in the body, Content-Length and any Range handling
+    logger.debug(f"Offloading {pdf_path} ({size} bytes) via {sendfile_mode}")
+    return response
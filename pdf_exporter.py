@@ -0,0 +1,198 @@
+"""
+Streaming PDF exporter
+One Drive export path shared by every Google Docs generator: streams the PDF
+straight to its destination in tuned chunks, resumes from the last complete chunk after a transient failure, and reports
+throughput per export
+"""
+
+import io
+import os
+import time
+import socket
+import random
+import logging
+from dataclasses import dataclass
+from typing import BinaryIO, Union
+
+try:
+    from googleapiclient.errors import HttpError
+    from googleapiclient.http import MediaIoBaseDownload
+    import httplib2
+    TRANSIENT_ERRORS = (socket.timeout, ConnectionError, httplib2.HttpLib2Error)
+except ImportError:
+    class HttpError(Exception):
+        """Placeholder so the exporter imports without the Google client installed"""
+    MediaIoBaseDownload = None
+    TRANSIENT_ERRORS = (socket.timeout, ConnectionError)
+
+from google_api_limiter import get_api_limiter
+from pipeline_metrics import get_pipeline_metrics
+
+logger = logging.getLogger(__name__)
+
+# Drive caps exports at 10 MB; 4 MB chunks fetch typical PDFs in one request
+# while bounding what a failed chunk costs on large ones
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+
+TRANSIENT_STATUSES = (500, 502, 503, 504)
+
+
+@dataclass
+class ExportStats:
+    """Transfer figures for one export"""
+    file_id: str
+    bytes: int = 0
+    seconds: float = 0.0
+    chunks: int = 0
+    resumes: int = 0
+    write_seconds: float = 0.0  # Part of seconds spent writing to the destination
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes / self.seconds if self.seconds > 0 else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            'file_id': self.file_id,
+            'bytes': self.bytes,
+            'seconds': round(self.seconds, 3),
+            'chunks': self.chunks,
+            'resumes': self.resumes,
+            'write_seconds': round(self.write_seconds, 3),
+            'bytes_per_second': round(self.bytes_per_second),
+        }
+
+
+class PDFExporter:
+    """Downloads Drive exports as PDF through the shared rate limiter"""
+
+    def __init__(self, chunk_size: int = DEFAULT_CHUNK_SIZE, max_resumes: int = 3,
+                 resume_backoff: float = 1.0):
+        """
+        Args:
+            chunk_size: Bytes requested per download call
+            max_resumes: Transient failures tolerated per export
+            resume_backoff: First wait in seconds before resuming
+        """
+        self.chunk_size = chunk_size
+        self.max_resumes = max_resumes
+        self.resume_backoff = resume_backoff
+
+    def export(self, drive_service, file_id: str, destination: Union[str, BinaryIO]) -> ExportStats:
+        """
+        Export a Google Doc as PDF
+
+        Args:
+            drive_service: Drive v3 service
+            file_id: Document to export
+            destination: File path (written via a temporary file, so a failed export
+                         never leaves a truncated PDF behind) or a writable binary file
+
+        Returns:
+            Transfer statistics
+        """
+        if not isinstance(destination, str):
+            return self._observe(self._download(drive_service, file_id, destination))
+
+        directory = os.path.dirname(destination)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        partial_path = f"{destination}.part"
+        try:
+            with open(partial_path, 'wb') as f:
+                stats = self._download(drive_service, file_id, f)
+            start = time.monotonic()
+            os.replace(partial_path, destination)
+            elapsed = time.monotonic() - start
+            stats.seconds += elapsed
+            stats.write_seconds += elapsed
+            return self._observe(stats)
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+
+    def export_bytes(self, drive_service, file_id: str) -> bytes:
+        """Export a Google Doc as PDF into memory"""
+        buffer = io.BytesIO()
+        self._observe(self._download(drive_service, file_id, buffer))
+        return buffer.getvalue()
+
+    def _download(self, drive_service, file_id: str, fd: BinaryIO) -> ExportStats:
+        stats = ExportStats(file_id)
+        request = drive_service.files().export_media(fileId=file_id, mimeType='application/pdf')
+        downloader = MediaIoBaseDownload(_TimedWriter(fd, stats), request, chunksize=self.chunk_size)
+
+        limiter = get_api_limiter()
+        started = time.monotonic()
+        done = False
+        while not done:
+            try:
+                status, done = limiter.call('drive', 'export', downloader.next_chunk)
+            except Exception as error:
+                if not self.is_transient(error) or stats.resumes >= self.max_resumes:
+                    raise
+                # The downloader keeps its offset, so the next call resumes after the
+                # last chunk that was written
+                delay = self.resume_backoff * (2 ** stats.resumes) * (0.5 + random.random())
+                stats.resumes += 1
+                logger.warning(f"Export of {file_id} interrupted ({str(error)}); resuming in {delay:.1f}s "
+                               f"(attempt {stats.resumes}/{self.max_resumes})")
+                time.sleep(delay)
+                continue
+
+            stats.chunks += 1
+            if status:
+                stats.bytes = status.resumable_progress
+                if status.total_size:
+                    logger.debug(f"PDF export progress: {int(status.progress() * 100)}%")
+
+        stats.seconds = time.monotonic() - started
+        logger.info(f"PDF exported: {stats.to_dict()}")
+        return stats
+
+    @staticmethod
+    def _observe(stats: ExportStats) -> ExportStats:
+        """Record transfer and write time as separate pipeline stages"""
+        metrics = get_pipeline_metrics()
+        metrics.observe_stage('export', max(stats.seconds - stats.write_seconds, 0.0))
+        metrics.observe_stage('write', stats.write_seconds)
+        return stats
+
+    @staticmethod
+    def is_transient(error: Exception) -> bool:
+        """Whether a failed chunk is worth retrying"""
+        if isinstance(error, HttpError):
+            return getattr(error.resp, 'status', None) in TRANSIENT_STATUSES
+        return isinstance(error, TRANSIENT_ERRORS)
+
+
+class _TimedWriter:
+    """File wrapper that adds the time spent in write() to the export stats"""
+
+    def __init__(self, fd: BinaryIO, stats: ExportStats):
+        self._fd = fd
+        self._stats = stats
+
+    def write(self, data: bytes) -> int:
+        start = time.monotonic()
+        try:
+            return self._fd.write(data)
+        finally:
+            self._stats.write_seconds += time.monotonic() - start
+
+
+# Global exporter instance
+_pdf_exporter = None
+
+def init_pdf_exporter(**settings) -> PDFExporter:
+    """Initialize the shared exporter with configured settings"""
+    global _pdf_exporter
+    _pdf_exporter = PDFExporter(**settings)
+    return _pdf_exporter
+
+def get_pdf_exporter() -> PDFExporter:
+    """Get or create the shared exporter"""
+    global _pdf_exporter
+    if _pdf_exporter is None:
+        _pdf_exporter = PDFExporter()
+    return _pdf_exporter
@@ -5,10 +5,8 @@ Generates PDF by temporarily modifying the original document and restoring it
 """
 
 import os
-import time
 import logging
-from typing import Dict, Optional, List, Tuple
-import io
+from typing import Dict, List
 
 # Try to import Google API libraries
 try:
@@ -20,10 +18,19 @@ except ImportError:
     GOOGLE_API_AVAILABLE = False
     HttpError = Exception  # Fallback for type hints
 
+from google_api_limiter import execute_with_limit
+from google_docs_pdf_generator import GoogleDocsPDFGenerator
+from pdf_backends import LocalBackend, build_replacements
+
 logger = logging.getLogger(__name__)
 
-class NoCopyPDFGenerator:
-    """Generate PDF from Google Docs without creating copies"""
+class NoCopyPDFGenerator(GoogleDocsPDFGenerator):
+    """
+    Generate PDF from Google Docs without creating copies
+    
+    The fill, export and exact-range restore are GoogleDocsPDFGenerator's
+    in-place render; this class keeps its credentials setup and helpers.
+    """
     
     def __init__(self, credentials_path: str):
         """Initialize with Google service account credentials"""
@@ -39,11 +46,12 @@ class NoCopyPDFGenerator:
         )
         self.docs_service = build('docs', 'v1', credentials=self.credentials)
         self.drive_service = build('drive', 'v3', credentials=self.credentials)
+        self.last_report = None
         
     def get_document_content(self, document_id: str) -> dict:
         """Get the current content of a Google Doc"""
         try:
-            document = self.docs_service.documents().get(documentId=document_id).execute()
+            document = execute_with_limit(self.docs_service.documents().get(documentId=document_id), 'docs', 'read')
             return document
         except HttpError as e:
             logger.error(f"Error getting document: {str(e)}")
@@ -97,43 +105,15 @@ class NoCopyPDFGenerator:
     def batch_update_document(self, document_id: str, requests: List[dict]) -> dict:
         """Execute batch update on document"""
         try:
-            result = self.docs_service.documents().batchUpdate(
+            result = execute_with_limit(self.docs_service.documents().batchUpdate(
                 documentId=document_id,
                 body={'requests': requests}
-            ).execute()
+            ), 'docs', 'write')
             return result
         except HttpError as e:
             logger.error(f"Error updating document: {str(e)}")
             raise
     
-    def export_as_pdf(self, document_id: str) -> bytes:
-        """Export document as PDF"""
-        try:
-            request = self.drive_service.files().export_media(
-                fileId=document_id,
-                mimeType='application/pdf'
-            )
-            
-            file = io.BytesIO()
-            downloader = request.execute()
-            
-            if isinstance(downloader, bytes):
-                return downloader
-            else:
-                # Handle MediaIoBaseDownload if needed
-                import googleapiclient.http
-                downloader = googleapiclient.http.MediaIoBaseDownload(file, request)
-                done = False
-                while not done:
-                    status, done = downloader.next_chunk()
-                
-                file.seek(0)
-                return file.read()
-                
-        except HttpError as e:
-            logger.error(f"Error exporting PDF: {str(e)}")
-            raise
-    
     def generate_pdf_without_copy(self, 
                                  document_id: str,
                                  replacements: Dict[str, str],
@@ -149,61 +129,8 @@ class NoCopyPDFGenerator:
         Returns:
             True if successful, False otherwise
         """
-        original_placeholders = {}
-        
-        try:
-            # Step 1: Get current document state
-            logger.info(f"Getting document content for {document_id}")
-            document = self.get_document_content(document_id)
-            
-            # Step 2: Extract current placeholders
-            current_placeholders = self.extract_placeholders(document)
-            logger.info(f"Found placeholders: {current_placeholders}")
-            
-            # Step 3: Create forward replacements (placeholder -> value)
-            forward_requests = self.create_batch_update_request(replacements)
-            
-            # Step 4: Apply replacements
-            logger.info("Applying replacements to document")
-            self.batch_update_document(document_id, forward_requests)
-            
-            # Small delay to ensure changes are applied
-            time.sleep(1)
-            
-            # Step 5: Export as PDF
-            logger.info("Exporting document as PDF")
-            pdf_data = self.export_as_pdf(document_id)
-            
-            # Step 6: Save PDF
-            with open(output_path, 'wb') as f:
-                f.write(pdf_data)
-            logger.info(f"PDF saved to {output_path}")
-            
-            # Step 7: Create reverse replacements (value -> placeholder)
-            reverse_replacements = {v: k for k, v in replacements.items()}
-            reverse_requests = self.create_batch_update_request(reverse_replacements)
-            
-            # Step 8: Restore original placeholders
-            logger.info("Restoring original placeholders")
-            self.batch_update_document(document_id, reverse_requests)
-            
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error in generate_pdf_without_copy: {str(e)}")
-            
-            # Try to restore document on error
-            try:
-                if replacements:
-                    reverse_replacements = {v: k for k, v in replacements.items()}
-                    reverse_requests = self.create_batch_update_request(reverse_replacements)
-                    self.batch_update_document(document_id, reverse_requests)
-                    logger.info("Document restored after error")
-            except:
-                logger.error("Failed to restore document after error")
-            
-            return False
-
+        return self.generate_pdf_with_replacements(document_id, replacements, output_path,
+                                                   delay_before_export=1.0, delay_before_restore=0)
 
 def generate_pdf_from_request_no_copy(service_request, credentials_path: str = 'credentials.json'):
     """
@@ -218,7 +145,6 @@ def generate_pdf_from_request_no_copy(service_request, credentials_path: str = '
     """
     try:
         service = service_request.service
-        form_data = service_request.get_form_data()
         
         if not service.google_doc_id:
             raise Exception("No Google Doc template configured for this service")
@@ -226,18 +152,7 @@ def generate_pdf_from_request_no_copy(service_request, credentials_path: str = '
         # Initialize generator
         generator = NoCopyPDFGenerator(credentials_path)
         
-        # Prepare replacements
-        replacements = {}
-        for field in service.form_fields:
-            if field.document_placeholder:
-                value = str(form_data.get(field.field_name, ''))
-                replacements[field.document_placeholder] = value
-        
-        # Add metadata replacements
-        replacements['{{tracking_code}}'] = service_request.tracking_code
-        replacements['{{request_date}}'] = service_request.created_at.strftime('%Y/%m/%d')
-        if service_request.user:
-            replacements['{{requester_name}}'] = service_request.user.username
+        replacements = build_replacements(service_request)
         
         # Generate output path
         pdf_filename = f"output_{service_request.tracking_code}.pdf"
@@ -264,9 +179,13 @@ def generate_pdf_from_request_no_copy(service_request, credentials_path: str = '
 
 
 # Alternative approach using ReportLab (if Google Docs API fails)
-def generate_pdf_fallback(service_request):
+def generate_pdf_fallback(service_request, storage=None):
     """
     Fallback PDF generation using ReportLab
+    
+    Args:
+        service_request: Service request object
+        storage: PDFStorage that decides where the file is written
     """
     try:
         from document_processor import process_service_request_to_pdf
@@ -276,34 +195,15 @@ def generate_pdf_fallback(service_request):
             template_path = service_request.service.docx_template_path
         else:
             # Create a simple PDF without template
-            from pdf_generator import PersianPDFGenerator
-            
-            generator = PersianPDFGenerator()
-            
-            # Build content from form data
-            content = f"کد پیگیری: {service_request.tracking_code}\n\n"
-            content += f"تاریخ درخواست: {service_request.created_at.strftime('%Y/%m/%d')}\n\n"
-            
-            form_data = service_request.get_form_data()
-            for field in service_request.service.form_fields:
-                label = field.field_label
-                value = form_data.get(field.field_name, '')
-                content += f"{label}: {value}\n"
-            
             pdf_filename = f"output_{service_request.tracking_code}.pdf"
-            pdf_path = os.path.join('pdf_outputs', pdf_filename)
-            
-            os.makedirs('pdf_outputs', exist_ok=True)
-            
-            success = generator.generate_pdf_from_text(
-                content,
-                pdf_path,
-                title=f"درخواست خدمت: {service_request.service.name}",
-                font_name='Vazir'
-            )
+            if storage:
+                pdf_filename, pdf_path = storage.allocate(pdf_filename)
+            else:
+                pdf_path = os.path.join('pdf_outputs', pdf_filename)
+                os.makedirs('pdf_outputs', exist_ok=True)
             
-            if success:
-                return pdf_filename
+            LocalBackend().render(service_request, {}, pdf_path)
+            return pdf_filename
         
         # Use DOCX template if available
         output_path = process_service_request_to_pdf(
@@ -8,13 +8,19 @@ import os
 import queue
 import threading
 import time
+import uuid
 import logging
-from typing import Dict, Optional, Callable, Any
+from collections import deque
+from typing import Dict, List, Optional, Callable, Any
 from datetime import datetime
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 
-from google_docs_pdf_generator import generate_pdf_for_service_request
+from pdf_backends import engine_for, get_backend, render_pdf
+from pdf_storage import get_pdf_storage
+from google_api_limiter import get_api_limiter, PDF_RENDER_COST
+from circuit_breaker import get_circuit_breaker, CircuitOpenError, CircuitState
+from pipeline_metrics import get_pipeline_metrics
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +39,17 @@ class ProcessingStatus(Enum):
     PROCESSING = "processing"
     COMPLETED = "completed"
     FAILED = "failed"
+    CANCELLED = "cancelled"
+
+class TaskControlError(Exception):
+    """Raised when an admin action does not apply to a task in its current state"""
+    pass
+
+class TaskPriority(Enum):
+    """Queue lanes, from most to least latency sensitive"""
+    INTERACTIVE = "interactive"  # An approver or requester is waiting on the result
+    AUTO = "auto"                # Auto-approved requests
+    BULK = "bulk"                # Backfills and other batch jobs
 
 @dataclass
 class PDFTask:
@@ -45,26 +62,163 @@ class PDFTask:
     created_at: datetime = None
     processed_at: Optional[datetime] = None
     callback: Optional[Callable] = None
+    priority: TaskPriority = TaskPriority.AUTO
+    enqueued_at: float = 0.0
+    callbacks: List[Callable] = field(default_factory=list)  # Callbacks of coalesced duplicate adds
+    coalesced: int = 0  # Number of duplicate adds attached to this task
+    engine: Optional[str] = None  # PDF engine that rendered the task (see pdf_backends)
+    attempts: int = 0  # Render attempts so far, including retries
+    park_timer: Optional[threading.Timer] = field(default=None, repr=False)  # Set while parked
     
     def __post_init__(self):
         if self.created_at is None:
             self.created_at = datetime.now()
+    
+    @property
+    def dedup_key(self):
+        """Identity of the request this task renders"""
+        return getattr(self.service_request, 'id', None) or self.service_request.tracking_code
+
+# Lane urgency, most urgent first
+_LANE_ORDER = {priority: order for order, priority in enumerate(TaskPriority)}
+
+# Share of worker time each lane gets when all lanes are busy
+DEFAULT_LANE_WEIGHTS = {
+    TaskPriority.INTERACTIVE: 10,
+    TaskPriority.AUTO: 3,
+    TaskPriority.BULK: 1,
+}
+
+class LaneQueue:
+    """
+    Multi-lane task queue with weighted fair scheduling
+    
+    Lanes are picked with smooth weighted round-robin. A task that has waited
+    longer than starvation_timeout is served next regardless of weights, so
+    low-weight lanes always make progress. Mirrors the queue.Queue get/put/qsize
+    interface used by the worker.
+    """
+    
+    def __init__(self, weights: Optional[Dict[TaskPriority, int]] = None, starvation_timeout: float = 60.0):
+        self.weights = dict(weights or DEFAULT_LANE_WEIGHTS)
+        self.starvation_timeout = starvation_timeout
+        self._lanes = {priority: deque() for priority in TaskPriority}
+        self._credits = {priority: 0 for priority in TaskPriority}
+        self._not_empty = threading.Condition()
+        self.paused = False  # While set, get() hands out no tasks
+    
+    def put(self, task: PDFTask):
+        """Append a task to its lane"""
+        with self._not_empty:
+            task.enqueued_at = time.monotonic()
+            self._lanes[task.priority].append(task)
+            self._not_empty.notify()
+    
+    def get(self, timeout: Optional[float] = None) -> PDFTask:
+        """Remove and return the next task, raising queue.Empty on timeout"""
+        with self._not_empty:
+            if not self._not_empty.wait_for(self._can_serve, timeout):
+                raise queue.Empty
+            return self._lanes[self._next_lane()].popleft()
+    
+    def set_paused(self, paused: bool):
+        """Stop or restart handing out tasks; waiting tasks stay in their lanes"""
+        with self._not_empty:
+            self.paused = paused
+            self._not_empty.notify_all()
+    
+    def promote(self, task: PDFTask, priority: TaskPriority) -> bool:
+        """Move a waiting task to another lane, keeping its original wait time"""
+        with self._not_empty:
+            try:
+                self._lanes[task.priority].remove(task)
+            except ValueError:
+                return False  # Already picked up by the worker
+            task.priority = priority
+            lane = self._lanes[priority]
+            # Keep the lane ordered by enqueue time
+            position = next((i for i, other in enumerate(lane) if other.enqueued_at > task.enqueued_at), len(lane))
+            lane.insert(position, task)
+            return True
+    
+    def remove(self, task: PDFTask) -> bool:
+        """Take a waiting task out of its lane"""
+        with self._not_empty:
+            try:
+                self._lanes[task.priority].remove(task)
+                return True
+            except ValueError:
+                return False
+    
+    def snapshot(self) -> Dict[TaskPriority, tuple]:
+        """Waiting tasks per lane in serving order, copied without taking the lock"""
+        # tuple(deque) copies in one step under the GIL, so each lane is consistent
+        return {priority: tuple(self._lanes[priority]) for priority in TaskPriority}
+    
+    def qsize(self) -> int:
+        with self._not_empty:
+            return sum(len(lane) for lane in self._lanes.values())
+    
+    def lane_sizes(self) -> Dict[str, int]:
+        """Number of waiting tasks per lane"""
+        with self._not_empty:
+            return {priority.value: len(lane) for priority, lane in self._lanes.items()}
+    
+    def _has_tasks(self) -> bool:
+        return any(self._lanes.values())
+    
+    def _can_serve(self) -> bool:
+        return not self.paused and self._has_tasks()
+    
+    def _next_lane(self) -> TaskPriority:
+        busy = [priority for priority, lane in self._lanes.items() if lane]
+        
+        # Starvation protection: serve the longest-waiting overdue task first
+        now = time.monotonic()
+        overdue = [priority for priority in busy
+                   if now - self._lanes[priority][0].enqueued_at > self.starvation_timeout]
+        if overdue:
+            return min(overdue, key=lambda priority: self._lanes[priority][0].enqueued_at)
+        
+        # Smooth weighted round-robin over the non-empty lanes
+        total = 0
+        for priority in busy:
+            self._credits[priority] += self.weights[priority]
+            total += self.weights[priority]
+        chosen = max(busy, key=lambda priority: self._credits[priority])
+        self._credits[chosen] -= total
+        
+        # Idle lanes do not bank credit
+        for priority in TaskPriority:
+            if priority not in busy:
+                self._credits[priority] = 0
+        return chosen
 
 class PDFQueueProcessor:
     """Processes PDF generation requests sequentially"""
     
-    def __init__(self, max_retries: int = 3, retry_delay: float = 5.0):
+    def __init__(self, max_retries: int = 3, retry_delay: float = 5.0, preflight_check: bool = True,
+                 lane_weights: Optional[Dict[TaskPriority, int]] = None, starvation_timeout: float = 60.0,
+                 fallback_mode: str = 'local'):
         """
         Initialize the PDF queue processor
         
         Args:
             max_retries: Maximum number of retries for failed tasks
             retry_delay: Delay between retries in seconds
+            preflight_check: Reject tasks whose template can not resolve their fields
+            lane_weights: Relative share of worker time per priority lane
+            starvation_timeout: Seconds after which a waiting task is served ahead of its lane's turn
+            fallback_mode: While the Google Docs circuit is open, 'local' renders with the
+                           local PDF generator and 'park' holds tasks until it closes
         """
-        self.queue = queue.Queue()
+        self.queue = LaneQueue(lane_weights, starvation_timeout)
+        self.fallback_mode = fallback_mode
         self.tasks = {}  # task_id -> PDFTask
+        self._active = {}  # request id -> pending or processing PDFTask
         self.max_retries = max_retries
         self.retry_delay = retry_delay
+        self.preflight_check = preflight_check
         self.is_running = False
         self.worker_thread = None
         self._lock = threading.Lock()
@@ -89,30 +243,49 @@ class PDFQueueProcessor:
             self.worker_thread.join(timeout=10)
         logger.info("Queue processor stopped")
     
-    def add_task(self, service_request: Any, callback: Optional[Callable] = None) -> str:
+    def add_task(self, service_request: Any, callback: Optional[Callable] = None,
+                 priority: TaskPriority = TaskPriority.AUTO) -> str:
         """
         Add a PDF generation task to the queue
         
+        Adding a request that already has a pending or processing task does not
+        render it again: the callback is attached to the in-flight task, which is
+        moved to a more urgent lane if needed, and its id is returned.
+        
         Args:
             service_request: Service request object
             callback: Optional callback function to call when task completes
+            priority: Queue lane for the task
             
         Returns:
             Task ID
         """
-        task_id = f"pdf_task_{service_request.tracking_code}_{int(time.time())}"
+        task_id = f"pdf_task_{service_request.tracking_code}_{uuid.uuid4().hex[:12]}"
         
         task = PDFTask(
             task_id=task_id,
             service_request=service_request,
-            callback=callback
+            callback=callback,
+            priority=priority
         )
         
         with self._lock:
+            existing = self._active.get(task.dedup_key)
+            if existing:
+                if callback:
+                    existing.callbacks.append(callback)
+                existing.coalesced += 1
+                if existing.status == ProcessingStatus.PENDING and \
+                        _LANE_ORDER[priority] < _LANE_ORDER[existing.priority]:
+                    self.queue.promote(existing, priority)
+                logger.info(f"Coalesced duplicate add for {service_request.tracking_code} into task {existing.task_id}")
+                return existing.task_id
+            
             self.tasks[task_id] = task
+            self._active[task.dedup_key] = task
         
         self.queue.put(task)
-        logger.info(f"Added task {task_id} to queue")
+        logger.info(f"Added task {task_id} to {priority.value} lane")
         
         return task_id
     
@@ -121,15 +294,177 @@ class PDFQueueProcessor:
         with self._lock:
             return self.tasks.get(task_id)
     
+    def get_active_task(self, request_id: Any) -> Optional[PDFTask]:
+        """The pending or processing task of a request, if any"""
+        with self._lock:
+            return self._active.get(request_id)
+    
     def get_queue_size(self) -> int:
         """Get the number of tasks in queue"""
         return self.queue.qsize()
     
+    def get_lane_sizes(self) -> Dict[str, int]:
+        """Get the number of tasks waiting in each lane"""
+        return self.queue.lane_sizes()
+    
     def get_all_tasks(self) -> Dict[str, PDFTask]:
         """Get all tasks"""
         with self._lock:
             return self.tasks.copy()
     
+    @property
+    def is_paused(self) -> bool:
+        return self.queue.paused
+    
+    def pause(self):
+        """Stop taking new tasks; the task being rendered runs to completion"""
+        self.queue.set_paused(True)
+        logger.warning("Queue processor paused")
+    
+    def resume(self):
+        """Take new tasks again after pause()"""
+        self.queue.set_paused(False)
+        logger.info("Queue processor resumed")
+    
+    def cancel_task(self, task_id: str) -> PDFTask:
+        """
+        Cancel a task that has not started rendering
+        
+        Callbacks run with the cancelled status so waiters are released.
+        
+        Raises:
+            KeyError: Unknown task
+            TaskControlError: The task is rendering or already finished
+        """
+        with self._lock:
+            task = self.tasks[task_id]
+            if task.status != ProcessingStatus.PENDING:
+                raise TaskControlError(f"Task {task_id} is {task.status.value}")
+            # Parked tasks are not in a lane; stop their timer instead
+            if task.park_timer:
+                task.park_timer.cancel()
+                task.park_timer = None
+            self.queue.remove(task)
+            task.status = ProcessingStatus.CANCELLED
+            task.error = "Cancelled by administrator"
+            self._active.pop(task.dedup_key, None)
+        
+        logger.warning(f"Task {task_id} cancelled")
+        self._run_callbacks(task)
+        return task
+    
+    def set_task_priority(self, task_id: str, priority: TaskPriority) -> PDFTask:
+        """
+        Move a waiting task to another lane, keeping its original wait time
+        
+        Raises:
+            KeyError: Unknown task
+            TaskControlError: The task is no longer waiting
+        """
+        with self._lock:
+            task = self.tasks[task_id]
+            if task.status != ProcessingStatus.PENDING:
+                raise TaskControlError(f"Task {task_id} is {task.status.value}")
+            if not self.queue.promote(task, priority):
+                # Parked: it rejoins the queue in its new lane
+                task.priority = priority
+        
+        logger.info(f"Task {task_id} moved to {priority.value} lane")
+        return task
+    
+    def retry_task(self, task_id: str) -> PDFTask:
+        """
+        Queue a failed or cancelled task again under the same id
+        
+        Raises:
+            KeyError: Unknown task
+            TaskControlError: The task has not failed, or its request already has a task in flight
+        """
+        with self._lock:
+            task = self.tasks[task_id]
+            if task.status not in (ProcessingStatus.FAILED, ProcessingStatus.CANCELLED):
+                raise TaskControlError(f"Task {task_id} is {task.status.value}")
+            existing = self._active.get(task.dedup_key)
+            if existing:
+                raise TaskControlError(f"Request already has task {existing.task_id} in flight")
+            
+            task.status = ProcessingStatus.PENDING
+            task.error = None
+            task.result = None
+            task.attempts = 0
+            self._active[task.dedup_key] = task
+        
+        self.queue.put(task)
+        logger.info(f"Task {task_id} queued for retry")
+        return task
+    
+    def snapshot(self, failed_limit: int = 100) -> Dict[str, Any]:
+        """
+        Queue state for monitoring, read without taking the processor or queue locks
+        
+        The task table and lanes are each copied in one step under the GIL; task
+        fields are read as they are at that moment, so a task a worker is updating
+        may show its previous state.
+        
+        Args:
+            failed_limit: Most recent failed and cancelled tasks to include
+            
+        Returns:
+            Dict with worker state, lane sizes and task lists
+        """
+        tasks = list(self.tasks.copy().values())
+        lanes = self.queue.snapshot()
+        now = datetime.now()
+        now_monotonic = time.monotonic()
+        
+        waiting = {}
+        for priority, lane in lanes.items():
+            for position, task in enumerate(lane):
+                waiting[task.task_id] = position
+        
+        in_flight, queued, parked, failed = [], [], [], []
+        for task in tasks:
+            view = self._describe(task, now, now_monotonic, waiting.get(task.task_id))
+            if task.status == ProcessingStatus.PROCESSING:
+                in_flight.append(view)
+            elif task.status == ProcessingStatus.PENDING:
+                (queued if view['position'] is not None else parked).append(view)
+            elif task.status in (ProcessingStatus.FAILED, ProcessingStatus.CANCELLED):
+                failed.append(view)
+        
+        queued.sort(key=lambda view: (_LANE_ORDER[TaskPriority(view['lane'])], view['position']))
+        failed.sort(key=lambda view: view['age_seconds'])
+        
+        return {
+            'paused': self.is_paused,
+            'worker_alive': bool(self.worker_thread and self.worker_thread.is_alive()),
+            'queue_size': sum(len(lane) for lane in lanes.values()),
+            'lanes': {priority.value: len(lane) for priority, lane in lanes.items()},
+            'in_flight': in_flight,
+            'queued': queued,
+            'parked': parked,
+            'failed': failed[:failed_limit],
+        }
+    
+    @staticmethod
+    def _describe(task: PDFTask, now: datetime, now_monotonic: float, position: Optional[int]) -> Dict[str, Any]:
+        """JSON-friendly view of a task"""
+        return {
+            'task_id': task.task_id,
+            'tracking_code': getattr(task.service_request, 'tracking_code', None),
+            'request_id': getattr(task.service_request, 'id', None),
+            'status': task.status.value,
+            'lane': task.priority.value,
+            'position': position,
+            'age_seconds': round((now - task.created_at).total_seconds(), 1),
+            'waiting_seconds': round(now_monotonic - task.enqueued_at, 1) if position is not None else None,
+            'attempts': task.attempts,
+            'coalesced': task.coalesced,
+            'engine': task.engine,
+            'error': task.error,
+            'result': task.result,
+        }
+    
     def _process_queue(self):
         """Worker thread that processes the queue"""
         logger.info("Queue processor worker started")
@@ -151,19 +486,172 @@ class PDFQueueProcessor:
         
         logger.info("Queue processor worker stopped")
     
+    def _preflight(self, task: PDFTask) -> Optional[str]:
+        """
+        Check a task against the cached template placeholder index
+        
+        Returns:
+            Rejection reason if the task can never succeed, None otherwise
+        """
+        if not self.preflight_check:
+            return None
+        
+        from placeholder_index import get_placeholder_index, PlaceholderValidationError
+        
+        def validate(service_request):
+            # Only Google engines render from a template; while the circuit is
+            # open the template can not be read (and local renders need none)
+            if not get_backend(engine_for(service_request)).uses_google:
+                return
+            if get_circuit_breaker('google_docs').state == CircuitState.OPEN:
+                return
+            get_placeholder_index().validate_service_request(service_request)
+        
+        try:
+            if _app and _db and hasattr(task.service_request, 'id'):
+                with _app.app_context():
+                    from models import ServiceRequest
+                    service_request = _db.session.get(ServiceRequest, task.service_request.id)
+                    if not service_request:
+                        return f"Service request with id {task.service_request.id} not found"
+                    validate(service_request)
+            else:
+                validate(task.service_request)
+        except PlaceholderValidationError as e:
+            return str(e)
+        except Exception as e:
+            # Pre-flight is best effort; the generator reports real failures
+            logger.warning(f"Pre-flight check skipped for task {task.task_id}: {str(e)}")
+        
+        return None
+    
+    def _wait_for_api_headroom(self, task: PDFTask, max_wait: float = 300.0):
+        """Sleep until the shared Google API limiter can cover one render"""
+        wait = get_api_limiter().wait_time(PDF_RENDER_COST)
+        if wait > 0:
+            wait = min(wait, max_wait)
+            logger.info(f"Pacing task {task.task_id}: waiting {wait:.1f}s for Google API quota")
+            time.sleep(wait)
+    
+    def _render(self, task: PDFTask, service_request: Any) -> Optional[str]:
+        """
+        Render with the service's engine; Google engines are guarded by the circuit breaker
+        
+        Raises:
+            CircuitOpenError: The circuit is open and fallback_mode is 'park'
+        """
+        engine = engine_for(service_request)
+        if not get_backend(engine).uses_google:
+            task.engine = engine
+            return render_pdf(service_request, engine=engine, storage=get_pdf_storage())
+        
+        breaker = get_circuit_breaker('google_docs')
+        
+        if not breaker.allow_request():
+            if self.fallback_mode != 'local':
+                raise CircuitOpenError(breaker.name, breaker.retry_in())
+            
+            logger.warning(f"Google Docs circuit open; rendering task {task.task_id} locally")
+            task.engine = 'local'
+            return render_pdf(service_request, engine='local', storage=get_pdf_storage())
+        
+        # Pace renders to the Google API quota instead of failing on 429s
+        with get_pipeline_metrics().span('api_wait'):
+            self._wait_for_api_headroom(task)
+        
+        start = time.monotonic()
+        try:
+            pdf_filename = render_pdf(service_request, engine=engine, storage=get_pdf_storage())
+        except Exception:
+            breaker.record(False, time.monotonic() - start)
+            raise
+        breaker.record(bool(pdf_filename), time.monotonic() - start)
+        task.engine = engine
+        return pdf_filename
+    
+    def _park(self, task: PDFTask, delay: float):
+        """Put a task back in its lane once the circuit may have recovered"""
+        with self._lock:
+            task.status = ProcessingStatus.PENDING
+        get_pipeline_metrics().inc('pdf_tasks_total', outcome='parked')
+        logger.warning(f"Parking task {task.task_id} for {delay:.0f}s while Google Docs is unavailable")
+        
+        timer = threading.Timer(delay, self._unpark, args=(task,))
+        timer.daemon = True
+        with self._lock:
+            task.park_timer = timer
+        timer.start()
+    
+    def _unpark(self, task: PDFTask):
+        """Timer callback: requeue a parked task unless it was cancelled or superseded meanwhile"""
+        with self._lock:
+            if task.park_timer is None or task.status != ProcessingStatus.PENDING or \
+                    self._active.get(task.dedup_key) is not task:
+                return
+            task.park_timer = None
+            self.queue.put(task)
+    
+    def _run_callbacks(self, task: PDFTask):
+        """
+        Run the task's callback and those of coalesced duplicate adds, then
+        release the request's dedup slot
+        
+        The slot is held until the callbacks have stored the result, so a lookup
+        in between still finds this task instead of queueing a second render.
+        Callbacks attached by adds coalesced meanwhile run before it is released.
+        """
+        get_pipeline_metrics().inc('pdf_tasks_total', outcome=task.status.value)
+        done = 0
+        with get_pipeline_metrics().span('callbacks'):
+            while True:
+                with self._lock:
+                    callbacks = ([task.callback] + task.callbacks)[done:]
+                    if not callbacks:
+                        if self._active.get(task.dedup_key) is task:
+                            del self._active[task.dedup_key]
+                        return
+                done += len(callbacks)
+                for callback in callbacks:
+                    if callback:
+                        try:
+                            callback(task)
+                        except Exception as e:
+                            logger.error(f"Error in task callback: {str(e)}")
+    
     def _process_task(self, task: PDFTask):
         """Process a single PDF generation task"""
         logger.info(f"Processing task {task.task_id}")
+        metrics = get_pipeline_metrics()
+        if task.enqueued_at:
+            metrics.observe_stage('queue_wait', time.monotonic() - task.enqueued_at)
         
         # Update task status
         with self._lock:
+            # Cancelled, or a stale copy of a task that is already being rendered or done
+            if task.status != ProcessingStatus.PENDING:
+                logger.info(f"Skipping {task.status.value} task {task.task_id}")
+                return
             task.status = ProcessingStatus.PROCESSING
             task.processed_at = datetime.now()
         
+        # Reject unresolvable tasks before they burn retry cycles
+        with metrics.span('preflight'):
+            rejection = self._preflight(task)
+        if rejection:
+            with self._lock:
+                task.status = ProcessingStatus.FAILED
+                task.error = rejection
+            
+            logger.error(f"Task {task.task_id} rejected by pre-flight check: {rejection}")
+            
+            self._run_callbacks(task)
+            return
+        
         retries = 0
         success = False
         
         while retries <= self.max_retries and not success:
+            task.attempts += 1
             try:
                 # Use app context for database operations
                 if _app:
@@ -171,14 +659,15 @@ class PDFQueueProcessor:
                         # Re-fetch the service request from database to avoid detached instance errors
                         if hasattr(task.service_request, 'id') and _db:
                             from models import ServiceRequest
-                            service_request = _db.session.get(ServiceRequest, task.service_request.id)
+                            with metrics.span('db_load'):
+                                service_request = _db.session.get(ServiceRequest, task.service_request.id)
                             if not service_request:
                                 raise Exception(f"Service request with id {task.service_request.id} not found")
                         else:
                             service_request = task.service_request
                         
                         # Generate PDF
-                        pdf_filename = generate_pdf_for_service_request(service_request)
+                        pdf_filename = self._render(task, service_request)
                         
                         if pdf_filename:
                             # Success
@@ -189,17 +678,13 @@ class PDFQueueProcessor:
                             logger.info(f"Task {task.task_id} completed successfully: {pdf_filename}")
                             success = True
                             
-                            # Call callback if provided
-                            if task.callback:
-                                try:
-                                    task.callback(task)
-                                except Exception as e:
-                                    logger.error(f"Error in task callback: {str(e)}")
+                            # Call callbacks if provided
+                            self._run_callbacks(task)
                         else:
                             raise Exception("PDF generation returned None")
                 else:
                     # No app context, run directly
-                    pdf_filename = generate_pdf_for_service_request(task.service_request)
+                    pdf_filename = self._render(task, task.service_request)
                     
                     if pdf_filename:
                         # Success
@@ -210,14 +695,15 @@ class PDFQueueProcessor:
                         logger.info(f"Task {task.task_id} completed successfully: {pdf_filename}")
                         success = True
                         
-                        # Call callback if provided
-                        if task.callback:
-                            try:
-                                task.callback(task)
-                            except Exception as e:
-                                logger.error(f"Error in task callback: {str(e)}")
+                        # Call callbacks if provided
+                        self._run_callbacks(task)
                     else:
                         raise Exception("PDF generation returned None")
+            
+            except CircuitOpenError as e:
+                # Do not burn retries while Google is known to be down
+                self._park(task, max(e.retry_in, 1.0))
+                return
                     
             except Exception as e:
                 retries += 1
@@ -225,8 +711,11 @@ class PDFQueueProcessor:
                 logger.error(error_msg)
                 
                 if retries <= self.max_retries:
-                    logger.info(f"Retrying task {task.task_id} in {self.retry_delay} seconds...")
-                    time.sleep(self.retry_delay)
+                    metrics.inc('pdf_task_retries_total')
+                    # Honor any back-off Google asked for (Retry-After)
+                    delay = max(self.retry_delay, get_api_limiter().cooldown_remaining())
+                    logger.info(f"Retrying task {task.task_id} in {delay:.1f} seconds...")
+                    time.sleep(delay)
                 else:
                     # Max retries reached
                     with self._lock:
@@ -235,12 +724,8 @@ class PDFQueueProcessor:
                     
                     logger.error(f"Task {task.task_id} failed after {retries} attempts")
                     
-                    # Call callback with failure
-                    if task.callback:
-                        try:
-                            task.callback(task)
-                        except Exception as callback_error:
-                            logger.error(f"Error in task callback: {str(callback_error)}")
+                    # Call callbacks with failure
+                    self._run_callbacks(task)
 
 # Global instance
 _queue_processor = None
@@ -249,23 +734,26 @@ def get_queue_processor() -> PDFQueueProcessor:
     """Get or create the global queue processor"""
     global _queue_processor
     if _queue_processor is None:
-        _queue_processor = PDFQueueProcessor()
+        fallback_mode = _app.config.get('PDF_CIRCUIT_FALLBACK', 'local') if _app else 'local'
+        _queue_processor = PDFQueueProcessor(fallback_mode=fallback_mode)
         _queue_processor.start()
     return _queue_processor
 
-def add_pdf_task(service_request: Any, callback: Optional[Callable] = None) -> str:
+def add_pdf_task(service_request: Any, callback: Optional[Callable] = None,
+                 priority: TaskPriority = TaskPriority.AUTO) -> str:
     """
     Add a PDF generation task to the global queue
     
     Args:
         service_request: Service request object
         callback: Optional callback function
+        priority: Queue lane (interactive, auto or bulk)
         
     Returns:
         Task ID
     """
     processor = get_queue_processor()
-    return processor.add_task(service_request, callback)
+    return processor.add_task(service_request, callback, priority)
 
 def get_task_status(task_id: str) -> Optional[PDFTask]:
     """Get the status of a task"""
@@ -289,7 +777,8 @@ def wait_for_task(task_id: str, timeout: float = 60.0) -> Optional[PDFTask]:
     while time.time() - start_time < timeout:
         task = processor.get_task_status(task_id)
         
-        if task and task.status in [ProcessingStatus.COMPLETED, ProcessingStatus.FAILED]:
+        if task and task.status in [ProcessingStatus.COMPLETED, ProcessingStatus.FAILED,
+                                    ProcessingStatus.CANCELLED]:
             return task
         
         time.sleep(0.5)
@@ -0,0 +1,243 @@
+"""
+PDF output storage
+Stores generated PDFs in hashed shard directories and applies retention and
+compression policies from a background sweeper
+"""
+
+import os
+import gzip
+import shutil
+import hashlib
+import time
+import threading
+import logging
+from dataclasses import dataclass
+from typing import Callable, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+COMPRESSED_SUFFIX = '.gz'
+
+
+@dataclass
+class StoredObject:
+    """A stored PDF as seen by the sweeper"""
+    key: str
+    size: int
+    modified_at: float
+    compressed: bool = False
+
+
+class PDFStorage:
+    """
+    Interface for PDF output storage
+
+    Keys are relative, '/'-separated paths; the database stores them in
+    ServiceRequest.pdf_filename
+    """
+
+    def allocate(self, filename: str) -> Tuple[str, str]:
+        """Return (key, local path to write the new file to)"""
+        raise NotImplementedError
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Return a readable local path for key, or None if it does not exist"""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> bool:
+        """Delete an object, returning True if something was removed"""
+        raise NotImplementedError
+
+    def compress(self, key: str) -> bool:
+        """Compress an object in place, returning True if it was compressed"""
+        raise NotImplementedError
+
+    def iter_objects(self) -> Iterator[StoredObject]:
+        """Iterate over every stored object"""
+        raise NotImplementedError
+
+
+class LocalShardedStorage(PDFStorage):
+    """Local filesystem storage sharded by a hash of the file name"""
+
+    def __init__(self, root: str, depth: int = 2, width: int = 2):
+        """
+        Args:
+            root: Base folder (PDF_OUTPUT_FOLDER)
+            depth: Number of shard directory levels
+            width: Hex characters per shard level (2 -> 256 directories per level)
+        """
+        self.root = os.path.abspath(root)
+        self.depth = depth
+        self.width = width
+        os.makedirs(self.root, exist_ok=True)
+
+    def key_for(self, filename: str) -> str:
+        """Sharded key for a file name, e.g. 'a3/f0/request_ABC.pdf'"""
+        digest = hashlib.sha1(filename.encode('utf-8')).hexdigest()
+        shards = [digest[i * self.width:(i + 1) * self.width] for i in range(self.depth)]
+        return '/'.join(shards + [filename])
+
+    def _path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, *key.split('/')))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    def allocate(self, filename: str) -> Tuple[str, str]:
+        key = self.key_for(filename)
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # A regenerated file replaces any compressed copy of the old one
+        if os.path.exists(path + COMPRESSED_SUFFIX):
+            os.remove(path + COMPRESSED_SUFFIX)
+        return key, path
+
+    def local_path(self, key: str) -> Optional[str]:
+        # Keys written before sharding are plain file names in the root folder
+        path = self._path(key)
+        if os.path.exists(path):
+            return path
+
+        compressed = path + COMPRESSED_SUFFIX
+        if os.path.exists(compressed):
+            # Restore compressed files on access; the sweeper compresses them again later
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            try:
+                with gzip.open(compressed, 'rb') as src, open(tmp_path, 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+                shutil.copystat(compressed, tmp_path)
+                os.replace(tmp_path, path)
+                os.remove(compressed)
+            except FileNotFoundError:
+                # Another thread restored it first
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            return path if os.path.exists(path) else None
+
+        return None
+
+    def delete(self, key: str) -> bool:
+        removed = False
+        path = self._path(key)
+        for candidate in (path, path + COMPRESSED_SUFFIX):
+            if os.path.exists(candidate):
+                os.remove(candidate)
+                removed = True
+        return removed
+
+    def compress(self, key: str) -> bool:
+        path = self._path(key)
+        if not os.path.exists(path):
+            return False
+        tmp_path = f"{path}{COMPRESSED_SUFFIX}.tmp"
+        with open(path, 'rb') as src, gzip.open(tmp_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        shutil.copystat(path, tmp_path)
+        os.replace(tmp_path, path + COMPRESSED_SUFFIX)
+        os.remove(path)
+        return True
+
+    def iter_objects(self) -> Iterator[StoredObject]:
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.endswith('.tmp'):
+                    continue
+                compressed = name.endswith(COMPRESSED_SUFFIX)
+                if not (name.endswith('.pdf') or compressed):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if compressed:
+                    path = path[:-len(COMPRESSED_SUFFIX)]
+                key = os.path.relpath(path, self.root).replace(os.sep, '/')
+                yield StoredObject(key, stat.st_size, stat.st_mtime, compressed)
+
+
+class StorageSweeper:
+    """Background thread applying retention and compression policies"""
+
+    def __init__(self, storage: PDFStorage, retention_days: float = 0, compress_after_days: float = 0,
+                 interval: float = 3600, on_delete: Optional[Callable[[str], None]] = None):
+        """
+        Args:
+            storage: Storage to sweep
+            retention_days: Delete objects older than this (0 keeps them forever)
+            compress_after_days: Compress objects older than this (0 disables compression)
+            interval: Seconds between sweeps
+            on_delete: Called with the key of every deleted object
+        """
+        self.storage = storage
+        self.retention_days = retention_days
+        self.compress_after_days = compress_after_days
+        self.interval = interval
+        self.on_delete = on_delete
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the sweeper thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        logger.info("PDF storage sweeper started")
+
+    def stop(self):
+        """Stop the sweeper thread"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        logger.info("PDF storage sweeper stopped")
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Error sweeping PDF storage: {str(e)}")
+
+    def sweep(self, now: Optional[float] = None) -> dict:
+        """Apply the policies once and return counts of what was done"""
+        now = now or time.time()
+        stats = {'scanned': 0, 'deleted': 0, 'compressed': 0}
+
+        for obj in list(self.storage.iter_objects()):
+            stats['scanned'] += 1
+            age_days = (now - obj.modified_at) / 86400
+
+            if self.retention_days and age_days > self.retention_days:
+                if self.storage.delete(obj.key):
+                    stats['deleted'] += 1
+                    if self.on_delete:
+                        try:
+                            self.on_delete(obj.key)
+                        except Exception as e:
+                            logger.error(f"Error in storage delete callback for {obj.key}: {str(e)}")
+            elif self.compress_after_days and not obj.compressed and age_days > self.compress_after_days:
+                if self.storage.compress(obj.key):
+                    stats['compressed'] += 1
+
+        logger.info(f"PDF storage sweep: {stats}")
+        return stats
+
+
+# Global storage instance
+_pdf_storage = None
+
+def init_pdf_storage(storage: PDFStorage) -> PDFStorage:
+    """Set the shared storage instance"""
+    global _pdf_storage
+    _pdf_storage = storage
+    return _pdf_storage
+
+def get_pdf_storage(root: str = 'pdf_outputs') -> PDFStorage:
+    """Get or create the shared storage instance"""
+    global _pdf_storage
+    if _pdf_storage is None:
+        _pdf_storage = LocalShardedStorage(root)
+    return _pdf_storage
@@ -0,0 +1,159 @@
+"""
+PDF pipeline metrics
+Latency histograms and counters for the PDF queue and renderers, rendered in
+the Prometheus text exposition format for the /metrics endpoint. Values are
+kept per process.
+"""
+
+import time
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds: API calls take tens to hundreds of milliseconds,
+# whole renders and queue waits seconds to minutes
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# Metric name -> (type, help)
+METRICS = {
+    'pdf_stage_seconds': ('histogram', 'Time spent in each stage of the PDF pipeline'),
+    'pdf_render_seconds': ('histogram', 'Time to render one PDF, by engine'),
+    'pdf_tasks_total': ('counter', 'PDF queue tasks finished, by outcome'),
+    'pdf_task_retries_total': ('counter', 'PDF queue task attempts that were retried'),
+    'pdf_queue_depth': ('gauge', 'PDF queue tasks waiting'),
+    'pdf_queue_lane_depth': ('gauge', 'PDF queue tasks waiting, by lane'),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative-bucket histogram of observed durations"""
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+
+class PipelineMetrics:
+    """Thread-safe registry of the pipeline's histograms and counters"""
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._histograms = {}  # (name, labels) -> Histogram
+        self._counters = {}    # (name, labels) -> float
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, seconds: float, **labels):
+        """Record one duration in a histogram"""
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def observe_stage(self, stage: str, seconds: float):
+        """Record the duration of one pipeline stage"""
+        self.observe('pdf_stage_seconds', seconds, stage=stage)
+
+    @contextmanager
+    def span(self, stage: str):
+        """Time the enclosed block as a pipeline stage, whether or not it raises"""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe_stage(stage, time.monotonic() - start)
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        """Increase a counter"""
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def counter(self, name: str, **labels) -> float:
+        """Current value of a counter"""
+        with self._lock:
+            return self._counters.get((name, _label_key(labels)), 0)
+
+    def histogram(self, name: str, **labels) -> Optional[Histogram]:
+        """Histogram for a name and labels, or None if nothing was observed"""
+        with self._lock:
+            return self._histograms.get((name, _label_key(labels)))
+
+    def render(self, gauges: Optional[Dict[str, Dict[Labels, float]]] = None) -> str:
+        """
+        Prometheus text exposition of every metric
+
+        Args:
+            gauges: Point-in-time values sampled by the caller, as
+                    {name: {labels: value}} with labels as ((key, value), ...)
+
+        Returns:
+            Metrics text, one sample per line
+        """
+        with self._lock:
+            samples = {}
+            for (name, labels), histogram in self._histograms.items():
+                lines = samples.setdefault(name, [])
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(_sample(f'{name}_bucket', labels + (('le', _format(bound)),), count))
+                lines.append(_sample(f'{name}_bucket', labels + (('le', '+Inf'),), histogram.count))
+                lines.append(_sample(f'{name}_sum', labels, histogram.sum))
+                lines.append(_sample(f'{name}_count', labels, histogram.count))
+            for (name, labels), value in self._counters.items():
+                samples.setdefault(name, []).append(_sample(name, labels, value))
+
+        for name, values in (gauges or {}).items():
+            samples.setdefault(name, []).extend(_sample(name, labels, value) for labels, value in values.items())
+
+        output = []
+        for name in sorted(samples):
+            metric_type, help_text = METRICS.get(name, ('untyped', name))
+            output.append(f'# HELP {name} {help_text}')
+            output.append(f'# TYPE {name} {metric_type}')
+            output.extend(samples[name])
+        return '\n'.join(output) + '\n'
+
+
+def _label_key(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+def _format(value: float) -> str:
+    return repr(float(value))
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _sample(name: str, labels: Labels, value: float) -> str:
+    if labels:
+        label_text = ','.join(f'{key}="{_escape(value_)}"' for key, value_ in labels)
+        return f'{name}{{{label_text}}} {_format(value)}'
+    return f'{name} {_format(value)}'
+
+
+# Global metrics instance
+_pipeline_metrics = None
+_init_lock = threading.Lock()
+
+def get_pipeline_metrics() -> PipelineMetrics:
+    """Get or create the shared metrics registry"""
+    global _pipeline_metrics
+    if _pipeline_metrics is None:
+        with _init_lock:
+            if _pipeline_metrics is None:
+                _pipeline_metrics = PipelineMetrics()
+    return _pipeline_metrics
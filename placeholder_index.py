@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Template Placeholder Index
+Caches the placeholders found in each Google Docs template so field mappings
+can be validated without waiting for PDF generation
+"""
+
+import threading
+import time
+import logging
+from typing import Dict, Optional, Callable, Any, Set, List
+from dataclasses import dataclass, field
+
+from google_docs_pdf_generator import GoogleDocsPDFGenerator
+
+logger = logging.getLogger(__name__)
+
+
+class PlaceholderValidationError(Exception):
+    """Raised when a service request can never be rendered against its template"""
+    pass
+
+
+def normalize_placeholder(placeholder: str) -> str:
+    """Return the bare placeholder name, accepting both 'name' and '{{name}}'"""
+    placeholder = (placeholder or '').strip()
+    if placeholder.startswith('{{') and placeholder.endswith('}}'):
+        placeholder = placeholder[2:-2]
+    return placeholder.strip()
+
+
+@dataclass
+class TemplateIndexEntry:
+    """Placeholders found in one template document"""
+    document_id: str
+    placeholders: Set[str]
+    occurrences: Dict[str, int]
+    revision_id: Optional[str] = None
+    title: Optional[str] = None
+    built_at: float = field(default_factory=time.time)
+
+
+@dataclass
+class PlaceholderReport:
+    """Result of checking a service's field mappings against its template"""
+    document_id: Optional[str]
+    missing: List[str]     # Mapped by a form field but absent from the template
+    unmapped: List[str]    # Present in the template but mapped by no form field
+    error: Optional[str] = None
+    missing_required: List[str] = field(default_factory=list)  # Missing and mapped by a required field
+
+    @property
+    def is_valid(self) -> bool:
+        return self.error is None and not self.missing
+
+
+class PlaceholderIndex:
+    """Per-template placeholder cache built from _find_placeholders_with_positions"""
+
+    # Placeholders filled from request metadata rather than form fields
+    METADATA_PLACEHOLDERS = {'tracking_code', 'request_date', 'requester_name'}
+
+    def __init__(self, fetch_document: Callable[[str], dict], cache_timeout: float = 300):
+        """
+        Initialize the index
+
+        Args:
+            fetch_document: Callable returning the Docs API document for an ID
+            cache_timeout: Seconds before a cached entry is rebuilt
+        """
+        self._fetch_document = fetch_document
+        self._cache_timeout = cache_timeout
+        self._entries = {}  # document_id -> TemplateIndexEntry
+        self._lock = threading.Lock()
+
+    def update_from_document(self, document_id: str, document: dict) -> TemplateIndexEntry:
+        """Rebuild the entry for a template from an already fetched document"""
+        occurrences = {}
+        for placeholder in GoogleDocsPDFGenerator._find_placeholders_with_positions(document):
+            name = normalize_placeholder(placeholder['name'])
+            occurrences[name] = occurrences.get(name, 0) + 1
+
+        entry = TemplateIndexEntry(
+            document_id=document_id,
+            placeholders=set(occurrences),
+            occurrences=occurrences,
+            revision_id=document.get('revisionId'),
+            title=document.get('title')
+        )
+
+        with self._lock:
+            self._entries[document_id] = entry
+
+        logger.debug(f"Indexed {len(entry.placeholders)} placeholders for template {document_id}")
+        return entry
+
+    def get_entry(self, document_id: str, force_refresh: bool = False) -> TemplateIndexEntry:
+        """
+        Get the index entry for a template, fetching it when stale
+
+        Raises:
+            Whatever fetch_document raises when the template is unreachable
+        """
+        if not force_refresh:
+            with self._lock:
+                entry = self._entries.get(document_id)
+            if entry and time.time() - entry.built_at < self._cache_timeout:
+                return entry
+
+        document = self._fetch_document(document_id)
+        return self.update_from_document(document_id, document)
+
+    def get_placeholders(self, document_id: str, force_refresh: bool = False) -> Set[str]:
+        """Get the set of placeholder names used in a template"""
+        return set(self.get_entry(document_id, force_refresh).placeholders)
+
+    def invalidate(self, document_id: Optional[str] = None):
+        """Drop one template from the cache, or all of them"""
+        with self._lock:
+            if document_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(document_id, None)
+
+    def check_fields(self, document_id: Optional[str], fields: List[Any]) -> PlaceholderReport:
+        """
+        Compare form field mappings with the placeholders in a template
+
+        Args:
+            document_id: Google Docs template ID
+            fields: FormField-like objects with a document_placeholder attribute
+
+        Returns:
+            PlaceholderReport describing missing and unmapped placeholders
+        """
+        if not document_id:
+            return PlaceholderReport(None, [], [], error='No Google Doc template configured')
+
+        try:
+            template_placeholders = self.get_placeholders(document_id)
+        except Exception as e:
+            return PlaceholderReport(document_id, [], [], error=str(e))
+
+        mapped = []
+        required = set()
+        for form_field in fields:
+            name = normalize_placeholder(getattr(form_field, 'document_placeholder', None))
+            if name and name not in mapped:
+                mapped.append(name)
+            if name and getattr(form_field, 'is_required', False):
+                required.add(name)
+
+        missing = [name for name in mapped if name not in template_placeholders]
+        unmapped = sorted(
+            name for name in template_placeholders
+            if name not in mapped and name not in self.METADATA_PLACEHOLDERS
+        )
+        missing_required = [name for name in missing if name in required]
+        return PlaceholderReport(document_id, missing, unmapped, missing_required=missing_required)
+
+    def check_service(self, service: Any) -> PlaceholderReport:
+        """Check every field mapping of a service against its template"""
+        return self.check_fields(service.google_doc_id, list(service.form_fields))
+
+    def validate_service_request(self, service_request: Any):
+        """
+        Reject a service request whose template can not resolve its required fields
+
+        Optional fields missing from the template are only logged; the render
+        skips them, as it always has.
+
+        Raises:
+            PlaceholderValidationError: if the request can never render correctly
+        """
+        service = service_request.service
+        if not service.google_doc_id:
+            raise PlaceholderValidationError(f"Service {service.id} has no Google Doc template")
+
+        report = self.check_service(service)
+        if report.error:
+            # Unreachable templates may be transient; let the generator retry them
+            logger.warning(f"Skipping placeholder pre-flight for {service.google_doc_id}: {report.error}")
+            return
+        if report.missing_required:
+            raise PlaceholderValidationError(
+                f"Required placeholders missing from template {service.google_doc_id}: "
+                + ', '.join(f'{{{{{name}}}}}' for name in report.missing_required)
+            )
+        if report.missing:
+            logger.warning(f"Optional placeholders missing from template {service.google_doc_id}: "
+                           + ', '.join(f'{{{{{name}}}}}' for name in report.missing))
+
+
+# Singleton instance
+_placeholder_index = None
+
+def init_placeholder_index(fetch_document: Callable[[str], dict],
+                           cache_timeout: float = 300) -> PlaceholderIndex:
+    """Initialize the shared placeholder index with a document fetcher"""
+    global _placeholder_index
+    _placeholder_index = PlaceholderIndex(fetch_document, cache_timeout)
+    return _placeholder_index
+
+def get_placeholder_index(credentials_path: str = 'credentials.json') -> PlaceholderIndex:
+    """Get or create the shared placeholder index"""
+    global _placeholder_index
+    if _placeholder_index is None:
+        from google_docs_service import GoogleDocsService
+        docs = GoogleDocsService(credentials_path)
+        _placeholder_index = PlaceholderIndex(docs.get_document_content)
+    return _placeholder_index
+
+def refresh_placeholder_index(document_id: str, document: dict):
+    """Update the shared index from a freshly fetched document, if it exists"""
+    if _placeholder_index is not None:
+        try:
+            _placeholder_index.update_from_document(document_id, document)
+        except Exception as e:
+            logger.warning(f"Could not refresh placeholder index for {document_id}: {str(e)}")
@@ -0,0 +1,226 @@
+"""
+Service request search
+Filters requests by service, status, date range and extracted field values,
+with prefix full-text matching on Persian text (SQLite FTS5 or Postgres tsvector)
+"""
+
+import re
+import json
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import text
+
+from models import db, ServiceRequest, ServiceRequestFieldValue
+from pagination import keyset_paginate
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'service_requests_fts'
+PG_INDEX = 'ix_service_requests_search_text'
+
+# Arabic code points commonly typed in place of their Persian equivalents
+_PERSIAN_TRANSLATION = str.maketrans({
+    '\u064a': '\u06cc', '\u0649': '\u06cc',  # Arabic yeh / alef maksura -> Persian yeh
+    '\u0643': '\u06a9',                      # Arabic kaf -> Persian keheh
+    '\u0629': '\u0647', '\u06c0': '\u0647',  # Teh marbuta / heh with yeh -> heh
+    '\u0623': '\u0627', '\u0625': '\u0627', '\u0622': '\u0627',  # Hamza / madda forms -> alef
+    '\u200c': ' ',  # Zero-width non-joiner splits compound words into tokens
+    **{chr(0x06F0 + i): str(i) for i in range(10)},  # Persian digits
+    **{chr(0x0660 + i): str(i) for i in range(10)},  # Arabic digits
+})
+
+# Arabic diacritics (harakat) are ignored when matching
+_DIACRITICS = re.compile('[\u064b-\u065f\u0670]')
+
+_fts_available = None
+
+
+def normalize_persian(value):
+    """Normalize Persian text so different keyboards produce the same tokens"""
+    value = _DIACRITICS.sub('', str(value).translate(_PERSIAN_TRANSLATION))
+    return value.lower()
+
+
+def build_search_text(form_data):
+    """Build the full-text document for a request from its form values"""
+    return ' '.join(normalize_persian(value) for value in form_data.values()
+                    if value not in (None, ''))
+
+
+def tokenize_query(query):
+    """Split a search query into normalized word tokens safe for MATCH/tsquery"""
+    return re.findall(r'\w+', normalize_persian(query or ''))
+
+
+def ensure_search_index():
+    """Create the full-text index for the current database if it is missing"""
+    global _fts_available
+    dialect = db.engine.dialect.name
+
+    if dialect == 'sqlite':
+        db.session.execute(text(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+                search_text, content='service_requests', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        '''))
+        # Keep the external-content FTS table in sync with service_requests
+        db.session.execute(text(f'''
+            CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON service_requests BEGIN
+                INSERT INTO {FTS_TABLE}(rowid, search_text) VALUES (new.id, new.search_text);
+            END
+        '''))
+        db.session.execute(text(f'''
+            CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON service_requests BEGIN
+                INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_text)
+                VALUES ('delete', old.id, old.search_text);
+            END
+        '''))
+        db.session.execute(text(f'''
+            CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF search_text ON service_requests BEGIN
+                INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_text)
+                VALUES ('delete', old.id, old.search_text);
+                INSERT INTO {FTS_TABLE}(rowid, search_text) VALUES (new.id, new.search_text);
+            END
+        '''))
+    elif dialect == 'postgresql':
+        db.session.execute(text(f'''
+            CREATE INDEX IF NOT EXISTS {PG_INDEX} ON service_requests
+            USING GIN (to_tsvector('simple', coalesce(search_text, '')))
+        '''))
+
+    db.session.commit()
+    _fts_available = None
+
+
+def _update_from_column(source, target, compute, batch_size=1000):
+    """Set target to compute(source) for every row, in id order with plain UPDATEs
+
+    Only the id and source column are selected, so this also runs on databases
+    that predate columns added to the model later. Returns the row count.
+    """
+    table = source.table
+    update = text(f'UPDATE {table.name} SET {target.name} = :value WHERE id = :id')
+    count, last_id = 0, 0
+    while True:
+        rows = db.session.execute(
+            db.select(table.c.id, source).where(table.c.id > last_id).order_by(table.c.id).limit(batch_size)
+        ).all()
+        if not rows:
+            return count
+        db.session.execute(update, [{'id': row_id, 'value': compute(value)} for row_id, value in rows])
+        count += len(rows)
+        last_id = rows[-1][0]
+
+
+def rebuild_search_index():
+    """Recompute search_text and extracted field values for every request and rebuild the full-text index"""
+    def form_search_text(form_data):
+        # Rows written before the JSON column may still hold a JSON string
+        if isinstance(form_data, str):
+            form_data = json.loads(form_data)
+        return build_search_text(form_data or {})
+
+    # The update trigger deletes the old search_text from the FTS index, so the
+    # index must match the table before the rows are rewritten
+    if db.engine.dialect.name == 'sqlite' and _has_fts_table():
+        db.session.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+    requests, field_values = ServiceRequest.__table__.c, ServiceRequestFieldValue.__table__.c
+    count = _update_from_column(requests.form_data, requests.search_text, form_search_text)
+    _update_from_column(field_values.value, field_values.value,
+                        lambda value: None if value is None else ServiceRequestFieldValue.normalize(value))
+    db.session.commit()
+    return count
+
+
+def _has_fts_table():
+    """Check once per process whether the SQLite FTS5 table exists"""
+    global _fts_available
+    if _fts_available is None:
+        _fts_available = db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {'name': FTS_TABLE}
+        ).first() is not None
+    return _fts_available
+
+
+def _full_text_condition(tokens):
+    """SQL condition matching every token as a prefix"""
+    dialect = db.engine.dialect.name
+
+    if dialect == 'sqlite' and _has_fts_table():
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        return ServiceRequest.id.in_(
+            text(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match')
+            .bindparams(match=match)
+            .columns(db.column('rowid', db.Integer))
+        )
+
+    if dialect == 'postgresql':
+        tsquery = ' & '.join(f'{token}:*' for token in tokens)
+        return text(
+            "to_tsvector('simple', coalesce(service_requests.search_text, '')) "
+            "@@ to_tsquery('simple', :tsquery)"
+        ).bindparams(tsquery=tsquery)
+
+    # No full-text index: fall back to substring matching
+    return db.and_(*(ServiceRequest.search_text.contains(token, autoescape=True) for token in tokens))
+
+
+def build_search_query(service_id=None, status=None, created_from=None, created_to=None,
+                       field_filters=None, query=None):
+    """
+    Build the filtered ServiceRequest query
+
+    Args:
+        service_id: Restrict to one service
+        status: pending, approved or rejected
+        created_from: Earliest creation date (inclusive)
+        created_to: Latest creation date (inclusive, whole day)
+        field_filters: List of (field_name, value, prefix) on extracted field values
+        query: Free text matched as prefixes against all form values
+
+    Returns:
+        SQLAlchemy query without ordering
+    """
+    search = ServiceRequest.query
+
+    if service_id:
+        search = search.filter(ServiceRequest.service_id == service_id)
+    if status:
+        search = search.filter(ServiceRequest.status == status)
+    if created_from:
+        search = search.filter(ServiceRequest.created_at >= created_from)
+    if created_to:
+        search = search.filter(ServiceRequest.created_at < created_to + timedelta(days=1))
+
+    for field_name, value, prefix in field_filters or []:
+        field_value = db.aliased(ServiceRequestFieldValue)
+        search = search.join(field_value, field_value.request_id == ServiceRequest.id).filter(
+            *ServiceRequestFieldValue.match(field_name, value, prefix, entity=field_value)
+        )
+        if service_id:
+            search = search.filter(field_value.service_id == service_id)
+
+    tokens = tokenize_query(query)
+    if tokens:
+        search = search.filter(_full_text_condition(tokens))
+
+    return search
+
+
+def search_requests(per_page, after=None, before=None, **filters):
+    """Run a search and return a KeysetPage of matching requests"""
+    search = build_search_query(**filters).options(db.joinedload(ServiceRequest.service))
+    return keyset_paginate(search, ServiceRequest, per_page, after=after, before=before)
+
+
+def parse_date(value):
+    """Parse a YYYY-MM-DD date, returning None when empty or invalid"""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        return None
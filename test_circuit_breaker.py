@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Test script for the Google Docs circuit breaker and queue fallback
+"""
+
+import time
+
+import circuit_breaker
+import pdf_queue_processor
+from circuit_breaker import CircuitBreaker, CircuitState, init_circuit_breaker
+from pdf_queue_processor import PDFQueueProcessor, ProcessingStatus
+
+
+class MockServiceRequest:
+    def __init__(self, id, tracking_code):
+        self.id = id
+        self.tracking_code = tracking_code
+
+
+def test_trips_on_failure_rate():
+    """The circuit opens once the failure rate crosses the threshold"""
+    breaker = CircuitBreaker('test', window_size=10, min_calls=4, failure_rate_threshold=0.5)
+    for success in (True, True, False):
+        breaker.record(success, 0.1)
+    assert breaker.state == CircuitState.CLOSED
+
+    breaker.record(False, 0.1)
+    assert breaker.state == CircuitState.OPEN
+    assert not breaker.allow_request()
+    print("✓ Trips on failure rate")
+
+
+def test_trips_on_slow_calls():
+    """The circuit opens when most calls are slow even if they succeed"""
+    breaker = CircuitBreaker('test', min_calls=3, slow_call_seconds=1.0, slow_call_rate_threshold=0.6)
+    for _ in range(3):
+        breaker.record(True, 2.0)
+    assert breaker.state == CircuitState.OPEN
+    print("✓ Trips on slow calls")
+
+
+def test_half_open_probe():
+    """After the open period one probe is let through; its outcome decides the state"""
+    breaker = CircuitBreaker('test', min_calls=1, open_seconds=0.05)
+    breaker.record(False, 0.1)
+    assert breaker.state == CircuitState.OPEN
+
+    time.sleep(0.06)
+    assert breaker.allow_request()       # The probe
+    assert not breaker.allow_request()   # Only one probe at a time
+    breaker.record(False, 0.1)
+    assert breaker.state == CircuitState.OPEN
+
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    breaker.record(True, 0.1)
+    assert breaker.state == CircuitState.CLOSED
+    assert breaker.allow_request()
+    print("✓ Half-open probe")
+
+
+def restore_breaker(previous):
+    """Put back the shared breaker a test replaced"""
+    if previous:
+        circuit_breaker._circuit_breakers['google_docs'] = previous
+    else:
+        circuit_breaker._circuit_breakers.pop('google_docs', None)
+
+
+def run_task(processor, google_result):
+    """Add and process one task with stubbed Google and local renderers"""
+    def render(sr, engine=None, **kw):
+        return 'local.pdf' if engine == 'local' else google_result
+
+    originals = pdf_queue_processor.render_pdf, pdf_queue_processor._app
+    pdf_queue_processor.render_pdf = render
+    pdf_queue_processor._app = None
+    try:
+        task_id = processor.add_task(MockServiceRequest(1, 'CB'))
+        processor._process_task(processor.queue.get(timeout=0))
+        return processor.get_task_status(task_id)
+    finally:
+        pdf_queue_processor.render_pdf, pdf_queue_processor._app = originals
+
+
+def test_open_circuit_renders_locally():
+    """Failing Google renders open the circuit and the retry uses the local renderer"""
+    previous = circuit_breaker._circuit_breakers.get('google_docs')
+    init_circuit_breaker('google_docs', min_calls=1, open_seconds=60)
+    try:
+        processor = PDFQueueProcessor(max_retries=1, retry_delay=0, preflight_check=False)
+        task = run_task(processor, google_result=None)
+        assert task.status == ProcessingStatus.COMPLETED
+        assert task.result == 'local.pdf'
+        assert task.engine == 'local'
+    finally:
+        restore_breaker(previous)
+    print("✓ Open circuit renders locally")
+
+
+def test_open_circuit_parks_tasks():
+    """In park mode tasks wait in the queue instead of failing"""
+    previous = circuit_breaker._circuit_breakers.get('google_docs')
+    breaker = init_circuit_breaker('google_docs', min_calls=1, open_seconds=0.2)
+    breaker.record(False, 0.1)
+    try:
+        processor = PDFQueueProcessor(max_retries=3, retry_delay=0, preflight_check=False, fallback_mode='park')
+        task = run_task(processor, google_result='google.pdf')
+        assert task.status == ProcessingStatus.PENDING
+        assert processor.get_queue_size() == 0
+
+        # The task returns to its lane when the circuit is due for a probe
+        time.sleep(1.3)
+        assert processor.get_queue_size() == 1
+    finally:
+        restore_breaker(previous)
+    print("✓ Open circuit parks tasks")
+
+
+if __name__ == "__main__":
+    test_trips_on_failure_rate()
+    test_trips_on_slow_calls()
+    test_half_open_probe()
+    test_open_circuit_renders_locally()
+    test_open_circuit_parks_tasks()
+    print("\nAll circuit breaker tests passed!")
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Test script for the Drive copy pool
+"""
+
+import time
+
+from drive_copy_pool import DriveCopyPool
+
+
+class FakeDocsService:
+    """Counts copies made and deleted"""
+
+    def __init__(self):
+        self.copies = []
+        self.deleted = []
+
+    def create_document_copy(self, doc_id, copy_title):
+        copy_id = f"{doc_id}-copy{len(self.copies) + 1}"
+        self.copies.append(copy_id)
+        return copy_id
+
+    def delete_document(self, doc_id):
+        self.deleted.append(doc_id)
+
+
+def test_checkout_refills():
+    """The first checkout makes a copy on the spot; later ones come from the pool"""
+    docs = FakeDocsService()
+    pool = DriveCopyPool(docs, size=2)
+
+    first = pool.checkout('T')
+    assert first.doc_id == 'T-copy1'
+    assert pool.snapshot()['templates']['T']['idle'] == 2
+
+    second = pool.checkout('T')
+    assert second.doc_id == 'T-copy2'
+    assert pool.stats['hits'] == 1 and pool.stats['misses'] == 1
+    print("✓ Checkout refills")
+
+
+def test_reset_outcomes():
+    """Clean resets go back to the pool; failed resets are replaced"""
+    docs = FakeDocsService()
+    pool = DriveCopyPool(docs, size=1)
+
+    copy = pool.checkout('T')
+    pool.drain()  # Make room so the reset copy is kept
+    pool.checkin(copy, reset=lambda doc_id: True)
+    assert pool.checkout('T').doc_id == copy.doc_id
+
+    broken = pool.checkout('T')
+    pool.checkin(broken, reset=lambda doc_id: False)
+    assert broken.doc_id in docs.deleted
+    assert pool.stats['reset_failures'] == 1
+    assert pool.snapshot()['templates']['T']['idle'] == 1
+    print("✓ Reset outcomes")
+
+
+def test_invalidate_drops_copies_in_flight():
+    """Copies checked out or being made during invalidate() never rejoin the pool"""
+    docs = FakeDocsService()
+    pool = DriveCopyPool(docs, size=1)
+
+    checked_out = pool.checkout('T')
+    pool.invalidate('T')
+    pool.checkin(checked_out, reset=lambda doc_id: True)
+    assert checked_out.doc_id in docs.deleted
+
+    resetting = pool.checkout('T')
+
+    def reset(doc_id):
+        pool.invalidate('T')  # Template edited while the copy is being reset
+        return True
+
+    pool.checkin(resetting, reset=reset)
+    assert resetting.doc_id in docs.deleted
+
+    class EditedDuringCopy(FakeDocsService):
+        def create_document_copy(self, doc_id, copy_title):
+            if not self.copies:
+                pool.invalidate()
+            return super().create_document_copy(doc_id, copy_title)
+
+    docs = pool.docs_service = EditedDuringCopy()
+    pool._refill('U')
+    assert 'U-copy1' in docs.deleted
+    assert [copy.doc_id for copy in pool._idle['U']] == ['U-copy2']
+
+    # Untouched templates keep their copies
+    kept = pool.checkout('T')
+    pool.drain()
+    pool.invalidate('U')
+    pool.checkin(kept, reset=lambda doc_id: True)
+    assert [copy.doc_id for copy in pool._idle['T']] == [kept.doc_id]
+    print("✓ Invalidate drops copies in flight")
+
+
+def test_recopy_mode():
+    """In recopy mode used copies are always deleted"""
+    docs = FakeDocsService()
+    pool = DriveCopyPool(docs, size=1, reset_mode='recopy')
+    copy = pool.checkout('T')
+    pool.checkin(copy, reset=lambda doc_id: True)
+    assert copy.doc_id in docs.deleted
+    print("✓ Recopy mode")
+
+
+def test_expired_copies_replaced():
+    """Idle copies older than max_age are deleted and replaced"""
+    docs = FakeDocsService()
+    pool = DriveCopyPool(docs, size=1, max_age=10)
+    pool.checkout('T')
+    old = list(docs.copies)
+
+    pool._expire(now=time.time() + 20)
+    assert old[-1] in docs.deleted
+    assert pool.snapshot()['templates']['T']['idle'] == 1
+    print("✓ Expired copies replaced")
+
+
+def test_background_refill():
+    """With the worker running, checkout does not wait for the refill"""
+    class SlowDocsService(FakeDocsService):
+        def create_document_copy(self, doc_id, copy_title):
+            time.sleep(0.1)
+            return super().create_document_copy(doc_id, copy_title)
+
+    docs = SlowDocsService()
+    pool = DriveCopyPool(docs, size=1)
+    pool._refill('T')
+    pool.start()
+    try:
+        start = time.monotonic()
+        pool.checkout('T')
+        assert time.monotonic() - start < 0.05
+
+        time.sleep(0.3)
+        assert pool.snapshot()['templates']['T']['idle'] == 1
+    finally:
+        pool.stop()
+    assert pool.drain() == 1
+    print("✓ Background refill")
+
+
+if __name__ == "__main__":
+    test_checkout_refills()
+    test_reset_outcomes()
+    test_invalidate_drops_copies_in_flight()
+    test_recopy_mode()
+    test_expired_copies_replaced()
+    test_background_refill()
+    print("\nAll Drive copy pool tests passed!")
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Test script for the compiled service request form cache
+"""
+
+from flask import Flask
+
+import forms
+from forms import get_service_request_form
+from models import db, Service, FormField
+
+
+def create_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def add_field(service, name, order):
+    db.session.add(FormField(service_id=service.id, field_name=name, field_label=name,
+                             field_type='text', field_order=order))
+
+
+def test_form_rebuilt_on_version_bump():
+    """The compiled form is reused until form_version changes"""
+    app = create_app()
+    with app.app_context():
+        service = Service(name='Cached form')
+        db.session.add(service)
+        db.session.flush()
+        add_field(service, 'name', 0)
+        db.session.commit()
+        forms._service_form_cache.pop(service.id, None)
+
+        form_class = get_service_request_form(service)
+        assert hasattr(form_class, 'name')
+        assert get_service_request_form(service) is form_class
+
+        # Field changes reach the form only through the version bump
+        add_field(service, 'city', 1)
+        db.session.commit()
+        assert get_service_request_form(service) is form_class
+
+        service.form_version += 1
+        db.session.commit()
+        rebuilt = get_service_request_form(service)
+        assert rebuilt is not form_class
+        assert hasattr(rebuilt, 'name') and hasattr(rebuilt, 'city')
+        assert get_service_request_form(service) is rebuilt
+    print("✓ Form rebuilt on version bump")
+
+
+if __name__ == "__main__":
+    test_form_rebuilt_on_version_bump()
+    print("\nAll form cache tests passed!")
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Test script for request form data storage and extracted field values
+"""
+
+import importlib.util
+import json
+import os
+import tempfile
+
+from flask import Flask
+
+from models import db, Service, ServiceRequest, ServiceRequestFieldValue
+
+
+def create_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add(Service(id=1, name='Form data'))
+        db.session.commit()
+    return app
+
+
+def load_migration(name):
+    """Import a script from migrations/, which imports the app, against a scratch database"""
+    os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test.db'))
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations', f'{name}.py')
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def create_legacy_app():
+    """In-memory database with the tables as they were before the later columns were added"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        for statement in (
+            "CREATE TABLE services (id INTEGER PRIMARY KEY, name VARCHAR(200), auto_approve_field_name VARCHAR(100))",
+            "CREATE TABLE form_fields (id INTEGER PRIMARY KEY, service_id INTEGER, field_name VARCHAR(100), "
+            "is_indexed BOOLEAN DEFAULT 0)",
+            "CREATE TABLE service_requests (id INTEGER PRIMARY KEY, service_id INTEGER, "
+            "tracking_code VARCHAR(20), form_data TEXT)",
+            "INSERT INTO services VALUES (1, 'Legacy', 'code')",
+            "INSERT INTO form_fields VALUES (1, 1, 'name', 1), (2, 1, 'city', 0)",
+        ):
+            db.session.execute(db.text(statement))
+        db.session.commit()
+    return app
+
+
+def stored_field_values(request_id):
+    rows = ServiceRequestFieldValue.query.filter_by(request_id=request_id).all()
+    return {row.field_name: row.value for row in rows}
+
+
+def test_form_data_roundtrip():
+    """Form data comes back from the JSON column unchanged, including legacy string rows"""
+    app = create_app()
+    data = {'name': 'علی کریمی', 'age': 34, 'note': 'خط اول\nخط دوم', 'empty': ''}
+    with app.app_context():
+        service_request = ServiceRequest(service_id=1, tracking_code='FD1')
+        service_request.set_form_data(data)
+        db.session.add(service_request)
+        db.session.commit()
+        request_id = service_request.id
+        db.session.expire_all()
+
+        assert db.session.get(ServiceRequest, request_id).get_form_data() == data
+
+        # Rows written before the JSON column hold the encoded string
+        db.session.execute(db.text("UPDATE service_requests SET form_data = :data WHERE id = :id"),
+                           {'data': json.dumps(json.dumps(data)), 'id': request_id})
+        db.session.commit()
+        db.session.expire_all()
+        assert db.session.get(ServiceRequest, request_id).get_form_data() == data
+    print("✓ Form data roundtrip")
+
+
+def test_field_values_follow_form_data():
+    """Indexed field values are replaced whenever the form data changes"""
+    app = create_app()
+    with app.app_context():
+        service_request = ServiceRequest(service_id=1, tracking_code='FD2')
+        service_request.set_form_data({'name': 'علی', 'code': '12', 'city': 'تهران'},
+                                      indexed_fields=('name', 'code'))
+        db.session.add(service_request)
+        db.session.commit()
+        assert stored_field_values(service_request.id) == {'name': 'علی', 'code': '12'}
+
+        service_request.set_form_data({'name': 'رضا', 'code': '', 'city': 'کرج'},
+                                      indexed_fields=('name', 'code'))
+        db.session.commit()
+        assert stored_field_values(service_request.id) == {'name': 'رضا'}
+        assert ServiceRequestFieldValue.query.count() == 1
+        assert service_request.search_text == 'رضا کرج'
+
+        db.session.delete(service_request)
+        db.session.commit()
+        assert ServiceRequestFieldValue.query.count() == 0
+    print("✓ Field values follow form data")
+
+
+def test_backfill_on_legacy_schema():
+    """The migration backfill reads only the columns it needs, in batches"""
+    migration = load_migration('add_form_data_json')
+    app = create_legacy_app()
+    batch_size = migration.BATCH_SIZE
+    migration.BATCH_SIZE = 2
+    try:
+        with app.app_context():
+            for i, data in enumerate([{'name': 'علي', 'code': ' 7 ', 'city': 'تهران'},
+                                      {'name': '', 'code': '8'},
+                                      {'name': 'رضا'}, {}], start=1):
+                db.session.execute(db.text("INSERT INTO service_requests VALUES (:id, 1, :code, :data)"),
+                                   {'id': i, 'code': f'LG{i}', 'data': json.dumps(data)})
+            ServiceRequestFieldValue.__table__.create(db.engine)
+
+            assert migration.backfill_field_values() == 4
+            db.session.commit()
+            assert stored_field_values(1) == {'name': 'علی', 'code': '7'}
+            assert stored_field_values(2) == {'code': '8'}
+            assert stored_field_values(3) == {'name': 'رضا'}
+            assert stored_field_values(4) == {}
+
+            # Running it again replaces the values instead of duplicating them
+            assert migration.backfill_field_values() == 4
+            assert ServiceRequestFieldValue.query.count() == 4
+    finally:
+        migration.BATCH_SIZE = batch_size
+    print("✓ Backfill on legacy schema")
+
+
+if __name__ == "__main__":
+    test_form_data_roundtrip()
+    test_field_values_follow_form_data()
+    test_backfill_on_legacy_schema()
+    print("\nAll form data tests passed!")
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Test script for the shared Google API rate limiter
+"""
+
+import time
+
+from googleapiclient.errors import HttpError
+from httplib2 import Response
+
+from google_api_limiter import GoogleAPILimiter, TokenBucket, RateLimitError, parse_rate_limits
+
+
+def make_http_error(status, headers=None, content=b''):
+    """Build an HttpError like googleapiclient raises"""
+    response = Response({'status': status, **(headers or {})})
+    return HttpError(response, content)
+
+
+def test_token_bucket_burst_and_refill():
+    """A bucket allows its burst immediately, then refills at its rate"""
+    bucket = TokenBucket(rate=50, capacity=5)
+    start = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    assert time.monotonic() - start < 0.05
+    assert bucket.headroom() < 0.1
+
+    waited = bucket.acquire()
+    assert 0.01 < waited < 0.1
+    print("✓ Token bucket burst and refill")
+
+
+def test_max_wait_raises():
+    """Callers that can not get a token in time get RateLimitError"""
+    bucket = TokenBucket(rate=0.1, capacity=1)
+    bucket.acquire()
+    try:
+        bucket.acquire(max_wait=0.5)
+        assert False, "Expected RateLimitError"
+    except RateLimitError as e:
+        assert e.retry_after > 0.5
+    print("✓ Max wait raises RateLimitError")
+
+
+def test_retry_after_honored():
+    """A 429 with Retry-After blocks the bucket and the call is retried"""
+    limiter = GoogleAPILimiter({('docs', 'read'): (100, 10)}, base_backoff=0.01)
+    calls = []
+
+    def flaky():
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            raise make_http_error(429, {'retry-after': '0.2'})
+        return 'ok'
+
+    assert limiter.call('docs', 'read', flaky) == 'ok'
+    assert len(calls) == 2
+    assert calls[1] - calls[0] >= 0.2
+    print("✓ Retry-After honored")
+
+
+def test_non_rate_limit_errors_propagate():
+    """Other HTTP errors are raised without retrying"""
+    limiter = GoogleAPILimiter()
+    calls = []
+
+    def not_found():
+        calls.append(1)
+        raise make_http_error(404)
+
+    try:
+        limiter.call('docs', 'read', not_found)
+        assert False, "Expected HttpError"
+    except HttpError:
+        pass
+    assert len(calls) == 1
+
+    assert GoogleAPILimiter.is_rate_limit_error(make_http_error(403, content=b'{"reason": "userRateLimitExceeded"}'))
+    assert not GoogleAPILimiter.is_rate_limit_error(make_http_error(403, content=b'{"reason": "forbidden"}'))
+    print("✓ Non rate-limit errors propagate")
+
+
+def test_headroom_and_wait_time():
+    """Headroom and pacing estimates reflect token use and back-offs"""
+    limiter = GoogleAPILimiter({('drive', 'export'): (1, 2)})
+    assert limiter.headroom()['drive.export'] == 1.0
+    assert limiter.wait_time({('drive', 'export'): 1}) == 0
+
+    limiter.bucket('drive', 'export').block_for(5)
+    assert limiter.headroom()['drive.export'] == 0.0
+    assert limiter.wait_time({('drive', 'export'): 1}) > 4
+    assert limiter.cooldown_remaining() > 4
+    print("✓ Headroom and wait time")
+
+
+def test_parse_rate_limits():
+    """Configured limits are parsed from 'api.class=rate/burst' pairs"""
+    assert parse_rate_limits('docs.read=4/10, drive.export=2') == {
+        ('docs', 'read'): (4.0, 10.0),
+        ('drive', 'export'): (2.0, 2.0),
+    }
+    assert parse_rate_limits('') == {}
+    print("✓ Parse rate limits")
+
+
+if __name__ == "__main__":
+    test_token_bucket_burst_and_refill()
+    test_max_wait_raises()
+    test_retry_after_honored()
+    test_non_rate_limit_errors_propagate()
+    test_headroom_and_wait_time()
+    test_parse_rate_limits()
+    print("\nAll Google API limiter tests passed!")
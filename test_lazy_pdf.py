@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Test script for on-demand (lazy) PDF generation
+"""
+
+import os
+import tempfile
+import uuid
+
+# Use a scratch database unless the app was already imported with one
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test.db'))
+
+import pdf_queue_processor
+from app import app, db
+from models import Service, ServiceRequest
+from pdf_queue_processor import PDFQueueProcessor, ProcessingStatus
+
+
+def create_request():
+    """An approved request without a PDF; returns its id and tracking code"""
+    suffix = uuid.uuid4().hex[:8]
+    with app.app_context():
+        db.create_all()
+        service = Service(name=f'Lazy {suffix}')
+        db.session.add(service)
+        db.session.flush()
+        service_request = ServiceRequest(service_id=service.id, tracking_code=f'LZ{suffix}',
+                                         form_data={}, status='approved')
+        db.session.add(service_request)
+        db.session.commit()
+        return service_request.id, service_request.tracking_code
+
+
+def remove_request(request_id):
+    with app.app_context():
+        service_request = db.session.get(ServiceRequest, request_id)
+        db.session.delete(service_request.service)
+        db.session.commit()
+
+
+class QueueUnderTest:
+    """Swap in a processor without a worker thread, in the given generation mode"""
+
+    def __init__(self, mode, backoff=300):
+        self.mode = mode
+        self.backoff = backoff
+
+    def __enter__(self):
+        self.config = app.config['PDF_GENERATION_MODE'], app.config['PDF_LAZY_RETRY_BACKOFF']
+        self.original = pdf_queue_processor._queue_processor
+        app.config['PDF_GENERATION_MODE'] = self.mode
+        app.config['PDF_LAZY_RETRY_BACKOFF'] = self.backoff
+        pdf_queue_processor._queue_processor = PDFQueueProcessor(max_retries=0, retry_delay=0,
+                                                                 preflight_check=False)
+        return pdf_queue_processor._queue_processor
+
+    def __exit__(self, *exc):
+        pdf_queue_processor._queue_processor = self.original
+        app.config['PDF_GENERATION_MODE'], app.config['PDF_LAZY_RETRY_BACKOFF'] = self.config
+
+
+def fail_next(processor):
+    """Render the next queued task with a failing renderer and no Flask app"""
+    def fail(sr, **kw):
+        raise RuntimeError("render failed")
+
+    original = pdf_queue_processor.render_pdf, pdf_queue_processor._app
+    pdf_queue_processor.render_pdf = fail
+    pdf_queue_processor._app = None
+    try:
+        processor._process_task(processor.queue.get(timeout=0))
+    finally:
+        pdf_queue_processor.render_pdf, pdf_queue_processor._app = original
+
+
+def test_eager_mode_renders_nothing_on_view():
+    """In eager mode page views never queue a render"""
+    request_id, tracking_code = create_request()
+    try:
+        with QueueUnderTest('eager') as processor:
+            client = app.test_client()
+            assert client.get(f'/track?tracking_code={tracking_code}').status_code == 200
+            assert client.get(f'/download/{tracking_code}').status_code == 302
+            assert processor.tasks == {}
+    finally:
+        remove_request(request_id)
+    print("✓ Eager mode renders nothing on view")
+
+
+def test_lazy_views_share_one_task():
+    """Repeated views of a request without a PDF queue a single render"""
+    request_id, tracking_code = create_request()
+    try:
+        with QueueUnderTest('lazy') as processor:
+            client = app.test_client()
+            client.get(f'/track?tracking_code={tracking_code}')
+            client.get(f'/download/{tracking_code}')
+            client.get(f'/track?tracking_code={tracking_code}')
+            assert len(processor.tasks) == 1
+            assert processor.get_active_task(request_id).status == ProcessingStatus.PENDING
+            assert client.get(f'/download/{tracking_code}/status').get_json() == {'status': 'processing'}
+    finally:
+        remove_request(request_id)
+    print("✓ Lazy views share one task")
+
+
+def test_failed_render_backs_off():
+    """A failed render is reported and not retried until the backoff passes"""
+    request_id, tracking_code = create_request()
+    try:
+        with QueueUnderTest('lazy') as processor:
+            client = app.test_client()
+            client.get(f'/track?tracking_code={tracking_code}')
+            fail_next(processor)
+
+            status = client.get(f'/download/{tracking_code}/status').get_json()
+            assert status == {'status': 'failed', 'error': 'render failed'}
+            client.get(f'/track?tracking_code={tracking_code}')
+            client.get(f'/download/{tracking_code}')
+            assert len(processor.tasks) == 1
+            assert processor.get_queue_size() == 0
+
+            app.config['PDF_LAZY_RETRY_BACKOFF'] = 0
+            client.get(f'/track?tracking_code={tracking_code}')
+            assert len(processor.tasks) == 2
+            assert processor.get_active_task(request_id).status == ProcessingStatus.PENDING
+    finally:
+        remove_request(request_id)
+    print("✓ Failed render backs off")
+
+
+if __name__ == "__main__":
+    test_eager_mode_renders_nothing_on_view()
+    test_lazy_views_share_one_task()
+    test_failed_render_backs_off()
+    print("\nAll lazy PDF tests passed!")
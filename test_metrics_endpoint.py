@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Test script for access control on the /metrics endpoint
+"""
+
+import os
+import tempfile
+
+# Use a scratch database unless the app was already imported with one
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test.db'))
+
+from app import app
+
+
+def scrape(headers=None):
+    return app.test_client().get('/metrics', headers=headers or {})
+
+
+def test_closed_without_token():
+    """With no token configured the endpoint refuses every scrape"""
+    token = app.config['METRICS_TOKEN']
+    app.config['METRICS_TOKEN'] = ''
+    try:
+        assert scrape().status_code == 404
+        assert scrape({'Authorization': 'Bearer '}).status_code == 404
+    finally:
+        app.config['METRICS_TOKEN'] = token
+    print("✓ Closed without token")
+
+
+def test_bearer_token_required():
+    """A configured token must be presented as a bearer token"""
+    token = app.config['METRICS_TOKEN']
+    app.config['METRICS_TOKEN'] = 'scrape-secret'
+    try:
+        assert scrape().status_code == 401
+        assert scrape({'Authorization': 'Bearer wrong'}).status_code == 401
+
+        response = scrape({'Authorization': 'Bearer scrape-secret'})
+        assert response.status_code == 200
+        assert b'pdf_queue_depth' in response.data
+    finally:
+        app.config['METRICS_TOKEN'] = token
+    print("✓ Bearer token required")
+
+
+if __name__ == "__main__":
+    test_closed_without_token()
+    test_bearer_token_required()
+    print("\nAll metrics endpoint tests passed!")
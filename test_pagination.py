@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Test script for keyset pagination
+"""
+
+from datetime import datetime, timedelta
+
+from flask import Flask
+from sqlalchemy import create_engine, event, Column, Integer, DateTime
+from sqlalchemy.orm import declarative_base, Session
+
+from pagination import keyset_paginate, encode_cursor, decode_cursor
+
+Base = declarative_base()
+
+
+class Row(Base):
+    __tablename__ = 'rows'
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime)
+
+
+def create_session(count=25):
+    """Create an in-memory database with rows sharing some timestamps"""
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    session = Session(engine)
+    start = datetime(2024, 1, 1)
+    for i in range(count):
+        # Pairs of rows share a timestamp to exercise the id tie-breaker
+        session.add(Row(id=i + 1, created_at=start + timedelta(minutes=i // 2)))
+    session.commit()
+    return session
+
+
+def test_cursor_roundtrip():
+    """Cursors decode to the position they were built from"""
+    created_at = datetime(2024, 5, 6, 7, 8, 9, 123456)
+    assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
+    assert decode_cursor('not-a-cursor') is None
+    assert decode_cursor(None) is None
+    print("✓ Cursor roundtrip")
+
+
+def test_walk_forward_and_back():
+    """Walking all pages forward then back visits every row once in order"""
+    session = create_session()
+    query = session.query(Row)
+    expected = [row.id for row in query.order_by(Row.created_at.desc(), Row.id.desc())]
+
+    pages = []
+    page = keyset_paginate(query, Row, per_page=10)
+    assert not page.has_prev
+    pages.append([row.id for row in page.items])
+    while page.has_next:
+        page = keyset_paginate(query, Row, per_page=10, after=page.next_cursor)
+        pages.append([row.id for row in page.items])
+
+    assert [row_id for ids in pages for row_id in ids] == expected
+    assert [len(ids) for ids in pages] == [10, 10, 5]
+
+    back = keyset_paginate(query, Row, per_page=10, before=page.prev_cursor)
+    assert [row.id for row in back.items] == pages[1]
+    back = keyset_paginate(query, Row, per_page=10, before=back.prev_cursor)
+    assert [row.id for row in back.items] == pages[0]
+    assert not back.has_prev
+    print("✓ Keyset pages walk forward and back")
+
+
+def test_service_listing_plan():
+    """A service's pages are read in index order, not sorted from all its rows"""
+    from models import db, Service, ServiceRequest
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        service = Service(name='Listing')
+        db.session.add(service)
+        db.session.flush()
+        start = datetime(2024, 1, 1)
+        for i in range(30):
+            db.session.add(ServiceRequest(service_id=service.id, tracking_code=f'P{i}', form_data={},
+                                          created_at=start + timedelta(minutes=i // 2)))
+        db.session.commit()
+
+        statements = []
+        capture = lambda conn, cursor, statement, parameters, context, executemany: \
+            statements.append((statement, parameters))
+        event.listen(db.engine, 'before_cursor_execute', capture)
+        try:
+            page = keyset_paginate(service.requests, ServiceRequest, per_page=10)
+            page = keyset_paginate(service.requests, ServiceRequest, per_page=10, after=page.next_cursor)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', capture)
+        assert len(page.items) == 10
+        listings = [(statement, parameters) for statement, parameters in statements
+                    if 'FROM service_requests' in statement]
+        assert len(listings) == 2
+
+        for statement, parameters in listings:
+            plan = [row[-1] for row in db.session.connection().exec_driver_sql(
+                f'EXPLAIN QUERY PLAN {statement}', parameters)]
+            assert any('ix_service_requests_service_created_at_id' in line for line in plan), plan
+            assert not any('TEMP B-TREE' in line for line in plan), plan
+    print("✓ Service listing plan")
+
+
+if __name__ == "__main__":
+    test_cursor_roundtrip()
+    test_walk_forward_and_back()
+    test_service_listing_plan()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Test script for the PDF engine registry and shared render path
+"""
+
+import os
+import tempfile
+from datetime import datetime
+
+import pdf_backends
+import pdf_queue_processor
+import placeholder_index
+from pdf_backends import PDFBackend, build_replacements, engine_for, get_backend, render_pdf
+from pdf_queue_processor import PDFQueueProcessor, PDFTask
+from placeholder_index import PlaceholderValidationError
+from pdf_storage import LocalShardedStorage
+
+
+class MockField:
+    def __init__(self, field_name, document_placeholder):
+        self.field_name = field_name
+        self.field_label = field_name
+        self.document_placeholder = document_placeholder
+
+
+class MockService:
+    def __init__(self, pdf_engine=None):
+        self.name = 'Test'
+        self.google_doc_id = 'doc1'
+        self.pdf_engine = pdf_engine
+        self.form_fields = [MockField('name', '{{name}}'), MockField('city', 'city')]
+
+
+class MockServiceRequest:
+    def __init__(self, tracking_code='TRK1', pdf_engine=None, google_doc_id='doc1'):
+        self.tracking_code = tracking_code
+        self.created_at = datetime(2024, 2, 4)
+        self.service = MockService(pdf_engine)
+        self.service.google_doc_id = google_doc_id
+        self.user = None
+
+    def get_form_data(self):
+        return {'name': 'Ali', 'city': 'Tehran'}
+
+
+class FakeBackend(PDFBackend):
+    """Writes the replacements it received; fails when asked to"""
+
+    name = 'fake'
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.replacements = None
+
+    def render(self, service_request, replacements, output_path):
+        if self.fail:
+            raise RuntimeError("render failed")
+        self.replacements = replacements
+        with open(output_path, 'wb') as f:
+            f.write(b'%PDF-1.4')
+
+
+def test_build_replacements():
+    """Placeholders are keyed with and without braces, plus request metadata"""
+    replacements = build_replacements(MockServiceRequest())
+    assert replacements['name'] == replacements['{{name}}'] == 'Ali'
+    assert replacements['city'] == replacements['{{city}}'] == 'Tehran'
+    assert replacements['{{tracking_code}}'] == 'TRK1'
+    assert replacements['request_date'] == '2024/02/04'
+    assert 'requester_name' not in replacements
+    print("✓ Build replacements")
+
+
+def test_engine_selection():
+    """Services pick an engine by name; others use the default"""
+    assert engine_for(MockServiceRequest(pdf_engine='local')) == 'local'
+    assert engine_for(MockServiceRequest()) == pdf_backends.DEFAULT_ENGINE
+    assert {'google_inplace', 'google_nocopy', 'google_copy', 'local'} <= set(pdf_backends.available_engines())
+    assert get_backend('google_copy').uses_google and not get_backend('local').uses_google
+
+    try:
+        get_backend('missing')
+        assert False, "Unknown engine accepted"
+    except ValueError:
+        pass
+    print("✓ Engine selection")
+
+
+def test_render_and_stats():
+    """render_pdf stores the file through storage and counts renders per engine"""
+    backend = pdf_backends.register_backend(FakeBackend())
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = LocalShardedStorage(tmp)
+        pdf_filename = render_pdf(MockServiceRequest(pdf_engine='fake'), storage=storage)
+        assert storage.local_path(pdf_filename)
+        assert backend.replacements['{{name}}'] == 'Ali'
+
+        pdf_backends.register_backend(FakeBackend(fail=True))
+        try:
+            render_pdf(MockServiceRequest(), engine='fake', storage=storage)
+            assert False, "Failed render returned a file"
+        except RuntimeError:
+            pass
+
+    stats = pdf_backends.engine_stats()['fake']
+    assert stats['renders'] == 2 and stats['failures'] == 1
+    print("✓ Render and stats")
+
+
+def test_preflight_skips_local_engine():
+    """Services on a local engine need no Google template to pass pre-flight"""
+    class RejectingIndex:
+        def __init__(self):
+            self.checked = []
+
+        def validate_service_request(self, service_request):
+            self.checked.append(service_request)
+            raise PlaceholderValidationError("Service has no Google Doc template")
+
+    index = RejectingIndex()
+    originals = placeholder_index._placeholder_index, pdf_queue_processor._app
+    placeholder_index._placeholder_index = index
+    pdf_queue_processor._app = None
+    try:
+        processor = PDFQueueProcessor(preflight_check=True)
+        local = PDFTask('t1', MockServiceRequest(pdf_engine='local', google_doc_id=None))
+        assert processor._preflight(local) is None
+        assert index.checked == []
+
+        google = PDFTask('t2', MockServiceRequest(pdf_engine='google_inplace', google_doc_id=None))
+        assert processor._preflight(google) == "Service has no Google Doc template"
+    finally:
+        placeholder_index._placeholder_index, pdf_queue_processor._app = originals
+    print("✓ Pre-flight skips local engine")
+
+
+if __name__ == "__main__":
+    test_build_replacements()
+    test_engine_selection()
+    test_render_and_stats()
+    test_preflight_skips_local_engine()
+    print("\nAll PDF backend tests passed!")
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Test script for PDF download caching and range responses
+"""
+
+import os
+import tempfile
+
+from flask import Flask
+
+from pdf_delivery import build_pdf_response, is_current_version, pdf_version
+
+app = Flask(__name__)
+folder = tempfile.mkdtemp()
+pdf_path = os.path.join(folder, 'request_TEST.pdf')
+with open(pdf_path, 'wb') as f:
+    f.write(b'%PDF-1.4 ' + b'0' * 1000)
+
+ETAG = 'a' * 64
+
+
+def get(headers=None, **kwargs):
+    """Build a response for a request with the given headers"""
+    with app.test_request_context('/download/TEST', headers=headers or {}):
+        response = build_pdf_response(pdf_path, 'request_TEST.pdf', ETAG, output_folder=folder, **kwargs)
+        response.direct_passthrough = False
+        return response
+
+
+def test_full_download():
+    """Plain GET returns the file with a strong ETag and revalidation headers"""
+    response = get()
+    assert response.status_code == 200
+    assert response.headers['ETag'] == f'"{ETAG}"'
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    assert response.cache_control.no_cache
+    assert len(response.get_data()) == 1009
+    print("✓ Full download")
+
+
+def test_conditional_get():
+    """Matching If-None-Match returns 304"""
+    response = get({'If-None-Match': f'"{ETAG}"'})
+    assert response.status_code == 304
+    print("✓ Conditional GET")
+
+
+def test_range_request():
+    """Range requests return partial content"""
+    response = get({'Range': 'bytes=0-99'})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == 'bytes 0-99/1009'
+    assert len(response.get_data()) == 100
+    print("✓ Range request")
+
+
+def test_immutable_versioned_url():
+    """Versioned URLs are cached for a long time"""
+    response = get(immutable=True, max_age=3600)
+    assert response.cache_control.max_age == 3600
+    assert response.cache_control.immutable
+    assert not response.cache_control.no_cache
+    print("✓ Immutable caching")
+
+
+def test_version_must_match_exactly():
+    """Only the current version tag earns immutable caching"""
+    version = pdf_version(ETAG)
+    assert version == ETAG[:16]
+    assert is_current_version(version, ETAG)
+
+    # A one-character prefix would pin every file whose hash starts with it
+    for stale in ('a', ETAG[:15], ETAG, 'b' * 16, '', None):
+        assert not is_current_version(stale, ETAG)
+    assert not is_current_version(version, None)
+
+    response = get(immutable=is_current_version('a', ETAG))
+    assert response.cache_control.no_cache
+    assert not response.cache_control.immutable
+    print("✓ Version must match exactly")
+
+
+def test_proxy_offload():
+    """Offload modes send only headers and let the proxy stream the file"""
+    response = get(sendfile_mode='x-accel-redirect', accel_prefix='/protected/pdfs/')
+    assert response.headers['X-Accel-Redirect'] == '/protected/pdfs/request_TEST.pdf'
+    assert response.get_data() == b''
+
+    response = get(sendfile_mode='x-sendfile')
+    assert response.headers['X-Sendfile'] == pdf_path
+
+    response = get({'If-None-Match': f'"{ETAG}"'}, sendfile_mode='x-sendfile')
+    assert response.status_code == 304
+    print("✓ Proxy offload")
+
+
+if __name__ == "__main__":
+    test_full_download()
+    test_conditional_get()
+    test_range_request()
+    test_immutable_versioned_url()
+    test_version_must_match_exactly()
+    test_proxy_offload()
+    print("\nAll PDF delivery tests passed!")
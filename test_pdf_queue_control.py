@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Test script for PDF queue introspection and admin control
+"""
+
+import time
+import uuid
+
+import pdf_queue_processor
+from pdf_queue_processor import (PDFQueueProcessor, ProcessingStatus, TaskControlError,
+                                 TaskPriority)
+
+
+class MockServiceRequest:
+    def __init__(self, id, tracking_code):
+        self.id = id
+        self.tracking_code = tracking_code
+
+
+def make_processor():
+    """Processor without a worker thread; tasks are processed by hand"""
+    return PDFQueueProcessor(max_retries=0, retry_delay=0, preflight_check=False)
+
+
+def process_next(processor, generate):
+    """Process the next queued task with a stubbed renderer and no Flask app"""
+    original = pdf_queue_processor.render_pdf, pdf_queue_processor._app
+    pdf_queue_processor.render_pdf = generate
+    pdf_queue_processor._app = None
+    try:
+        processor._process_task(processor.queue.get(timeout=0))
+    finally:
+        pdf_queue_processor.render_pdf, pdf_queue_processor._app = original
+
+
+def fail(sr, **kw):
+    raise RuntimeError("render failed")
+
+
+def test_snapshot_lists_tasks():
+    """Queued tasks are listed in serving order, failed ones with their attempts"""
+    processor = make_processor()
+    processor.add_task(MockServiceRequest(1, 'A'))
+    processor.add_task(MockServiceRequest(2, 'B'), priority=TaskPriority.BULK)
+    processor.add_task(MockServiceRequest(3, 'C'), priority=TaskPriority.INTERACTIVE)
+    process_next(processor, fail)
+
+    snapshot = processor.snapshot()
+    assert [view['tracking_code'] for view in snapshot['queued']] == ['A', 'B']
+    assert snapshot['queue_size'] == 2 and snapshot['lanes']['bulk'] == 1
+    assert snapshot['failed'][0]['tracking_code'] == 'C'
+    assert snapshot['failed'][0]['attempts'] == 1
+    assert snapshot['failed'][0]['error'] == 'render failed'
+    assert snapshot['in_flight'] == [] and not snapshot['paused']
+    print("✓ Snapshot lists tasks")
+
+
+def test_cancel_task():
+    """Waiting tasks can be cancelled and run their callbacks; finished ones can not"""
+    processor = make_processor()
+    calls = []
+    task_id = processor.add_task(MockServiceRequest(1, 'A'), callback=lambda t: calls.append(t.status))
+
+    processor.cancel_task(task_id)
+    assert calls == [ProcessingStatus.CANCELLED]
+    assert processor.get_queue_size() == 0
+
+    try:
+        processor.cancel_task(task_id)
+        assert False, "Cancelled twice"
+    except TaskControlError:
+        pass
+
+    # The request can be queued again right away
+    assert processor.add_task(MockServiceRequest(1, 'A')) != task_id
+    print("✓ Cancel task")
+
+
+def test_cancelled_parked_task_skipped():
+    """A task cancelled while parked does not come back to the queue"""
+    processor = make_processor()
+    task_id = processor.add_task(MockServiceRequest(1, 'A'))
+    task = processor.queue.get(timeout=0)
+    processor._park(task, 0.05)
+    processor.cancel_task(task_id)
+
+    time.sleep(0.2)
+    assert processor.get_queue_size() == 0
+    assert processor.get_task_status(task_id).status == ProcessingStatus.CANCELLED
+    print("✓ Cancelled parked task skipped")
+
+
+def test_park_cancel_retry_renders_once():
+    """A parked task that is cancelled and retried is not requeued by its old timer"""
+    processor = make_processor()
+    task_id = processor.add_task(MockServiceRequest(1, 'A'))
+    task = processor.queue.get(timeout=0)
+    processor._park(task, 60)
+    timer = task.park_timer
+
+    processor.cancel_task(task_id)
+    processor.retry_task(task_id)
+    assert processor.get_queue_size() == 1
+
+    # The old timer firing late does not queue a second copy
+    processor._unpark(task)
+    assert processor.get_queue_size() == 1
+    assert timer.finished.is_set()  # Cancelled along with the task
+
+    renders = []
+    process_next(processor, lambda sr, **kw: renders.append(sr) or 'out.pdf')
+    assert len(renders) == 1 and task.status == ProcessingStatus.COMPLETED
+
+    # A stale queue entry for a finished task is skipped
+    processor.queue.put(task)
+    process_next(processor, lambda sr, **kw: renders.append(sr) or 'out.pdf')
+    assert len(renders) == 1
+    print("✓ Park, cancel and retry renders once")
+
+
+def test_set_priority():
+    """Re-prioritizing moves a waiting task to another lane, ordered by when it was queued"""
+    processor = make_processor()
+    processor.add_task(MockServiceRequest(1, 'A'), priority=TaskPriority.INTERACTIVE)
+    bulk_id = processor.add_task(MockServiceRequest(2, 'B'), priority=TaskPriority.BULK)
+
+    processor.set_task_priority(bulk_id, TaskPriority.INTERACTIVE)
+    assert processor.get_lane_sizes() == {'interactive': 2, 'auto': 0, 'bulk': 0}
+    assert processor.snapshot()['queued'][0]['tracking_code'] == 'A'
+    print("✓ Set priority")
+
+
+def test_retry_task():
+    """Failed tasks are queued again under the same id"""
+    processor = make_processor()
+    task_id = processor.add_task(MockServiceRequest(1, 'A'))
+    process_next(processor, fail)
+
+    processor.retry_task(task_id)
+    task = processor.get_task_status(task_id)
+    assert task.status == ProcessingStatus.PENDING and task.error is None
+    try:
+        processor.retry_task(task_id)
+        assert False, "Retried a pending task"
+    except TaskControlError:
+        pass
+
+    process_next(processor, lambda sr, **kw: 'out.pdf')
+    assert task.status == ProcessingStatus.COMPLETED and task.attempts == 1
+    print("✓ Retry task")
+
+
+def test_pause_and_resume():
+    """Paused workers leave tasks in the queue until resumed"""
+    processor = make_processor()
+    original = pdf_queue_processor.render_pdf, pdf_queue_processor._app
+    pdf_queue_processor.render_pdf = lambda sr, **kw: 'out.pdf'
+    pdf_queue_processor._app = None
+    processor.pause()
+    processor.start()
+    try:
+        task_id = processor.add_task(MockServiceRequest(1, 'A'))
+        time.sleep(0.3)
+        assert processor.get_task_status(task_id).status == ProcessingStatus.PENDING
+        assert processor.snapshot()['paused']
+
+        processor.resume()
+        deadline = time.time() + 3
+        while processor.get_task_status(task_id).status != ProcessingStatus.COMPLETED and time.time() < deadline:
+            time.sleep(0.05)
+        assert processor.get_task_status(task_id).status == ProcessingStatus.COMPLETED
+    finally:
+        processor.stop()
+        pdf_queue_processor.render_pdf, pdf_queue_processor._app = original
+    print("✓ Pause and resume")
+
+
+def test_control_requires_csrf_token():
+    """Queue control POSTs are refused without the token from the status endpoint"""
+    from app import app, db
+    from models import User
+
+    suffix = uuid.uuid4().hex[:8]
+    with app.app_context():
+        db.create_all()
+        manager = User(username=f'manager_{suffix}', email=f'manager_{suffix}@example.com',
+                       role='system_manager')
+        manager.set_password('secret')
+        db.session.add(manager)
+        db.session.commit()
+        manager_id = manager.id
+
+    csrf_enabled = app.config.get('WTF_CSRF_ENABLED', True)
+    app.config['WTF_CSRF_ENABLED'] = True
+    try:
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(manager_id)
+            session['_fresh'] = True
+
+        assert client.post('/admin/pdf-queue/resume').status_code == 400
+        assert client.post('/admin/pdf-queue/tasks/missing/cancel',
+                           headers={'X-CSRFToken': 'forged'}).status_code == 400
+
+        token = client.get('/admin/pdf-queue').get_json()['csrf_token']
+        response = client.post('/admin/pdf-queue/resume', headers={'X-CSRFToken': token})
+        assert response.status_code == 200 and response.get_json() == {'paused': False}
+        assert client.post('/admin/pdf-queue/tasks/missing/cancel',
+                           data={'csrf_token': token}).status_code == 404
+    finally:
+        app.config['WTF_CSRF_ENABLED'] = csrf_enabled
+        with app.app_context():
+            db.session.delete(db.session.get(User, manager_id))
+            db.session.commit()
+    print("✓ Control requires CSRF token")
+
+
+if __name__ == "__main__":
+    test_snapshot_lists_tasks()
+    test_cancel_task()
+    test_cancelled_parked_task_skipped()
+    test_park_cancel_retry_renders_once()
+    test_set_priority()
+    test_retry_task()
+    test_pause_and_resume()
+    test_control_requires_csrf_token()
+    print("\nAll PDF queue control tests passed!")
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Test script for PDF queue task deduplication and coalescing
+"""
+
+import pdf_queue_processor
+from pdf_queue_processor import PDFQueueProcessor, ProcessingStatus, TaskPriority
+
+
+class MockServiceRequest:
+    def __init__(self, id, tracking_code):
+        self.id = id
+        self.tracking_code = tracking_code
+
+
+def make_processor():
+    """Processor without a worker thread; tasks are processed by hand"""
+    return PDFQueueProcessor(max_retries=0, retry_delay=0, preflight_check=False)
+
+
+def process_next(processor, generate):
+    """Process the next queued task with a stubbed renderer and no Flask app"""
+    original = pdf_queue_processor.render_pdf, pdf_queue_processor._app
+    pdf_queue_processor.render_pdf = generate
+    pdf_queue_processor._app = None
+    try:
+        processor._process_task(processor.queue.get(timeout=0))
+    finally:
+        pdf_queue_processor.render_pdf, pdf_queue_processor._app = original
+
+
+def test_unique_task_ids():
+    """Different requests added in the same second get distinct ids"""
+    processor = make_processor()
+    first = processor.add_task(MockServiceRequest(1, 'SAME'))
+    second = processor.add_task(MockServiceRequest(2, 'SAME'))
+    assert first != second
+    assert len(processor.get_all_tasks()) == 2
+    print("✓ Unique task ids")
+
+
+def test_duplicate_add_coalesces():
+    """A second add for the same request returns the in-flight task"""
+    processor = make_processor()
+    calls = []
+    first = processor.add_task(MockServiceRequest(1, 'ABC'), callback=lambda t: calls.append('first'))
+    second = processor.add_task(MockServiceRequest(1, 'ABC'), callback=lambda t: calls.append('second'))
+
+    assert first == second
+    assert processor.get_queue_size() == 1
+    assert processor.get_task_status(first).coalesced == 1
+
+    renders = []
+    process_next(processor, lambda sr, **kw: renders.append(sr) or 'out.pdf')
+
+    task = processor.get_task_status(first)
+    assert task.status == ProcessingStatus.COMPLETED
+    assert len(renders) == 1
+    assert calls == ['first', 'second']
+    print("✓ Duplicate add coalesces")
+
+
+def test_duplicate_promotes_priority():
+    """An interactive duplicate moves a waiting bulk task to the interactive lane"""
+    processor = make_processor()
+    task_id = processor.add_task(MockServiceRequest(1, 'ABC'), priority=TaskPriority.BULK)
+    processor.add_task(MockServiceRequest(1, 'ABC'), priority=TaskPriority.INTERACTIVE)
+
+    assert processor.get_task_status(task_id).priority == TaskPriority.INTERACTIVE
+    assert processor.get_lane_sizes() == {'interactive': 1, 'auto': 0, 'bulk': 0}
+    print("✓ Duplicate promotes priority")
+
+
+def test_add_after_completion_renders_again():
+    """Once a task finishes, a new add creates a new task"""
+    processor = make_processor()
+    first = processor.add_task(MockServiceRequest(1, 'ABC'))
+    process_next(processor, lambda sr, **kw: None)
+
+    assert processor.get_task_status(first).status == ProcessingStatus.FAILED
+    second = processor.add_task(MockServiceRequest(1, 'ABC'))
+    assert second != first
+    print("✓ Add after completion renders again")
+
+
+def test_slot_held_until_callbacks_ran():
+    """Adds made while the result is being stored join the finishing task"""
+    processor = make_processor()
+    calls = []
+
+    def store_result(task):
+        # The request has no PDF on record yet, so a page view adds a task again
+        assert processor.get_active_task(1) is task
+        late = processor.add_task(MockServiceRequest(1, 'ABC'), callback=lambda t: calls.append('late'))
+        assert late == task.task_id
+        calls.append('stored')
+
+    task_id = processor.add_task(MockServiceRequest(1, 'ABC'), callback=store_result)
+    process_next(processor, lambda sr, **kw: 'out.pdf')
+
+    assert calls == ['stored', 'late']
+    assert processor.get_active_task(1) is None
+    assert processor.get_queue_size() == 0
+    assert processor.add_task(MockServiceRequest(1, 'ABC')) != task_id
+    print("✓ Slot held until callbacks ran")
+
+
+if __name__ == "__main__":
+    test_unique_task_ids()
+    test_duplicate_add_coalesces()
+    test_duplicate_promotes_priority()
+    test_add_after_completion_renders_again()
+    test_slot_held_until_callbacks_ran()
+    print("\nAll PDF queue dedup tests passed!")
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Test script for the PDF queue priority lanes
+"""
+
+import queue
+from collections import Counter
+
+from pdf_queue_processor import LaneQueue, PDFTask, TaskPriority
+
+
+def make_task(name, priority):
+    """Create a task without a real service request"""
+    return PDFTask(task_id=name, service_request=None, priority=priority)
+
+
+def fill(lanes, count):
+    """Put count tasks into every lane"""
+    for priority in TaskPriority:
+        for i in range(count):
+            lanes.put(make_task(f"{priority.value}-{i}", priority))
+
+
+def test_weighted_fair_share():
+    """Busy lanes are served in proportion to their weights"""
+    lanes = LaneQueue({TaskPriority.INTERACTIVE: 10, TaskPriority.AUTO: 3, TaskPriority.BULK: 1})
+    fill(lanes, 50)
+
+    served = Counter(lanes.get(timeout=0).priority for _ in range(28))
+    assert served[TaskPriority.INTERACTIVE] == 20
+    assert served[TaskPriority.AUTO] == 6
+    assert served[TaskPriority.BULK] == 2
+    print("✓ Weighted fair share")
+
+
+def test_interactive_not_blocked_by_backlog():
+    """An interactive task jumps a long bulk backlog"""
+    lanes = LaneQueue()
+    for i in range(100):
+        lanes.put(make_task(f"bulk-{i}", TaskPriority.BULK))
+    lanes.get(timeout=0)
+
+    lanes.put(make_task("approval", TaskPriority.INTERACTIVE))
+    assert lanes.get(timeout=0).task_id == "approval"
+    print("✓ Interactive task not blocked by bulk backlog")
+
+
+def test_fifo_within_lane():
+    """Tasks in the same lane keep their order"""
+    lanes = LaneQueue()
+    for i in range(5):
+        lanes.put(make_task(f"auto-{i}", TaskPriority.AUTO))
+    assert [lanes.get(timeout=0).task_id for _ in range(5)] == [f"auto-{i}" for i in range(5)]
+    print("✓ FIFO within a lane")
+
+
+def test_starvation_protection():
+    """A task waiting past the starvation timeout is served next"""
+    lanes = LaneQueue({TaskPriority.INTERACTIVE: 100, TaskPriority.AUTO: 1, TaskPriority.BULK: 1},
+                      starvation_timeout=30)
+    lanes.put(make_task("old-bulk", TaskPriority.BULK))
+    lanes._lanes[TaskPriority.BULK][0].enqueued_at -= 60
+    for i in range(10):
+        lanes.put(make_task(f"interactive-{i}", TaskPriority.INTERACTIVE))
+
+    assert lanes.get(timeout=0).task_id == "old-bulk"
+    print("✓ Starvation protection")
+
+
+def test_sizes_and_empty():
+    """Lane sizes are reported and an empty queue times out"""
+    lanes = LaneQueue()
+    lanes.put(make_task("a", TaskPriority.AUTO))
+    lanes.put(make_task("b", TaskPriority.BULK))
+    assert lanes.qsize() == 2
+    assert lanes.lane_sizes() == {'interactive': 0, 'auto': 1, 'bulk': 1}
+
+    lanes.get(timeout=0)
+    lanes.get(timeout=0)
+    try:
+        lanes.get(timeout=0.01)
+        assert False, "Expected queue.Empty"
+    except queue.Empty:
+        pass
+    print("✓ Sizes and empty queue")
+
+
+if __name__ == "__main__":
+    test_weighted_fair_share()
+    test_interactive_not_blocked_by_backlog()
+    test_fifo_within_lane()
+    test_starvation_protection()
+    test_sizes_and_empty()
+    print("\nAll PDF queue lane tests passed!")
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Test script for sharded PDF storage and the storage sweeper
+"""
+
+import os
+import time
+import tempfile
+
+from pdf_storage import LocalShardedStorage, StorageSweeper
+
+
+def write(storage, filename, content=b'%PDF-1.4 test', age_days=0):
+    """Store a file and backdate its modification time"""
+    key, path = storage.allocate(filename)
+    with open(path, 'wb') as f:
+        f.write(content)
+    mtime = time.time() - age_days * 86400
+    os.utime(path, (mtime, mtime))
+    return key, path
+
+
+def test_sharded_keys():
+    """Files land in hashed subdirectories under the root"""
+    storage = LocalShardedStorage(tempfile.mkdtemp())
+    key, path = write(storage, 'request_ABC.pdf')
+    parts = key.split('/')
+    assert len(parts) == 3 and parts[-1] == 'request_ABC.pdf'
+    assert all(len(part) == 2 for part in parts[:2])
+    assert storage.local_path(key) == path
+    assert storage.key_for('request_ABC.pdf') == key
+    print("✓ Sharded keys")
+
+
+def test_legacy_flat_keys():
+    """Files stored before sharding are still found by plain name"""
+    root = tempfile.mkdtemp()
+    with open(os.path.join(root, 'request_OLD.pdf'), 'wb') as f:
+        f.write(b'old')
+    storage = LocalShardedStorage(root)
+    assert storage.local_path('request_OLD.pdf') == os.path.join(root, 'request_OLD.pdf')
+    assert storage.local_path('request_MISSING.pdf') is None
+    print("✓ Legacy flat keys")
+
+
+def test_invalid_keys_rejected():
+    """Keys cannot escape the storage root"""
+    storage = LocalShardedStorage(tempfile.mkdtemp())
+    try:
+        storage.local_path('../../etc/passwd')
+        assert False, "Expected ValueError"
+    except ValueError:
+        pass
+    print("✓ Invalid keys rejected")
+
+
+def test_compression_roundtrip():
+    """Compressed files are restored with the same content on access"""
+    storage = LocalShardedStorage(tempfile.mkdtemp())
+    content = b'%PDF-1.4 ' + b'x' * 10000
+    key, path = write(storage, 'request_GZ.pdf', content)
+    assert storage.compress(key)
+    assert not os.path.exists(path)
+    assert os.path.exists(path + '.gz')
+    assert storage.local_path(key) == path
+    with open(path, 'rb') as f:
+        assert f.read() == content
+    print("✓ Compression roundtrip")
+
+
+def test_sweeper_policies():
+    """Old files are deleted, middle-aged files compressed, new files kept"""
+    storage = LocalShardedStorage(tempfile.mkdtemp())
+    old_key, _ = write(storage, 'request_OLD.pdf', age_days=100)
+    mid_key, mid_path = write(storage, 'request_MID.pdf', age_days=20)
+    new_key, new_path = write(storage, 'request_NEW.pdf', age_days=1)
+
+    deleted = []
+    sweeper = StorageSweeper(storage, retention_days=90, compress_after_days=7, on_delete=deleted.append)
+    stats = sweeper.sweep()
+
+    assert stats == {'scanned': 3, 'deleted': 1, 'compressed': 1}
+    assert deleted == [old_key]
+    assert storage.local_path(old_key) is None
+    assert os.path.exists(mid_path + '.gz')
+    assert os.path.exists(new_path)
+
+    # Compressed files are not compressed twice
+    stats = sweeper.sweep()
+    assert stats['compressed'] == 0
+    print("✓ Sweeper policies")
+
+
+if __name__ == "__main__":
+    test_sharded_keys()
+    test_legacy_flat_keys()
+    test_invalid_keys_rejected()
+    test_compression_roundtrip()
+    test_sweeper_policies()
+    print("\nAll PDF storage tests passed!")
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test script for PDF pipeline metrics and their Prometheus exposition
+"""
+
+import pipeline_metrics
+import pdf_queue_processor
+from pipeline_metrics import PipelineMetrics
+from pdf_queue_processor import PDFQueueProcessor
+
+
+class MockServiceRequest:
+    def __init__(self, id, tracking_code):
+        self.id = id
+        self.tracking_code = tracking_code
+
+
+def test_histogram_buckets():
+    """Observations land in every bucket whose bound they do not exceed"""
+    metrics = PipelineMetrics(buckets=(0.1, 1.0))
+    metrics.observe_stage('export', 0.05)
+    metrics.observe_stage('export', 0.5)
+    metrics.observe_stage('export', 5)
+
+    histogram = metrics.histogram('pdf_stage_seconds', stage='export')
+    assert histogram.counts == [1, 2]
+    assert histogram.count == 3 and abs(histogram.sum - 5.55) < 1e-9
+    print("✓ Histogram buckets")
+
+
+def test_span_records_on_error():
+    """A stage that raises is still timed"""
+    metrics = PipelineMetrics()
+    try:
+        with metrics.span('batch_update'):
+            raise RuntimeError("quota")
+    except RuntimeError:
+        pass
+    assert metrics.histogram('pdf_stage_seconds', stage='batch_update').count == 1
+    print("✓ Span records on error")
+
+
+def test_prometheus_text():
+    """Histograms, counters and gauges render in the exposition format"""
+    metrics = PipelineMetrics(buckets=(1.0,))
+    metrics.observe_stage('doc_fetch', 0.25)
+    metrics.inc('pdf_tasks_total', outcome='completed')
+    text = metrics.render({'pdf_queue_depth': {(): 4}})
+
+    assert '# TYPE pdf_stage_seconds histogram' in text
+    assert 'pdf_stage_seconds_bucket{stage="doc_fetch",le="1.0"} 1.0' in text
+    assert 'pdf_stage_seconds_bucket{stage="doc_fetch",le="+Inf"} 1.0' in text
+    assert 'pdf_stage_seconds_sum{stage="doc_fetch"} 0.25' in text
+    assert 'pdf_tasks_total{outcome="completed"} 1.0' in text
+    assert '# TYPE pdf_queue_depth gauge\npdf_queue_depth 4.0' in text
+    print("✓ Prometheus text")
+
+
+def test_queue_task_instrumented():
+    """Processing a task records its queue wait, outcome and retries"""
+    previous = pipeline_metrics._pipeline_metrics
+    metrics = pipeline_metrics._pipeline_metrics = PipelineMetrics()
+    attempts = []
+
+    def render(sr, **kw):
+        attempts.append(sr)
+        if len(attempts) == 1:
+            raise RuntimeError("transient")
+        return 'out.pdf'
+
+    original = pdf_queue_processor.render_pdf, pdf_queue_processor._app
+    pdf_queue_processor.render_pdf = render
+    pdf_queue_processor._app = None
+    try:
+        processor = PDFQueueProcessor(max_retries=1, retry_delay=0, preflight_check=False)
+        processor.add_task(MockServiceRequest(1, 'MET'))
+        processor._process_task(processor.queue.get(timeout=0))
+    finally:
+        pdf_queue_processor.render_pdf, pdf_queue_processor._app = original
+        pipeline_metrics._pipeline_metrics = previous
+
+    assert metrics.histogram('pdf_stage_seconds', stage='queue_wait').count == 1
+    assert metrics.counter('pdf_task_retries_total') == 1
+    assert metrics.counter('pdf_tasks_total', outcome='completed') == 1
+    print("✓ Queue task instrumented")
+
+
+if __name__ == "__main__":
+    test_histogram_buckets()
+    test_span_records_on_error()
+    test_prometheus_text()
+    test_queue_task_instrumented()
+    print("\nAll pipeline metrics tests passed!")
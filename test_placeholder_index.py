@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Test script for the template placeholder index
+"""
+
+from placeholder_index import PlaceholderIndex, PlaceholderValidationError
+
+
+def create_mock_document():
+    """Create a Docs API document with placeholders in body, table, header and footer"""
+
+    def paragraph(text, start):
+        return {'paragraph': {'elements': [
+            {'startIndex': start, 'endIndex': start + len(text), 'textRun': {'content': text}}
+        ]}}
+
+    return {
+        'title': 'قالب آزمایشی',
+        'revisionId': 'rev-1',
+        'body': {'content': [
+            paragraph('نام: {{employee_name}}\n', 1),
+            {'table': {'tableRows': [{'tableCells': [
+                {'content': [paragraph('بخش: {{department}} / {{department}}\n', 30)]}
+            ]}]}}
+        ]},
+        'headers': {'h1': {'content': [paragraph('کد: {{tracking_code}}\n', 0)]}},
+        'footers': {'f1': {'content': [paragraph('امضا: {{signature}}\n', 0)]}}
+    }
+
+
+class MockFormField:
+    def __init__(self, field_name, document_placeholder, is_required=False):
+        self.field_name = field_name
+        self.document_placeholder = document_placeholder
+        self.is_required = is_required
+
+
+class MockService:
+    def __init__(self, fields, google_doc_id='doc-1'):
+        self.id = 1
+        self.google_doc_id = google_doc_id
+        self.form_fields = fields
+
+
+class MockServiceRequest:
+    def __init__(self, service):
+        self.service = service
+
+
+def test_index_covers_all_sections():
+    """Placeholders are indexed from body, tables, headers and footers"""
+    fetches = []
+
+    def fetch(document_id):
+        fetches.append(document_id)
+        return create_mock_document()
+
+    index = PlaceholderIndex(fetch)
+    entry = index.get_entry('doc-1')
+
+    assert entry.placeholders == {'employee_name', 'department', 'tracking_code', 'signature'}
+    assert entry.occurrences['department'] == 2
+    assert entry.revision_id == 'rev-1'
+
+    # Second lookup is served from cache
+    index.get_placeholders('doc-1')
+    assert fetches == ['doc-1']
+
+    index.invalidate('doc-1')
+    index.get_placeholders('doc-1')
+    assert fetches == ['doc-1', 'doc-1']
+    print("✓ Placeholder index covers body, tables, headers and footers")
+
+
+def test_check_fields():
+    """Missing and unmapped placeholders are reported"""
+    index = PlaceholderIndex(lambda document_id: create_mock_document())
+    fields = [
+        MockFormField('employee_name', '{{employee_name}}'),
+        MockFormField('department', 'department'),
+        MockFormField('manager', '{{manager}}')
+    ]
+
+    report = index.check_fields('doc-1', fields)
+    assert report.missing == ['manager']
+    assert report.unmapped == ['signature']
+    assert not report.is_valid
+    print("✓ Field mappings checked against template")
+
+
+def test_validate_service_request():
+    """Requests missing a required placeholder are rejected; optional ones and unreachable templates are not"""
+    index = PlaceholderIndex(lambda document_id: create_mock_document())
+
+    valid = MockServiceRequest(MockService([MockFormField('employee_name', '{{employee_name}}')]))
+    index.validate_service_request(valid)
+
+    # An optional field the template leaves out is skipped at render time
+    optional = MockServiceRequest(MockService([MockFormField('employee_name', '{{employee_name}}'),
+                                               MockFormField('note', '{{note}}')]))
+    index.validate_service_request(optional)
+    assert index.check_service(optional.service).missing == ['note']
+
+    invalid = MockServiceRequest(MockService([MockFormField('manager', '{{manager}}', is_required=True)]))
+    try:
+        index.validate_service_request(invalid)
+        assert False, "Expected PlaceholderValidationError"
+    except PlaceholderValidationError as e:
+        assert '{{manager}}' in str(e)
+
+    def unreachable(document_id):
+        raise Exception("Network error")
+
+    PlaceholderIndex(unreachable).validate_service_request(invalid)
+    print("✓ Unresolvable service requests rejected")
+
+
+if __name__ == "__main__":
+    test_index_covers_all_sections()
+    test_check_fields()
+    test_validate_service_request()
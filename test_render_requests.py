@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Test script for placeholder replacement and exact-range restoration in the
+Google Docs generator
+"""
+
+import os
+import tempfile
+
+from google_docs_pdf_generator import GoogleDocsPDFGenerator
+
+
+def make_document(text, revision_id='1', headers=None):
+    """Minimal Docs API document with the body as a single text run"""
+    def segment(content):
+        return {'content': [{'paragraph': {'elements': [
+            {'startIndex': 1, 'endIndex': 1 + len(content.encode('utf-16-le')) // 2,
+             'textRun': {'content': content}}
+        ]}}]}
+    document = {'revisionId': revision_id, 'body': segment(text)}
+    if headers:
+        document['headers'] = {header_id: segment(content) for header_id, content in headers.items()}
+    return document
+
+
+class FakeCall:
+    def __init__(self, result):
+        self.result = result
+
+    def execute(self):
+        return self.result
+
+
+class FakeDocuments:
+    """Body text that batchUpdate edits like the Docs API, indexed in UTF-16 units from 1"""
+
+    def __init__(self, text):
+        self.units = text.encode('utf-16-le')
+        self.revision = 1
+        self.batches = []
+
+    @property
+    def text(self):
+        return self.units.decode('utf-16-le')
+
+    def get(self, documentId):
+        return FakeCall(make_document(self.text, str(self.revision)))
+
+    def batchUpdate(self, documentId, body):
+        required = body.get('writeControl', {}).get('requiredRevisionId')
+        assert required in (None, str(self.revision)), "Stale revision"
+        self.batches.append(body)
+        for request in body['requests']:
+            self.apply(request)
+        self.revision += 1
+        return FakeCall({'writeControl': {'requiredRevisionId': str(self.revision)}})
+
+    def apply(self, request):
+        if 'insertText' in request:
+            index = (request['insertText']['location']['index'] - 1) * 2
+            self.units = self.units[:index] + request['insertText']['text'].encode('utf-16-le') + self.units[index:]
+        else:
+            rng = request['deleteContentRange']['range']
+            self.units = self.units[:(rng['startIndex'] - 1) * 2] + self.units[(rng['endIndex'] - 1) * 2:]
+
+
+class FakeDocsService:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def documents(self):
+        return self.docs
+
+
+def make_generator(docs, generator_class=GoogleDocsPDFGenerator):
+    """Generator wired to fake services, without credentials; records exported text"""
+    generator = generator_class.__new__(generator_class)
+    generator.docs_service = FakeDocsService(docs)
+    generator.last_report = None
+    generator.exported = []
+
+    def export(document_id, output_path, report=None):
+        report.count_call('files.export')
+        generator.exported.append(docs.text)
+        with open(output_path, 'wb') as f:
+            f.write(b'%PDF-1.4')
+    generator.export_pdf_to_file = export
+    return generator
+
+
+def render(generator, replacements):
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, 'out.pdf')
+        success = generator.generate_pdf_with_replacements(
+            'doc1', replacements, output, delay_before_export=0, delay_before_restore=0)
+        assert os.path.exists(output) == success
+    return success
+
+
+def test_values_resolved_once_per_placeholder():
+    """A placeholder repeated in the template is looked up once; segments are recorded"""
+    document = make_document('{{name}} and {{name}}, {{date}} {{unused}}\n',
+                             headers={'h.1': 'Ref {{name}}\n'})
+    placeholders = GoogleDocsPDFGenerator._find_placeholders_with_positions(document)
+    assert len(placeholders) == 5
+    assert {p['segment_id'] for p in placeholders} == {None, 'h.1'}
+
+    pairs = GoogleDocsPDFGenerator._resolve_replacements(placeholders, {'name': 'Ali', '{{date}}': '1402/11/15'})
+    assert pairs == [('{{name}}', 'Ali'), ('{{date}}', '1402/11/15')]
+    print("✓ Values resolved once per placeholder")
+
+
+def test_restore_with_ambiguous_values():
+    """Values that also appear in static text are restored without touching that text"""
+    template = 'No. 1: {{n}} items, {{name}} and {{name}} signed by Ali\n'
+    docs = FakeDocuments(template)
+    generator = make_generator(docs)
+
+    assert render(generator, {'n': '1', 'name': 'Ali'})
+    assert generator.exported == ['No. 1: 1 items, Ali and Ali signed by Ali\n']
+    assert docs.text == template
+
+    report = generator.last_report.to_dict()
+    assert report['restore_verified'] is True
+    assert report['placeholder_occurrences'] == 3
+    assert report['api_calls'] == {'documents.get': 2, 'documents.batchUpdate': 2, 'files.export': 1}
+    print("✓ Restore with ambiguous values")
+
+
+def test_empty_and_wide_values():
+    """Empty values and characters outside the BMP round-trip exactly"""
+    template = 'نام: {{name}} 📄 {{note}} / {{code}}\n'
+    docs = FakeDocuments(template)
+    generator = make_generator(docs)
+
+    assert render(generator, {'name': 'علی 📄', 'note': '', 'code': 'X'})
+    assert generator.exported == ['نام: علی 📄 📄  / X\n']
+    assert docs.text == template
+    assert generator.last_report.restore_verified is True
+    print("✓ Empty and wide values")
+
+
+def test_revision_pinning():
+    """The forward batch requires the revision read; the restore targets the one it produced"""
+    docs = FakeDocuments('{{a}}\n')
+    generator = make_generator(docs)
+    assert render(generator, {'a': 'value'})
+
+    forward, restore = docs.batches
+    assert forward['writeControl'] == {'requiredRevisionId': '1'}
+    assert restore['writeControl'] == {'targetRevisionId': '2'}
+    print("✓ Revision pinning")
+
+
+def test_damaged_restore_detected():
+    """A restore that does not bring the template back is reported"""
+    class LossyDocuments(FakeDocuments):
+        def apply(self, request):
+            if len(self.batches) == 1:
+                super().apply(request)
+
+    docs = LossyDocuments('{{a}} {{b}}\n')
+    generator = make_generator(docs)
+    assert render(generator, {'a': '1', 'b': '2'})
+    assert generator.last_report.restore_verified is False
+    print("✓ Damaged restore detected")
+
+
+def test_no_copy_generator_renders_in_place():
+    """The no-copy generator uses the same fill, restore and verify"""
+    from pdf_generator_no_copy import NoCopyPDFGenerator
+
+    docs = FakeDocuments('{{a}} / 1\n')
+    generator = make_generator(docs, NoCopyPDFGenerator)
+    with tempfile.TemporaryDirectory() as tmp:
+        assert generator.generate_pdf_without_copy('doc1', {'a': '1'}, os.path.join(tmp, 'out.pdf'))
+    assert generator.exported == ['1 / 1\n']
+    assert docs.text == '{{a}} / 1\n'
+    assert generator.last_report.restore_verified is True
+    print("✓ No-copy generator renders in place")
+
+
+def test_pooled_copy_reset():
+    """A filled pool copy is reset by range against the revision the fill produced"""
+    from google_docs_service import GoogleDocsService
+
+    template = 'Ref {{code}}: {{name}} (Ali)\n'
+    docs = FakeDocuments(template)
+    service = GoogleDocsService.__new__(GoogleDocsService)
+    service.docs_service = FakeDocsService(docs)
+
+    reset = service.fill_placeholders('copy1', {'code': '7', 'name': 'Ali'})
+    assert docs.text == 'Ref 7: Ali (Ali)\n'
+    assert reset('copy1')
+    assert docs.text == template
+
+    forward, restore = docs.batches
+    assert forward['writeControl'] == {'requiredRevisionId': '1'}
+    assert restore['writeControl'] == {'targetRevisionId': '2'}
+    print("✓ Pooled copy reset")
+
+
+if __name__ == "__main__":
+    test_values_resolved_once_per_placeholder()
+    test_restore_with_ambiguous_values()
+    test_empty_and_wide_values()
+    test_revision_pinning()
+    test_damaged_restore_detected()
+    test_no_copy_generator_renders_in_place()
+    test_pooled_copy_reset()
+    print("\nAll render request tests passed!")
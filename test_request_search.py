@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Test script for Persian search text normalization and request search
+"""
+
+import importlib.util
+import json
+import os
+import tempfile
+
+from flask import Flask
+
+import request_search
+from models import db, Service, ServiceRequest, ServiceRequestFieldValue
+from request_search import (normalize_persian, build_search_text, tokenize_query, ensure_search_index,
+                            build_search_query)
+
+
+def test_normalize_persian():
+    """Arabic letters, digits and ZWNJ are normalized to searchable Persian"""
+    assert normalize_persian('علي كريمي') == 'علی کریمی'
+    assert normalize_persian('۱۴۰۲/۱۱/۰۵') == '1402/11/05'
+    assert normalize_persian('می‌خواهم') == 'می خواهم'
+    assert normalize_persian('مُحَمَّد') == 'محمد'
+    print("✓ Persian text normalized")
+
+
+def test_search_text_and_tokens():
+    """Form values and queries produce matching tokens"""
+    search_text = build_search_text({'name': 'علي', 'code': 12, 'empty': ''})
+    assert search_text == 'علی 12'
+
+    # Query syntax characters are dropped so they can not break MATCH/tsquery
+    assert tokenize_query('"علي" OR کد*') == ['علی', 'or', 'کد']
+    assert tokenize_query(None) == []
+    print("✓ Search text and query tokens")
+
+
+def create_app():
+    """In-memory database with the FTS index and a service with indexed fields"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        ensure_search_index()
+        db.session.add(Service(id=1, name='Search'))
+        db.session.commit()
+    return app
+
+
+def add_request(tracking_code, data):
+    service_request = ServiceRequest(service_id=1, tracking_code=tracking_code)
+    service_request.set_form_data(data, indexed_fields=('name', 'code'))
+    db.session.add(service_request)
+    db.session.commit()
+    return service_request
+
+
+def matches(**filters):
+    return sorted(sr.tracking_code for sr in build_search_query(**filters))
+
+
+def test_full_text_search():
+    """MATCH finds requests by normalized prefixes, and triggers follow updates and deletes"""
+    app = create_app()
+    try:
+        with app.app_context():
+            first = add_request('S1', {'name': 'علی کریمی', 'city': 'تهران'})
+            add_request('S2', {'name': 'زهرا', 'city': 'كرج'})
+
+            # Arabic yeh/kaf in the query match the Persian letters stored
+            assert matches(query='علي') == ['S1']
+            assert matches(query='كريم') == ['S1']
+            assert matches(query='کرج') == ['S2']
+            assert matches(query='علی تهران') == ['S1']
+            assert matches(query='علی کرج') == []
+
+            first.set_form_data({'name': 'رضا', 'city': 'تهران'}, indexed_fields=('name',))
+            db.session.commit()
+            assert matches(query='علی') == []
+            assert matches(query='رضا') == ['S1']
+
+            db.session.delete(first)
+            db.session.commit()
+            assert matches(query='تهران') == []
+    finally:
+        request_search._fts_available = None
+    print("✓ Full-text search")
+
+
+def test_field_value_filters():
+    """Field values are normalized when stored and when queried"""
+    app = create_app()
+    try:
+        with app.app_context():
+            add_request('F1', {'name': 'كاظم', 'code': '۱۲۳۴'})
+            add_request('F2', {'name': 'کامران', 'code': '5678'})
+
+            assert db.session.query(ServiceRequestFieldValue.value).filter_by(field_name='code').all() \
+                == [('1234',), ('5678',)]
+            assert matches(field_filters=[('name', 'کاظم', False)]) == ['F1']
+            assert matches(field_filters=[('name', 'كا', True)]) == ['F1', 'F2']
+            assert matches(field_filters=[('code', '1234', False)]) == ['F1']
+            assert matches(field_filters=[('code', '۵۶', True)], service_id=1) == ['F2']
+            assert [sr.tracking_code for sr in ServiceRequest.search_by_field(1, 'name', ' كاظم ')] \
+                == ['F1']
+            # Both query paths build the filter the same way
+            assert sorted(sr.tracking_code for sr in ServiceRequest.search_by_field(1, 'code', '۵۶', prefix=True)) \
+                == matches(field_filters=[('code', '۵۶', True)]) == ['F2']
+    finally:
+        request_search._fts_available = None
+    print("✓ Field value filters")
+
+
+def load_migration(name):
+    """Import a script from migrations/, which imports the app, against a scratch database"""
+    os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test.db'))
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations', f'{name}.py')
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_migration_on_legacy_schema():
+    """The search migration backfills a service_requests table that lacks the later columns"""
+    migration = load_migration('add_request_search_index')
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.session.execute(db.text("CREATE TABLE service_requests (id INTEGER PRIMARY KEY, service_id INTEGER, "
+                                   "tracking_code VARCHAR(20), form_data TEXT)"))
+        ServiceRequestFieldValue.__table__.create(db.engine)
+        db.session.execute(db.text("INSERT INTO service_requests VALUES (:id, 1, :code, :data)"), [
+            {'id': 1, 'code': 'L1', 'data': json.dumps({'name': 'علي كريمي', 'code': '۱۲'})},
+            {'id': 2, 'code': 'L2', 'data': json.dumps(json.dumps({'name': 'زهرا'}))},
+        ])
+        db.session.execute(db.text("INSERT INTO service_request_field_values (request_id, service_id, "
+                                   "field_name, value) VALUES (1, 1, 'code', '۱۲'), (1, 1, 'empty', NULL)"))
+        db.session.commit()
+
+    migration_app = migration.app
+    migration.app = app
+    try:
+        migration.upgrade()
+        with app.app_context():
+            assert db.session.execute(db.text("SELECT id, search_text FROM service_requests ORDER BY id")).all() \
+                == [(1, 'علی کریمی 12'), (2, 'زهرا')]
+            assert db.session.query(ServiceRequestFieldValue.value).order_by(ServiceRequestFieldValue.id).all() \
+                == [('12',), (None,)]
+            assert db.session.execute(db.text(
+                f"SELECT rowid FROM {request_search.FTS_TABLE} WHERE {request_search.FTS_TABLE} MATCH 'کریم*'"
+            )).scalars().all() == [1]
+    finally:
+        migration.app = migration_app
+        request_search._fts_available = None
+    print("✓ Migration on legacy schema")
+
+
+if __name__ == "__main__":
+    test_normalize_persian()
+    test_search_text_and_tokens()
+    test_full_text_search()
+    test_field_value_filters()
+    test_migration_on_legacy_schema()
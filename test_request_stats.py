@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Test script for the per-service request counters
+"""
+
+import os
+import tempfile
+import uuid
+
+# Use a scratch database unless the app was already imported with one
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test.db'))
+
+import pdf_queue_processor
+from app import app, db
+from models import User, Service, ServiceRequest, ServiceRequestStats
+
+
+def create_fixture():
+    """An approver and a service with two pending requests; returns their ids"""
+    suffix = uuid.uuid4().hex[:8]
+    with app.app_context():
+        db.create_all()
+        approver = User(username=f'approver_{suffix}', email=f'approver_{suffix}@example.com',
+                        role='approval_admin')
+        approver.set_password('secret')
+        service = Service(name=f'Stats {suffix}')
+        db.session.add_all([approver, service])
+        db.session.flush()
+
+        request_ids = []
+        for i in range(2):
+            service_request = ServiceRequest(service_id=service.id, tracking_code=f'ST{suffix}{i}',
+                                             form_data={})
+            db.session.add(service_request)
+            db.session.flush()
+            ServiceRequestStats.record(service.id, 'pending')
+            request_ids.append(service_request.id)
+        db.session.commit()
+        return approver.id, service.id, request_ids
+
+
+def remove_fixture(approver_id, service_id):
+    with app.app_context():
+        db.session.delete(db.session.get(Service, service_id))
+        db.session.delete(db.session.get(User, approver_id))
+        db.session.commit()
+
+
+def stats_for(service_id):
+    with app.app_context():
+        return db.session.get(ServiceRequestStats, service_id).to_dict()
+
+
+def review(client, request_id, action):
+    response = client.post(f'/approver/request/{request_id}', data={'action': action, 'note': ''})
+    assert response.status_code == 302
+
+
+def logged_in_client(user_id):
+    app.config['WTF_CSRF_ENABLED'] = False
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client
+
+
+def test_record_and_rebuild():
+    """Counters follow status changes and match a rebuild from the requests table"""
+    approver_id, service_id, request_ids = create_fixture()
+    try:
+        assert stats_for(service_id) == {'total': 2, 'approved': 0, 'rejected': 0, 'pending': 2}
+
+        with app.app_context():
+            ServiceRequestStats.record(service_id, 'approved', 'pending')
+            db.session.get(ServiceRequest, request_ids[0]).status = 'approved'
+            db.session.commit()
+        assert stats_for(service_id) == {'total': 2, 'approved': 1, 'rejected': 0, 'pending': 1}
+
+        # A no-op change leaves the counters alone
+        with app.app_context():
+            ServiceRequestStats.record(service_id, 'approved', 'approved')
+            db.session.commit()
+
+        with app.app_context():
+            ServiceRequestStats.rebuild([service_id])
+            db.session.commit()
+            assert Service.count_request_stats([service_id])[service_id] == stats_for(service_id)
+        assert stats_for(service_id)['approved'] == 1
+    finally:
+        remove_fixture(approver_id, service_id)
+    print("✓ Record and rebuild")
+
+
+def test_counts_after_review():
+    """Approving and rejecting through the review page update the counters"""
+    approver_id, service_id, request_ids = create_fixture()
+    mode = app.config['PDF_GENERATION_MODE']
+    app.config['PDF_GENERATION_MODE'] = 'lazy'
+    try:
+        client = logged_in_client(approver_id)
+        review(client, request_ids[0], 'approve')
+        review(client, request_ids[1], 'reject')
+        assert stats_for(service_id) == {'total': 2, 'approved': 1, 'rejected': 1, 'pending': 0}
+    finally:
+        app.config['PDF_GENERATION_MODE'] = mode
+        remove_fixture(approver_id, service_id)
+    print("✓ Counts after review")
+
+
+def test_status_committed_before_pdf_wait():
+    """The approval is committed before the reviewer waits on the PDF queue"""
+    approver_id, service_id, request_ids = create_fixture()
+    mode = app.config['PDF_GENERATION_MODE']
+    app.config['PDF_GENERATION_MODE'] = 'eager'
+    seen = []
+
+    def wait_for_task(task_id, timeout=60.0):
+        # A separate connection only sees committed rows
+        with db.engine.connect() as connection:
+            seen.append(connection.execute(
+                db.text('SELECT approved FROM service_request_stats WHERE service_id = :id'),
+                {'id': service_id}).scalar())
+        return None
+
+    originals = pdf_queue_processor.add_pdf_task, pdf_queue_processor.wait_for_task
+    pdf_queue_processor.add_pdf_task = lambda service_request, callback=None, priority=None: 'task'
+    pdf_queue_processor.wait_for_task = wait_for_task
+    try:
+        review(logged_in_client(approver_id), request_ids[0], 'approve')
+        assert seen == [1]
+    finally:
+        pdf_queue_processor.add_pdf_task, pdf_queue_processor.wait_for_task = originals
+        app.config['PDF_GENERATION_MODE'] = mode
+        remove_fixture(approver_id, service_id)
+    print("✓ Status committed before PDF wait")
+
+
+if __name__ == "__main__":
+    test_record_and_rebuild()
+    test_counts_after_review()
+    test_status_committed_before_pdf_wait()
+    print("\nAll request stats tests passed!")
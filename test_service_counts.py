@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Test script for the grouped per-service field and request counts
+"""
+
+from flask import Flask
+
+from models import db, Service, FormField, ServiceRequest
+
+
+def create_app():
+    """In-memory database with services of different sizes, one of them empty"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        layout = {
+            'A': (3, ['pending', 'pending', 'approved', 'rejected', 'approved']),
+            'B': (1, ['rejected']),
+            'C': (0, []),
+        }
+        for name, (field_count, statuses) in layout.items():
+            service = Service(name=name)
+            db.session.add(service)
+            db.session.flush()
+            for i in range(field_count):
+                db.session.add(FormField(service_id=service.id, field_name=f'f{i}', field_label=f'F{i}',
+                                         field_type='text'))
+            for i, status in enumerate(statuses):
+                db.session.add(ServiceRequest(service_id=service.id, tracking_code=f'{name}{i}',
+                                              form_data={}, status=status))
+        db.session.commit()
+    return app
+
+
+def test_field_counts_match_len():
+    """One GROUP BY gives the same field counts as counting each service's fields"""
+    app = create_app()
+    with app.app_context():
+        services = Service.query.all()
+        expected = {service.id: len(service.form_fields.all()) for service in services}
+
+        assert Service.get_field_counts([service.id for service in services]) == expected
+        # Without ids, services that have no fields are left out
+        assert Service.get_field_counts() == {k: v for k, v in expected.items() if v}
+    print("✓ Field counts match len()")
+
+
+def test_request_stats_match_len():
+    """Grouped status counts equal filtering each service's requests by hand"""
+    app = create_app()
+    with app.app_context():
+        services = Service.query.all()
+        expected = {}
+        for service in services:
+            requests = service.requests.all()
+            expected[service.id] = {
+                'total': len(requests),
+                **{status: len([r for r in requests if r.status == status])
+                   for status in ('approved', 'rejected', 'pending')},
+            }
+
+        assert Service.count_request_stats([service.id for service in services]) == expected
+        # Services without counter rows fall back to the live count
+        assert {service.id: service.get_stats() for service in services} == expected
+    print("✓ Request stats match len()")
+
+
+if __name__ == "__main__":
+    test_field_counts_match_len()
+    test_request_stats_match_len()
+    print("\nAll service count tests passed!")
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Test script for tracking code assignment on new requests
+"""
+
+import os
+import tempfile
+import uuid
+
+# Use a scratch database unless the app was already imported with one
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test.db'))
+
+from sqlalchemy.exc import IntegrityError
+
+import app as app_module
+from app import app, db, add_service_request
+from models import Service, ServiceRequest
+
+
+def with_codes(codes, create):
+    """Run create() while generate_tracking_code returns the given codes in order"""
+    original = app_module.generate_tracking_code
+    remaining = list(codes)
+    app_module.generate_tracking_code = lambda: remaining.pop(0)
+    try:
+        return create()
+    finally:
+        app_module.generate_tracking_code = original
+
+
+def test_collision_retried():
+    """A colliding code is retried until a free one is found; the request is inserted once"""
+    suffix = uuid.uuid4().hex[:8].upper()
+    taken, fresh = f'AAA{suffix}', f'BBB{suffix}'
+    with app.app_context():
+        db.create_all()
+        service = Service(name=f'Codes {suffix}')
+        db.session.add(service)
+        db.session.flush()
+        db.session.add(ServiceRequest(service_id=service.id, tracking_code=taken, form_data={'n': 'first'}))
+        db.session.commit()
+        service_id = service.id
+
+        try:
+            service_request = ServiceRequest(service_id=service_id)
+            service_request.set_form_data({'n': 'second'})
+            with_codes([taken, taken, fresh], lambda: add_service_request(service_request))
+            db.session.commit()
+
+            rows = ServiceRequest.query.filter_by(service_id=service_id).order_by(ServiceRequest.id).all()
+            assert [(row.tracking_code, row.get_form_data()) for row in rows] == \
+                [(taken, {'n': 'first'}), (fresh, {'n': 'second'})]
+
+            # Out of attempts: the collision is raised and nothing is added
+            service_request = ServiceRequest(service_id=service_id, form_data={'n': 'third'})
+            try:
+                with_codes([taken, fresh], lambda: add_service_request(service_request, max_attempts=2))
+                assert False, "Colliding codes accepted"
+            except IntegrityError:
+                db.session.rollback()
+            assert ServiceRequest.query.filter_by(service_id=service_id).count() == 2
+        finally:
+            db.session.rollback()
+            db.session.delete(db.session.get(Service, service_id))
+            db.session.commit()
+    print("✓ Collision retried")
+
+
+if __name__ == "__main__":
+    test_collision_retried()
+    print("\nAll tracking code tests passed!")
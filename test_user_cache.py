@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test script for the cached user identities behind current_user
+"""
+
+import os
+import tempfile
+import threading
+import time
+
+from flask import Flask
+
+from models import db, User
+from user_cache import user_cache
+
+
+def create_app():
+    """File-backed database so another thread reads through its own connection"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'users.db')
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        user = User(username='approver', email='approver@example.com', role='approval_admin')
+        user.set_password('secret')
+        db.session.add(user)
+        db.session.commit()
+    return app
+
+
+def read_elsewhere(app, user_id):
+    """Load the identity from another thread, like a concurrent request"""
+    result = []
+
+    def load():
+        with app.app_context():
+            identity = user_cache.get(user_id)
+            result.append(identity and (identity.username, identity.role))
+    thread = threading.Thread(target=load)
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+def test_entries_expire_after_ttl():
+    """Changes made behind the ORM's back show up once the TTL passes"""
+    app = create_app()
+    ttl = user_cache.ttl
+    user_cache.ttl = 0.2
+    user_cache.invalidate()
+    try:
+        with app.app_context():
+            user = User.query.filter_by(username='approver').first()
+            assert user_cache.get(user.id).is_approval_admin()
+
+            db.session.execute(db.text("UPDATE users SET role = 'system_manager' WHERE id = :id"), {'id': user.id})
+            db.session.commit()
+            assert user_cache.get(user.id).role == 'approval_admin'
+
+            time.sleep(0.3)
+            assert user_cache.get(user.id).is_system_manager()
+    finally:
+        user_cache.ttl = ttl
+    print("✓ Entries expire after TTL")
+
+
+def test_changes_invalidated_on_commit():
+    """Role and username changes reach the cache when committed, not when flushed"""
+    app = create_app()
+    user_cache.invalidate()
+    with app.app_context():
+        user = User.query.filter_by(username='approver').first()
+        assert read_elsewhere(app, user.id) == ('approver', 'approval_admin')
+
+        user.username = 'manager'
+        user.role = 'system_manager'
+        db.session.flush()
+        # A concurrent request still sees, and may cache, the committed row
+        assert read_elsewhere(app, user.id) == ('approver', 'approval_admin')
+
+        db.session.commit()
+        assert read_elsewhere(app, user.id) == ('manager', 'system_manager')
+
+        user.role = 'approval_admin'
+        db.session.flush()
+        db.session.rollback()
+        assert read_elsewhere(app, user.id) == ('manager', 'system_manager')
+
+        db.session.delete(db.session.get(User, user.id))
+        db.session.commit()
+        assert read_elsewhere(app, user.id) is None
+    print("✓ Changes invalidated on commit")
+
+
+if __name__ == "__main__":
+    test_entries_expire_after_ttl()
+    test_changes_invalidated_on_commit()
+    print("\nAll user cache tests passed!")
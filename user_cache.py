@@ -0,0 +1,101 @@
+"""
+User identity cache
+Keeps a short-lived in-process copy of each logged-in user's id, username and
+role so login_required and the role decorators need no database query
+"""
+
+import time
+import threading
+import logging
+from itertools import chain
+from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db, User
+
+logger = logging.getLogger(__name__)
+
+
+class CachedUser(UserMixin):
+    """Detached, read-only identity used as current_user"""
+
+    def __init__(self, id, username, role):
+        self.id = id
+        self.username = username
+        self.role = role
+
+    def is_system_manager(self):
+        return self.role == 'system_manager'
+
+    def is_approval_admin(self):
+        return self.role == 'approval_admin'
+
+
+class UserIdentityCache:
+    """Thread-safe user_id -> CachedUser cache with a short TTL"""
+
+    def __init__(self, ttl: float = 60):
+        self.ttl = ttl
+        self._entries = {}  # user_id -> (loaded_at, CachedUser)
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int):
+        """Return the cached identity, loading it from the database when stale"""
+        with self._lock:
+            cached = self._entries.get(user_id)
+        if cached and time.time() - cached[0] < self.ttl:
+            return cached[1]
+
+        row = db.session.query(User.id, User.username, User.role).filter(User.id == user_id).first()
+        if row is None:
+            self.invalidate(user_id)
+            return None
+
+        identity = CachedUser(row.id, row.username, row.role)
+        with self._lock:
+            self._entries[user_id] = (time.time(), identity)
+        return identity
+
+    def invalidate(self, user_id=None):
+        """Drop one user, or every user, from the cache"""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+
+user_cache = UserIdentityCache()
+
+# session.info key of the user ids written in the current transaction
+_CHANGED_USERS = 'user_cache_changed'
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_users(session, flush_context):
+    """Note users created, changed or deleted by this flush"""
+    changed = {obj.id for obj in chain(session.new, session.dirty, session.deleted) if isinstance(obj, User)}
+    if changed:
+        session.info.setdefault(_CHANGED_USERS, set()).update(changed)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed_users(session):
+    """
+    Drop changed users once their transaction commits
+
+    Invalidating at flush would let another request reload and cache the old
+    row before the commit makes the change visible.
+    """
+    if session.in_nested_transaction():
+        return  # Savepoint released; the outer transaction may still roll back
+    for user_id in session.info.pop(_CHANGED_USERS, ()):
+        user_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_rolled_back_users(session, previous_transaction):
+    """Forget changes of a rolled back transaction; the cached rows are still current"""
+    if previous_transaction.parent is None:
+        session.info.pop(_CHANGED_USERS, None)